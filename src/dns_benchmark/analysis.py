@@ -1,12 +1,18 @@
 """Statistical analysis of DNS benchmark results."""
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, cast
+from typing import Any, Dict, List, Sequence, Union, cast
 
 import numpy as np
-import pandas as pd
 
-from dns_benchmark.core import DNSQueryResult, QueryStatus
+from dns_benchmark.core import DNSQueryResult
+from dns_benchmark.table import ResultTable
+
+
+def _base_resolver_name(name: str, family: str) -> str:
+    """``name`` without the " (IPv4)"/" (IPv6)" suffix ``--family both`` adds."""
+    suffix = f" ({family})"
+    return name[: -len(suffix)] if name.endswith(suffix) else name
 
 
 @dataclass
@@ -34,44 +40,10 @@ class ResolverStats:
 class BenchmarkAnalyzer:
     """Analyze DNS benchmark results and compute statistics."""
 
-    def __init__(self, results: List[DNSQueryResult]):
+    def __init__(self, results: Union[ResultTable, Sequence[DNSQueryResult]]):
         self.results = results
-        self.df = self._create_dataframe()
-
-    def _create_dataframe(self) -> pd.DataFrame:
-        """Convert results to pandas DataFrame."""
-        data = []
-        for result in self.results:
-            data.append(
-                {
-                    "resolver_name": result.resolver_name,
-                    "resolver_ip": result.resolver_ip,
-                    "domain": result.domain,
-                    "record_type": result.record_type,
-                    "latency_ms": result.latency_ms,
-                    "status": result.status.value,
-                    # True for SUCCESS only — used for success rate reporting
-                    "success": result.status == QueryStatus.SUCCESS,
-                    # True for SUCCESS or DNSSEC_FAILED — query completed at network
-                    # level so latency is valid and should be included in stats.
-                    "completed": result.status
-                    in (
-                        QueryStatus.SUCCESS,
-                        QueryStatus.DNSSEC_FAILED,
-                    ),
-                    "answers_count": len(result.answers),
-                    "ttl": result.ttl or 0,
-                    "error_message": result.error_message or "",
-                    "attempt_number": result.attempt_number,
-                    "cache_hit": result.cache_hit,
-                    "iteration": result.iteration,
-                    "query_id": result.query_id,
-                    "protocol": result.protocol.value,
-                    "dnssec_validated": result.dnssec_validated,
-                }
-            )
-
-        return pd.DataFrame(data)
+        self.table = ResultTable.of(results)
+        self.df = self.table.to_dataframe()
 
     def get_resolver_statistics(self) -> List[ResolverStats]:
         """Compute comprehensive statistics per resolver."""
@@ -261,7 +233,9 @@ class BenchmarkAnalyzer:
     def get_error_statistics(self) -> Dict[str, int]:
         """Count errors by message across all failed queries."""
         errors = self.df[self.df["success"] == False]["error_message"]
-        return cast(Dict[str, int], errors.value_counts().to_dict())
+        counts = errors.value_counts()
+        # Categorical counts include messages that only occur on successes
+        return cast(Dict[str, int], counts[counts > 0].to_dict())
 
     def get_protocol_statistics(self) -> List[Dict[str, Any]]:
         """Compute statistics broken down by protocol (plain/doh/dot)."""
@@ -318,3 +292,80 @@ class BenchmarkAnalyzer:
                     }
                 )
         return dnssec_stats
+
+    def get_connection_statistics(self) -> List[Dict[str, Any]]:
+        """Cold vs warm connection queries per resolver (pooled DoT/TCP/DoH).
+
+        Cold queries opened the connection they ran on; warm ones reused an
+        open connection, so their latency is the steady-state figure. DoT
+        and TCP count a connect inside a query as queue wait, DoH as latency.
+        """
+        pooled = self.df[self.df["connection"] != ""]
+        connection_stats: List[Dict[str, Any]] = []
+        for resolver_name in pooled["resolver_name"].unique():
+            resolver_df = pooled[pooled["resolver_name"] == resolver_name]
+            for proto in resolver_df["protocol"].unique():
+                proto_df = resolver_df[resolver_df["protocol"] == proto]
+                row: Dict[str, Any] = {
+                    "resolver_name": resolver_name,
+                    "resolver_ip": proto_df["resolver_ip"].iloc[0],
+                    "protocol": proto,
+                }
+                for state in ("cold", "warm"):
+                    state_df = proto_df[proto_df["connection"] == state]
+                    row[f"{state}_queries"] = len(state_df)
+                    row[f"{state}_avg_latency"] = (
+                        float(state_df["latency_ms"].mean()) if len(state_df) else None
+                    )
+                    row[f"{state}_avg_queue_wait"] = (
+                        float(state_df["queue_wait_ms"].mean())
+                        if len(state_df)
+                        else None
+                    )
+                connection_stats.append(row)
+        return connection_stats
+
+    def get_family_statistics(self) -> List[Dict[str, Any]]:
+        """IPv4 vs IPv6 queries per resolver (DoH results carry no family).
+
+        ``share`` is the percentage of the resolver's queries that went over
+        the family; under happy eyeballs that is how often it won the race.
+        Resolvers split per family by ``--family both`` ("<name> (IPv4)" and
+        "<name> (IPv6)") are grouped back under their base name.
+        """
+        typed = self.df[self.df["family"] != ""]
+        typed = typed.assign(
+            resolver_name=[
+                _base_resolver_name(name, family)
+                for name, family in zip(typed["resolver_name"], typed["family"])
+            ]
+        )
+        family_stats: List[Dict[str, Any]] = []
+        for resolver_name in typed["resolver_name"].unique():
+            resolver_df = typed[typed["resolver_name"] == resolver_name]
+            for family in sorted(resolver_df["family"].unique()):
+                family_df = resolver_df[resolver_df["family"] == family]
+                total = len(family_df)
+                success = int(family_df["completed"].sum())
+                latencies = family_df[family_df["completed"] == True]["latency_ms"]
+                family_stats.append(
+                    {
+                        "resolver_name": resolver_name,
+                        "resolver_ip": family_df["resolver_ip"].iloc[0],
+                        "family": family,
+                        "total_queries": total,
+                        "share": total / len(resolver_df) * 100,
+                        "successful_queries": success,
+                        "success_rate": success / total * 100,
+                        "avg_latency": (
+                            float(latencies.mean()) if len(latencies) else None
+                        ),
+                        "median_latency": (
+                            float(latencies.median()) if len(latencies) else None
+                        ),
+                        "p95_latency": (
+                            float(latencies.quantile(0.95)) if len(latencies) else None
+                        ),
+                    }
+                )
+        return family_stats
@@ -0,0 +1,155 @@
+"""Bounded, TTL-aware LRU cache of query results."""
+
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from dns_benchmark.core import DNSQueryResult
+
+# (resolver IP, domain, record type)
+CacheKey = Tuple[str, str, str]
+
+
+class QueryCache(MutableMapping[Hashable, "DNSQueryResult"]):
+    """LRU cache whose entries expire at their answer TTL, like a stub cache.
+
+    Each entry lives for the result's TTL clamped to ``[min_ttl, max_ttl]``;
+    a result without a TTL lives ``min_ttl`` (0: not cached). Beyond
+    ``max_entries`` the least recently used entry is evicted. Lookups through
+    :meth:`get` (and ``[]``/``in``) count hits and misses; expired entries
+    are dropped when looked up or when the cache needs room. Expiry times
+    are kept in a min-heap, so making room never scans the whole cache.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        min_ttl: float = 0.0,
+        max_ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[DNSQueryResult, float]]" = (
+            OrderedDict()
+        )
+        # (expires_at, tiebreak, key); entries for keys since replaced,
+        # evicted or deleted are skipped when they reach the top
+        self._expiries: List[Tuple[float, int, Hashable]] = []
+        self._tiebreak = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lifetime(self, result: "DNSQueryResult") -> float:
+        """Seconds ``result`` may be served from the cache."""
+        ttl = float(result.ttl) if result.ttl is not None else 0.0
+        ttl = max(ttl, self.min_ttl)
+        if self.max_ttl is not None:
+            ttl = min(ttl, self.max_ttl)
+        return ttl
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple["DNSQueryResult", float]]:
+        """Return ``(result, seconds of TTL left)`` for a live entry, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, expires_at = entry
+        remaining = expires_at - self._clock()
+        if remaining <= 0:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result, remaining
+
+    def __getitem__(self, key: Hashable) -> "DNSQueryResult":
+        entry = self.get_entry(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry[0]
+
+    def __setitem__(self, key: Hashable, result: "DNSQueryResult") -> None:
+        lifetime = self.lifetime(result)
+        if lifetime <= 0 or self.max_entries <= 0:
+            self._entries.pop(key, None)
+            return
+        expires_at = self._clock() + lifetime
+        self._entries[key] = (result, expires_at)
+        self._entries.move_to_end(key)
+        heapq.heappush(self._expiries, (expires_at, next(self._tiebreak), key))
+        if len(self._expiries) > 2 * self.max_entries:
+            self._compact_expiries()
+        if len(self._entries) > self.max_entries:
+            self._purge_expired()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self._entries[key]
+
+    def __contains__(self, key: object) -> bool:
+        return self.get_entry(key) is not None
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._expiries.clear()
+
+    def _purge_expired(self) -> None:
+        """Drop expired entries, soonest expiry first, off the heap."""
+        now = self._clock()
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now:
+            expires_at, _tiebreak, key = heapq.heappop(expiries)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+                self.expirations += 1
+
+    def _compact_expiries(self) -> None:
+        """Rebuild the heap from live entries once stale ones dominate it.
+
+        It then holds at most ``max_entries + 1`` items, so this runs at most
+        once per ``max_entries`` inserts.
+        """
+        self._expiries = [
+            (expires_at, next(self._tiebreak), key)
+            for key, (_result, expires_at) in self._entries.items()
+        ]
+        heapq.heapify(self._expiries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
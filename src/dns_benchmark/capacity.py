@@ -0,0 +1,174 @@
+"""Step-wise load ramp that finds a resolver's saturation point."""
+
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from dns_benchmark.core import DNSQueryEngine, QueryProtocol, QueryStatus
+
+CAPACITY_MODES = ("concurrency", "rate")
+
+
+@dataclass
+class CapacityStep:
+    """Measurements at one load level of a capacity ramp."""
+
+    load: float  # concurrency, or offered queries per second in rate mode
+    queries: int
+    duration_s: float
+    achieved_qps: float
+    success_rate: float
+    error_rate: float
+    timeout_rate: float
+    p50_ms: float
+    p99_ms: float
+    breach: Optional[str] = None  # which SLO this step broke, if any
+
+
+@dataclass
+class CapacityReport:
+    """Throughput-vs-latency curve of a ramp and where it saturated."""
+
+    resolver_name: str
+    resolver_ip: str
+    mode: str
+    slo_p99_ms: float
+    slo_error_rate: float
+    steps: List[CapacityStep] = field(default_factory=list)
+
+    @property
+    def saturation(self) -> Optional[CapacityStep]:
+        """The knee: the last within-SLO step before the first breach.
+
+        None if the first step already breached.
+        """
+        knee = None
+        for step in self.steps:
+            if step.breach is not None:
+                break
+            knee = step
+        return knee
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        saturation = self.saturation
+        d["saturation"] = asdict(saturation) if saturation else None
+        return d
+
+
+def ramp(start: float, maximum: float, factor: float = 2.0) -> List[float]:
+    """Geometric load levels from ``start`` up to and including ``maximum``."""
+    if start <= 0 or factor <= 1:
+        raise ValueError("start must be positive and factor greater than 1")
+    levels = []
+    load = start
+    while load < maximum:
+        levels.append(load)
+        load *= factor
+    levels.append(maximum)
+    return levels
+
+
+def _slo_breach(
+    step: CapacityStep, slo_p99_ms: float, slo_error_rate: float
+) -> Optional[str]:
+    if step.error_rate > slo_error_rate:
+        return f"error rate {step.error_rate:.1f}% > {slo_error_rate:.1f}%"
+    if step.p99_ms > slo_p99_ms:
+        return f"p99 {step.p99_ms:.1f} ms > {slo_p99_ms:.1f} ms"
+    return None
+
+
+async def find_capacity(
+    resolver: Dict[str, str],
+    domains: List[str],
+    levels: List[float],
+    mode: str = "concurrency",
+    queries_per_step: int = 500,
+    slo_p99_ms: float = 100.0,
+    slo_error_rate: float = 1.0,
+    record_types: Optional[List[str]] = None,
+    protocol: QueryProtocol = QueryProtocol.PLAIN,
+    doh_urls: Optional[Dict[str, str]] = None,
+    engine_options: Optional[Dict[str, Any]] = None,
+    on_step: Optional[Callable[[CapacityStep], None]] = None,
+) -> CapacityReport:
+    """Drive one resolver at increasing load until an SLO is breached.
+
+    Each level runs ``queries_per_step`` queries (the domain list is cycled)
+    on a fresh :class:`DNSQueryEngine`: in "concurrency" mode the level is
+    ``max_concurrent_queries``, in "rate" mode it is the open-loop offered
+    rate. The ramp stops after the first step whose p99 latency or error
+    rate (in percent) exceeds the SLO.
+
+    Args:
+        engine_options: Extra DNSQueryEngine keyword arguments, e.g. timeout
+        on_step: Called with each step as soon as it is measured
+    """
+    if mode not in CAPACITY_MODES:
+        raise ValueError(f"Unsupported capacity mode: {mode}")
+    if not domains:
+        raise ValueError("At least one domain is required")
+    record_types = record_types or ["A"]
+    per_iteration = len(domains) * len(record_types)
+    iterations = max(1, math.ceil(queries_per_step / per_iteration))
+    report = CapacityReport(
+        resolver_name=resolver["name"],
+        resolver_ip=resolver["ip"],
+        mode=mode,
+        slo_p99_ms=slo_p99_ms,
+        slo_error_rate=slo_error_rate,
+    )
+
+    for load in levels:
+        options: Dict[str, Any] = {"max_retries": 0, "decode_answers": False}
+        options.update(engine_options or {})
+        if mode == "concurrency":
+            options["max_concurrent_queries"] = int(load)
+        engine = DNSQueryEngine(**options)
+        start = time.perf_counter_ns()
+        try:
+            results = await engine.run_benchmark(
+                [resolver],
+                domains,
+                record_types,
+                iterations=iterations,
+                protocol=protocol,
+                doh_urls=doh_urls,
+                prewarm_connections=protocol in (QueryProtocol.DOT, QueryProtocol.TCP),
+                rate=load if mode == "rate" else None,
+            )
+        finally:
+            await engine.close()
+        duration = (time.perf_counter_ns() - start) / 1e9
+
+        latencies = [
+            r.latency_ms
+            for r in results
+            if r.status in (QueryStatus.SUCCESS, QueryStatus.DNSSEC_FAILED)
+        ]
+        succeeded = sum(1 for r in results if r.status == QueryStatus.SUCCESS)
+        timeouts = sum(1 for r in results if r.status == QueryStatus.TIMEOUT)
+        total = len(results)
+        step = CapacityStep(
+            load=load,
+            queries=total,
+            duration_s=duration,
+            achieved_qps=len(latencies) / duration if duration > 0 else 0.0,
+            success_rate=succeeded / total * 100,
+            error_rate=(total - len(latencies)) / total * 100,
+            timeout_rate=timeouts / total * 100,
+            p50_ms=float(np.percentile(latencies, 50)) if latencies else math.inf,
+            p99_ms=float(np.percentile(latencies, 99)) if latencies else math.inf,
+        )
+        step.breach = _slo_breach(step, slo_p99_ms, slo_error_rate)
+        report.steps.append(step)
+        if on_step is not None:
+            on_step(step)
+        if step.breach is not None:
+            break
+
+    return report
@@ -1,11 +1,10 @@
-import asyncio
 import json
 import math
 import os
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, cast
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
 
 import click
 import pyfiglet
@@ -14,7 +13,9 @@ from tqdm import tqdm
 
 from dns_benchmark import __version__
 from dns_benchmark.analysis import BenchmarkAnalyzer
+from dns_benchmark.capacity import CapacityStep, find_capacity, ramp
 from dns_benchmark.core import (
+    ADDRESS_FAMILIES,
     DNSQueryEngine,
     DNSQueryResult,
     DomainManager,
@@ -28,6 +29,15 @@ from dns_benchmark.exporters import (
     ExportBundle,
     PDFExporter,
 )
+from dns_benchmark.loops import (
+    EVENT_LOOPS,
+    resolve_event_loop,
+    run as run_event_loop,
+    uvloop_available,
+)
+from dns_benchmark.parallel import SHARD_MODES, run_sharded_benchmark
+from dns_benchmark.selfbench import run_self_benchmark
+from dns_benchmark.table import ResultTable
 from dns_benchmark.utils.messages import (
     error,
     info,
@@ -46,14 +56,18 @@ def _resolve_protocol_and_doh_urls(
     dot: bool,
     doh_url: Optional[str],
     resolvers: List[Dict[str, str]],
+    tcp: bool = False,
 ) -> Tuple[QueryProtocol, Dict[str, str]]:
     """
     Validate protocol flags and build resolver_ip -> doh_url mapping.
     Fails fast with a clear message before any queries run.
     """
 
-    if doh and dot:
-        raise click.UsageError("--doh and --dot are mutually exclusive.")
+    if doh + dot + tcp > 1:
+        raise click.UsageError("--doh, --dot and --tcp are mutually exclusive.")
+
+    if tcp:
+        return QueryProtocol.TCP, {}
 
     if not doh and not dot:
         return QueryProtocol.PLAIN, {}
@@ -102,6 +116,24 @@ def _resolve_protocol_and_doh_urls(
     return QueryProtocol.DOH, url_map
 
 
+def _event_loop_callback(ctx: click.Context, param: click.Parameter, value: str) -> str:
+    """Resolve --event-loop up front, so a missing uvloop is a usage error."""
+    try:
+        return resolve_event_loop(value)
+    except RuntimeError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+_event_loop_option = click.option(
+    "--event-loop",
+    type=click.Choice(EVENT_LOOPS, case_sensitive=False),
+    default="auto",
+    show_default=True,
+    callback=_event_loop_callback,
+    help="Event loop that runs the queries; auto uses uvloop when installed",
+)
+
+
 @click.group()
 @click.version_option(__version__, prog_name="DNS Benchmark Tool")
 def cli() -> None:
@@ -129,10 +161,28 @@ def cli() -> None:
 
 def create_progress_bar(total: int, desc: str) -> Any:
     return tqdm(
-        total=total, desc=info(desc), bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}"
+        total=total,
+        desc=info(desc),
+        bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}{postfix}",
     )
 
 
+def update_progress_bar(
+    progress_bar: Any, completed: int, engine: Optional[DNSQueryEngine] = None
+) -> None:
+    """Move the bar to ``completed`` and show the engine's live failure rates."""
+    progress_bar.n = completed  # Absolute position
+    if engine is not None and completed:
+        stats = engine.progress_stats()
+        failed = completed - stats[QueryStatus.SUCCESS.value]
+        progress_bar.set_postfix_str(
+            f"failed {failed / completed:.1%}, "
+            f"timeouts {stats[QueryStatus.TIMEOUT.value] / completed:.1%}",
+            refresh=False,
+        )
+    progress_bar.refresh()
+
+
 class FeedbackManager:
     """Manages feedback prompt display logic with persistence."""
 
@@ -342,10 +392,172 @@ def reset_feedback() -> None:
     click.echo(click.style("✓ Feedback state reset", fg="green"))
 
 
+def _echo_stream_handshakes(engine: DNSQueryEngine, protocol: QueryProtocol) -> None:
+    """Report DoT/TCP handshakes done before and during the measured queries."""
+    if protocol == QueryProtocol.DOT:
+        label, report = "DoT", engine.dot_prewarm_report
+        pool_stats = engine.get_dot_pool_stats()
+    else:
+        label, report = "TCP", engine.tcp_prewarm_report
+        pool_stats = engine.get_tcp_pool_stats()
+    prewarmed = [ms for r in report.values() for ms in r["handshake_ms"]]
+    if prewarmed:
+        click.echo(
+            info(
+                f"{label}: {len(prewarmed)} connection(s) pre-established "
+                f"(avg handshake {sum(prewarmed) / len(prewarmed):.1f} ms, "
+                "excluded from query latency)"
+            )
+        )
+    lazy = [ms for stats in pool_stats.values() for ms in stats["lazy_handshake_ms"]]
+    if lazy:
+        click.echo(
+            warning(
+                f"{label}: {len(lazy)} handshake(s) inside measured queries "
+                f"(avg {sum(lazy) / len(lazy):.1f} ms, counted as queue wait)"
+            )
+        )
+
+
+def _echo_connections(engine: DNSQueryEngine) -> None:
+    """Report connection setup cost and reuse for each DoT/TCP/DoH pool."""
+    for row in engine.get_connection_stats():
+        parts = [f"{row['connections']} connection(s)"]
+        if row["reconnects"]:
+            parts.append(f"{row['reconnects']} reconnect(s)")
+        if row["avg_connect_ms"] is not None:
+            parts.append(f"connect {row['avg_connect_ms']:.1f} ms")
+        if row["avg_handshake_ms"] is not None:
+            parts.append(f"TLS handshake {row['avg_handshake_ms']:.1f} ms")
+        if row["resumed"]:
+            parts.append(
+                f"{row['resumed']} resumed / {row['full_handshakes']} full handshake(s)"
+            )
+        parts.append(f"{row['queries_per_connection']:.1f} queries/connection")
+        click.echo(
+            info(f"{row['protocol'].upper()} {row['host']}: " + ", ".join(parts))
+        )
+
+
+def _select_family(
+    resolvers: List[Dict[str, str]], family: str, race: bool, quiet: bool
+) -> List[Dict[str, str]]:
+    """Resolvers to query over ``family``, warning about missing addresses."""
+    if not quiet:
+        for resolver in resolvers:
+            ipv4, ipv6 = ResolverManager.resolver_addresses(resolver)
+            lacking = [
+                label
+                for label, address in (("IPv4", ipv4), ("IPv6", ipv6))
+                if address is None and family in (label[-1], "both")
+            ]
+            if lacking:
+                click.echo(
+                    warning(
+                        f"{resolver['name']}: no {' or '.join(lacking)} address, "
+                        "not queried over it"
+                    )
+                )
+    return ResolverManager.for_family(resolvers, family, race=race)
+
+
+def _connection_summary(pooled: Any) -> str:
+    """One summary line: cold and warm pooled queries, latency and wait.
+
+    A cold query's connect and handshake count as client-side wait, not
+    latency, so the average wait is shown next to the average latency.
+    """
+    parts = []
+    for state, label in (("cold", "cold queries"), ("warm", "warm")):
+        rows = pooled[pooled["connection"] == state]
+        parts.append(
+            f"{len(rows)} {label}"
+            + (
+                f" (avg {rows['latency_ms'].mean():.2f} ms"
+                f" + {rows['queue_wait_ms'].mean():.2f} ms wait)"
+                if len(rows)
+                else ""
+            )
+        )
+    return "Connections: " + ", ".join(parts)
+
+
+def _family_summary(df: Any) -> str:
+    """One summary line: queries and average latency per address family."""
+    parts = []
+    for family in ("IPv4", "IPv6"):
+        family_df = df[df["family"] == family]
+        if len(family_df):
+            latencies = family_df[family_df["completed"]]["latency_ms"]
+            parts.append(
+                f"{family} {len(family_df)} queries"
+                + (f" (avg {latencies.mean():.2f} ms)" if len(latencies) else "")
+            )
+    return "Address families: " + (", ".join(parts) or "none")
+
+
+def _echo_families(analyzer: BenchmarkAnalyzer) -> None:
+    """Report each resolver's queries, success and latency per address family."""
+    for row in analyzer.get_family_statistics():
+        latency = (
+            f", avg {row['avg_latency']:.2f} ms"
+            if row["avg_latency"] is not None
+            else ""
+        )
+        click.echo(
+            info(
+                f"{row['resolver_name']} over {row['family']} ({row['resolver_ip']}): "
+                f"{row['total_queries']} queries ({row['share']:.0f}%), "
+                f"{row['success_rate']:.1f}% success{latency}"
+            )
+        )
+
+
+def _echo_open_loop(engine: DNSQueryEngine) -> None:
+    """Report offered vs achieved load of an open-loop (--rate) run."""
+    report = engine.open_loop_report
+    if not report:
+        return
+    click.echo(
+        info(
+            f"Open loop ({report['arrival']}): offered {report['offered_qps']:.1f} "
+            f"qps, achieved {report['achieved_qps']:.1f} qps, "
+            f"peak outstanding {report['peak_outstanding']}"
+        )
+    )
+    if report["missed_schedule"] or report["backlogged"]:
+        click.echo(
+            warning(
+                f"Open loop: {report['missed_schedule']} send(s) missed their "
+                f"schedule (max lag {report['max_schedule_lag_ms']:.1f} ms), "
+                f"{report['backlogged']} queued for a concurrency slot; "
+                "both delays are included in latency"
+            )
+        )
+
+
+def _echo_circuit_breakers(engine: DNSQueryEngine) -> None:
+    """Warn about resolvers whose circuit breaker skipped queries."""
+    for ip, stats in engine.get_circuit_stats().items():
+        if stats["trips"]:
+            click.echo(
+                warning(
+                    f"Circuit breaker: {ip} tripped {stats['trips']} time(s), "
+                    f"{stats['skipped']} queries skipped (status circuit_open)"
+                )
+            )
+
+
 # =================== Benchmark command
 @cli.command()
 @click.option("--doh", is_flag=True, default=False, help="Use DNS-over-HTTPS.")
 @click.option("--dot", is_flag=True, default=False, help="Use DNS-over-TLS.")
+@click.option(
+    "--tcp",
+    is_flag=True,
+    default=False,
+    help="Use plain DNS over persistent, pipelined TCP connections.",
+)
 @click.option(
     "--doh-url",
     default=None,
@@ -374,7 +586,33 @@ def reset_feedback() -> None:
 )
 @click.option("--timeout", default=5.0, help="Query timeout in seconds")
 @click.option("--max-concurrent", default=100, help="Maximum concurrent queries")
+@click.option(
+    "--max-per-resolver",
+    type=int,
+    default=None,
+    help="Max in-flight queries per resolver (resolver JSON may override "
+    'with "max_concurrent")',
+)
 @click.option("--retries", default=2, help="Number of retries for failed queries")
+@click.option(
+    "--circuit-breaker",
+    type=int,
+    default=None,
+    help="Skip a resolver's queries after this many consecutive failures "
+    "(reported as circuit_open), probing again after --circuit-cooldown",
+)
+@click.option(
+    "--circuit-cooldown",
+    default=30.0,
+    show_default=True,
+    help="Seconds a tripped circuit stays open before a probe query",
+)
+@click.option(
+    "--adaptive-timeout",
+    is_flag=True,
+    help="Retry plain DNS after a per-resolver timeout from smoothed RTT "
+    "(--timeout stays the upper bound and applies to the last attempt)",
+)
 @click.option(
     "--use-defaults", is_flag=True, help="Use default resolvers and sample domains"
 )
@@ -388,6 +626,24 @@ def reset_feedback() -> None:
 @click.option("--iterations", "-i", default=1, help="Number of iterations")
 @click.option("--warmup", is_flag=True, help="Run warmup queries before benchmark")
 @click.option("--use-cache", is_flag=True, help="Allow cache usage across iterations")
+@click.option(
+    "--cache-size",
+    default=10_000,
+    show_default=True,
+    help="With --use-cache: max cached answers (least recently used evicted)",
+)
+@click.option(
+    "--cache-min-ttl",
+    default=0.0,
+    show_default=True,
+    help="With --use-cache: floor on answer TTLs (s)",
+)
+@click.option(
+    "--cache-max-ttl",
+    type=float,
+    default=None,
+    help="With --use-cache: cap on answer TTLs (s)",
+)
 @click.option(
     "--warmup-fast",
     is_flag=True,
@@ -396,10 +652,131 @@ def reset_feedback() -> None:
 @click.option(
     "--include-charts", is_flag=True, help="Include charts in Excel and PDF exports"
 )
+@click.option(
+    "--dot-pool-min",
+    default=1,
+    show_default=True,
+    help="DoT/TCP: connections per resolver to keep open (opened up front with --prewarm)",
+)
+@click.option(
+    "--dot-pool-max",
+    default=1,
+    show_default=True,
+    help="DoT/TCP: max connections per resolver; more are opened when all are busy",
+)
+@click.option(
+    "--prewarm",
+    is_flag=True,
+    help="DoT/TCP: open connections before the first measured query",
+)
+@click.option(
+    "--doh-method",
+    type=click.Choice(["post", "get"], case_sensitive=False),
+    default="post",
+    show_default=True,
+    help="DoH: send queries as POST bodies or as cache-friendly GET ?dns=",
+)
+@click.option(
+    "--doh-max-connections",
+    default=100,
+    show_default=True,
+    help="DoH: max connections per URL authority",
+)
+@click.option(
+    "--doh-max-keepalive",
+    default=20,
+    show_default=True,
+    help="DoH: idle keep-alive connections per URL authority",
+)
+@click.option(
+    "--doh-max-streams",
+    type=int,
+    default=None,
+    help="DoH: max requests in flight per URL authority (HTTP/2 streams)",
+)
+@click.option(
+    "--doh-random-id",
+    is_flag=True,
+    help="DoH: send a random DNS message ID instead of 0 (defeats HTTP caching)",
+)
+@click.option(
+    "--decode-answers",
+    is_flag=True,
+    help="Fully decode responses and include answer records in the JSON export",
+)
+@click.option(
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Open-loop mode: send this many queries per second on a schedule; "
+    "latency is measured from each scheduled send time",
+)
+@click.option(
+    "--arrival",
+    type=click.Choice(["fixed", "poisson"], case_sensitive=False),
+    default="fixed",
+    show_default=True,
+    help="Open-loop arrival process (with --rate)",
+)
+@click.option(
+    "--hedge-percentile",
+    type=click.FloatRange(0, 100),
+    default=None,
+    help="Send a duplicate query when the first has not answered within this "
+    "percentile of the resolver's recent latencies; first answer wins",
+)
+@click.option(
+    "--hedge-to",
+    default=None,
+    help="Resolver (IP or name) that receives hedge copies (default: same resolver)",
+)
+@click.option(
+    "--hedge-initial-delay",
+    default=100.0,
+    show_default=True,
+    help="Hedge delay in ms until enough latency samples are collected",
+)
+@click.option(
+    "--family",
+    type=click.Choice(ADDRESS_FAMILIES),
+    default=None,
+    help="Query each resolver over IPv4, IPv6 or both (IPv6 addresses from "
+    "the resolver database when not given)",
+)
+@click.option(
+    "--happy-eyeballs",
+    is_flag=True,
+    help="With --family both: race IPv6 against IPv4 per query, as a "
+    "dual-stack client would, instead of measuring each separately",
+)
+@click.option(
+    "--happy-eyeballs-delay",
+    default=250.0,
+    show_default=True,
+    help="Happy eyeballs: ms to wait for an IPv6 answer before also trying IPv4",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Worker processes, each with its own engine and event loop "
+    "(concurrency, per-resolver and --rate settings apply per worker's share)",
+)
+@click.option(
+    "--shard-by",
+    type=click.Choice(SHARD_MODES, case_sensitive=False),
+    default="query",
+    show_default=True,
+    help="With --workers: split the plan query by query, or give each "
+    "worker whole resolvers",
+)
+@_event_loop_option
 def benchmark(
     # New
     doh: bool,
     dot: bool,
+    tcp: bool,
     doh_url: Optional[str],
     dnssec_validate: bool,
     resolvers: Optional[str],
@@ -409,7 +786,11 @@ def benchmark(
     formats: str,
     timeout: float,
     max_concurrent: int,
+    max_per_resolver: Optional[int],
     retries: int,
+    circuit_breaker: Optional[int],
+    circuit_cooldown: float,
+    adaptive_timeout: bool,
     use_defaults: bool,
     quiet: bool,
     domain_stats: bool,
@@ -420,7 +801,30 @@ def benchmark(
     warmup: bool,
     warmup_fast: bool,
     use_cache: bool,
+    cache_size: int,
+    cache_min_ttl: float,
+    cache_max_ttl: Optional[float],
     include_charts: bool,
+    dot_pool_min: int,
+    dot_pool_max: int,
+    prewarm: bool,
+    doh_method: str,
+    doh_max_connections: int,
+    doh_max_keepalive: int,
+    doh_max_streams: Optional[int],
+    doh_random_id: bool,
+    decode_answers: bool,
+    rate: Optional[float],
+    arrival: str,
+    hedge_percentile: Optional[float],
+    hedge_to: Optional[str],
+    hedge_initial_delay: float,
+    family: Optional[str],
+    happy_eyeballs: bool,
+    happy_eyeballs_delay: float,
+    workers: int,
+    shard_by: str,
+    event_loop: str,
 ) -> None:
     """Run DNS benchmark test."""
 
@@ -473,6 +877,19 @@ def benchmark(
         click.echo(error(f"Error loading resolvers: {e}"))
         return
 
+    if happy_eyeballs and family != "both":
+        raise click.UsageError("--happy-eyeballs requires --family both.")
+    if family is not None:
+        if doh:
+            raise click.UsageError(
+                "--family applies to plain, TCP and DoT queries; "
+                "DoH URLs pick their own address."
+            )
+        resolver_list = _select_family(resolver_list, family, happy_eyeballs, quiet)
+        if not resolver_list:
+            click.echo(error(f"No resolver has an address for --family {family}"))
+            return
+
     # Load domains with error handling
     try:
         if use_defaults:
@@ -497,6 +914,7 @@ def benchmark(
         protocol, doh_urls = _resolve_protocol_and_doh_urls(
             doh=doh,
             dot=dot,
+            tcp=tcp,
             doh_url=doh_url,
             resolvers=resolver_list,
         )
@@ -529,6 +947,7 @@ def benchmark(
     protocol, doh_urls = _resolve_protocol_and_doh_urls(
         doh=doh,
         dot=dot,
+        tcp=tcp,
         doh_url=doh_url,
         resolvers=resolver_list,
     )
@@ -540,11 +959,27 @@ def benchmark(
         click.echo(info(f"- Record types: {', '.join(record_type_list)}"))
         click.echo(info(f"- Iterations: {iterations}"))
         click.echo(info(f"- Total queries: {total_queries}"))
+        if workers > 1:
+            click.echo(
+                info(f"- Workers: {workers} processes (sharded by {shard_by.lower()})")
+            )
         if use_cache:
             click.echo(info("- Cache enabled: queries may be reused across iterations"))
+        if happy_eyeballs:
+            click.echo(
+                info(
+                    "- Address family: IPv6 raced against IPv4 "
+                    f"(happy eyeballs, {happy_eyeballs_delay:g} ms delay)"
+                )
+            )
+        elif family is not None:
+            label = "IPv4 + IPv6" if family == "both" else f"IPv{family}"
+            click.echo(info(f"- Address family: {label}"))
 
         # New
-        if protocol != QueryProtocol.PLAIN:
+        if protocol == QueryProtocol.DOH:
+            click.echo(info(f"- Protocol: DOH ({doh_method.upper()})"))
+        elif protocol != QueryProtocol.PLAIN:
             click.echo(info(f"- Protocol: {protocol.value.upper()}"))
 
         if dnssec_validate:
@@ -574,20 +1009,44 @@ def benchmark(
 
     # New
     try:
-        engine = DNSQueryEngine(
+        engine_options: Dict[str, Any] = dict(
             max_concurrent_queries=max_concurrent,
+            max_concurrent_per_resolver=max_per_resolver,
             timeout=timeout,
             max_retries=retries,
+            adaptive_timeout=adaptive_timeout,
+            circuit_breaker_threshold=circuit_breaker,
+            circuit_breaker_cooldown=circuit_cooldown,
+            hedge_percentile=hedge_percentile,
+            hedge_initial_delay_ms=hedge_initial_delay,
+            hedge_resolver=(
+                ResolverManager.parse_resolvers_input(hedge_to)[0] if hedge_to else None
+            ),
+            happy_eyeballs_delay_ms=happy_eyeballs_delay if happy_eyeballs else None,
             enable_cache=use_cache,
+            cache_max_entries=cache_size,
+            cache_min_ttl=cache_min_ttl,
+            cache_max_ttl=cache_max_ttl,
             # DO bit is only set when --dnssec-validate is passed.
             # enable_dnssec=True sets the DO bit (requests RRSIG records).
             # enforce_dnssec=True fails queries where the AD flag is absent.
             # Both are off by default to avoid latency overhead on normal benchmarks.
             enable_dnssec=dnssec_validate,
             enforce_dnssec=dnssec_validate,
+            dot_min_connections=dot_pool_min,
+            dot_max_connections=dot_pool_max,
+            doh_method=doh_method,
+            doh_max_connections=doh_max_connections,
+            doh_max_keepalive=doh_max_keepalive,
+            doh_max_streams=doh_max_streams,
+            doh_zero_id=not doh_random_id,
+            # Header-only parsing unless answer records are wanted
+            decode_answers=decode_answers,
         )
+        engine = DNSQueryEngine(**engine_options)
 
         progress_bar = None
+        progress_callback: Optional[Callable[[int, int], None]] = None
         if not quiet:
             progress_bar = create_progress_bar(total_queries, "DNS Queries")
 
@@ -599,31 +1058,50 @@ def benchmark(
                 """
                 try:
                     if progress_bar:
-                        progress_bar.n = completed  # Absolute position
-                        progress_bar.refresh()
+                        # Worker processes' status counts stay in the workers
+                        update_progress_bar(
+                            progress_bar, completed, engine if workers == 1 else None
+                        )
                 except Exception:
                     # Never allow progress callback errors to interrupt benchmarking
                     pass
 
+            progress_callback = _progress_cb
             engine.set_progress_callback(_progress_cb)
 
-        # Single coroutine to avoid closed event loop from two asyncio.run calls
-        async def _run() -> List[DNSQueryResult]:
-            results = await engine.run_benchmark(
-                resolvers=resolver_list,
-                domains=domain_list,
-                record_types=record_type_list,
-                iterations=iterations,
-                warmup=warmup,
-                warmup_fast=warmup_fast,
-                use_cache=use_cache,
-                protocol=protocol,
-                doh_urls=doh_urls,
-            )
-            await engine.close()
-            return results
+        run_options: Dict[str, Any] = dict(
+            resolvers=resolver_list,
+            domains=domain_list,
+            record_types=record_type_list,
+            iterations=iterations,
+            warmup=warmup,
+            warmup_fast=warmup_fast,
+            use_cache=use_cache,
+            protocol=protocol,
+            doh_urls=doh_urls,
+            prewarm_connections=prewarm,
+            rate=rate,
+            arrival=arrival.lower(),
+        )
 
-        results = asyncio.run(_run())
+        # Single coroutine to avoid closed event loop from two run_event_loop calls
+        async def _run() -> ResultTable:
+            table = await engine.run_benchmark_table(**run_options)
+            await engine.close()
+            return table
+
+        results: ResultTable
+        if workers > 1:
+            results = run_sharded_benchmark(
+                workers,
+                shard_by=shard_by.lower(),
+                engine_options=engine_options,
+                progress_callback=progress_callback,
+                event_loop=event_loop,
+                **run_options,
+            )
+        else:
+            results = run_event_loop(_run(), event_loop)
 
         if progress_bar:
             progress_bar.close()
@@ -631,14 +1109,24 @@ def benchmark(
         duration = time.time() - start_time
         if not quiet:
             click.echo(success(f"Benchmark completed in {duration:.2f} seconds"))
-
-        # Analyze results
+            # Worker engines' connection, schedule and breaker stats stay
+            # in the worker processes
+            if workers == 1:
+                if protocol in (QueryProtocol.DOT, QueryProtocol.TCP):
+                    _echo_stream_handshakes(engine, protocol)
+                _echo_connections(engine)
+                _echo_open_loop(engine)
+                _echo_circuit_breakers(engine)
+
+        # Analyze results; the analyzer's columnar table also feeds the exports
         analyzer = BenchmarkAnalyzer(results)
         overall_stats = analyzer.get_overall_statistics()
 
         # New
         if not quiet:
             click.echo(info("=== BENCHMARK SUMMARY ==="))
+            df = analyzer.df
+            query_count = len(df)
             summary_lines = [
                 f"Total queries: {overall_stats['total_queries']}",
                 f"Successful: {overall_stats['successful_queries']} ({overall_stats['overall_success_rate']:.2f}%)",
@@ -647,18 +1135,38 @@ def benchmark(
                 f"Fastest resolver: {overall_stats['fastest_resolver']}",
                 f"Slowest resolver: {overall_stats['slowest_resolver']}",
                 f"Protocol: {protocol.value.upper()}",
-                f"DNSSEC AD validated: {sum(1 for r in results if r.dnssec_validated)} / {len(results)} queries",
+                f"DNSSEC AD validated: {int(df['dnssec_validated'].sum())} / {query_count} queries",
             ]
             # Add iteration info if multiple iterations
             if iterations > 1:
-                cache_hits = sum(1 for r in results if r.cache_hit)
+                cache_hits = int(df["cache_hit"].sum())
                 summary_lines.append(f"Iterations: {iterations}")
                 if use_cache and cache_hits > 0:
-                    summary_lines.append(
-                        f"Cache hits: {cache_hits} ({cache_hits / len(results) * 100:.1f}%)"
-                    )
+                    cache_line = f"Cache hits: {cache_hits} ({cache_hits / query_count * 100:.1f}%)"
+                    if workers == 1:
+                        cache_stats = engine.get_cache_stats()
+                        cache_line += (
+                            f", {cache_stats['expirations']} expired, "
+                            f"{cache_stats['evictions']} evicted"
+                        )
+                    summary_lines.append(cache_line)
+            pooled = df[df["connection"] != ""]
+            if len(pooled):
+                summary_lines.append(_connection_summary(pooled))
+            if family is not None:
+                summary_lines.append(_family_summary(df))
+            if hedge_percentile is not None and query_count:
+                hedged = int(df["hedged"].sum())
+                hedge_wins = int(df["hedge_won"].sum())
+                summary_lines.append(
+                    f"Hedged: {hedged} duplicate queries "
+                    f"(+{hedged / query_count * 100:.1f}% load), "
+                    f"{hedge_wins} answered first"
+                )
 
             click.echo(summary_box(summary_lines))
+            if family is not None:
+                _echo_families(analyzer)
 
         # Optional analytics
         domain_stats_data = analyzer.get_domain_statistics() if domain_stats else None
@@ -666,6 +1174,14 @@ def benchmark(
             analyzer.get_record_type_statistics() if record_type_stats else None
         )
         error_stats_data = analyzer.get_error_statistics() if error_breakdown else None
+        family_stats_data = analyzer.get_family_statistics() if family else None
+        # Worker processes' connection pools are not visible from here
+        pool_stats = engine.get_connection_stats() if workers == 1 else []
+        connection_records = (
+            [r.to_dict() for r in engine.get_connection_records()]
+            if workers == 1
+            else []
+        )
 
         # Export results
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -682,7 +1198,7 @@ def benchmark(
         try:
             if "csv" in output_formats:
                 CSVExporter.export_raw_results(
-                    results, str(output_path / f"{base_filename}_raw.csv")
+                    analyzer.table, str(output_path / f"{base_filename}_raw.csv")
                 )
                 CSVExporter.export_summary_statistics(
                     analyzer, str(output_path / f"{base_filename}_summary.csv")
@@ -702,18 +1218,29 @@ def benchmark(
                         error_stats_data,
                         str(output_path / f"{base_filename}_errors.csv"),
                     )
+                if pool_stats:
+                    CSVExporter.export_connection_statistics(
+                        pool_stats,
+                        str(output_path / f"{base_filename}_connections.csv"),
+                    )
+                if family_stats_data:
+                    CSVExporter.export_family_statistics(
+                        family_stats_data,
+                        str(output_path / f"{base_filename}_families.csv"),
+                    )
                 if export_progress:
                     export_progress.update(1)
 
             if "excel" in output_formats:
                 ExcelExporter.export_results(
-                    results,
+                    analyzer.table,
                     analyzer,
                     str(output_path / f"{base_filename}.xlsx"),
                     domain_stats=domain_stats_data,
                     record_type_stats=record_type_stats_data,
                     error_stats=error_stats_data,
                     include_charts=include_charts,
+                    pool_stats=pool_stats,
                 )
                 if export_progress:
                     export_progress.update(1)
@@ -721,7 +1248,7 @@ def benchmark(
             if "pdf" in output_formats:
                 try:
                     PDFExporter.export_results(
-                        results,
+                        analyzer.table,
                         analyzer,
                         str(output_path / f"{base_filename}.pdf"),
                         include_success_chart=include_charts,
@@ -737,12 +1264,14 @@ def benchmark(
             # JSON export now tracked in progress
             if json_output:
                 ExportBundle.export_json(
-                    results,
+                    analyzer.table,
                     analyzer,
                     domain_stats=domain_stats_data,
                     record_type_stats=record_type_stats_data,
                     error_stats=error_stats_data,
                     output_path=str(output_path / f"{base_filename}.json"),
+                    pool_stats=pool_stats,
+                    connections=connection_records,
                 )
                 if export_progress:
                     export_progress.update(1)
@@ -780,6 +1309,12 @@ def benchmark(
 @cli.command()
 @click.option("--doh", is_flag=True, default=False, help="Use DNS-over-HTTPS.")
 @click.option("--dot", is_flag=True, default=False, help="Use DNS-over-TLS.")
+@click.option(
+    "--tcp",
+    is_flag=True,
+    default=False,
+    help="Use plain DNS over persistent, pipelined TCP connections.",
+)
 @click.option(
     "--doh-url",
     default=None,
@@ -808,6 +1343,21 @@ def benchmark(
 )
 @click.option("--timeout", default=5.0, help="Query timeout in seconds")
 @click.option("--max-concurrent", default=100, help="Maximum concurrent queries")
+@click.option(
+    "--max-per-resolver",
+    default=10,
+    show_default=True,
+    help="Max in-flight queries per resolver, so one slow resolver cannot "
+    "take every slot",
+)
+@click.option(
+    "--circuit-breaker",
+    default=0,
+    show_default=True,
+    help="Stop querying a resolver after this many consecutive failures "
+    "(0: off). Speeds up whole-database runs with unreachable entries; "
+    "skipped queries count as failures in the ranking",
+)
 @click.option(
     "--category",
     "-c",
@@ -817,9 +1367,11 @@ def benchmark(
     "--output", "-o", help="Optional: save results to file (supports .txt, .json, .csv)"
 )
 @click.option("--quiet", is_flag=True, help="Suppress progress output")
+@_event_loop_option
 def top(
     doh: bool,
     dot: bool,
+    tcp: bool,
     doh_url: Optional[str],
     dnssec_validate: bool,
     limit: int,
@@ -828,9 +1380,12 @@ def top(
     record_types: str,
     timeout: float,
     max_concurrent: int,
+    max_per_resolver: int,
+    circuit_breaker: int,
     category: Optional[str],
     output: Optional[str],
     quiet: bool,
+    event_loop: str,
 ) -> None:
     """Find and rank the top performing DNS resolvers.
 
@@ -882,6 +1437,7 @@ def top(
         protocol, doh_urls = _resolve_protocol_and_doh_urls(
             doh=doh,
             dot=dot,
+            tcp=tcp,
             doh_url=doh_url,
             resolvers=resolver_list,
         )
@@ -910,10 +1466,16 @@ def top(
     try:
         engine = DNSQueryEngine(
             max_concurrent_queries=max_concurrent,
+            max_concurrent_per_resolver=max_per_resolver,
+            # Opt-in: unreachable entries are skipped instead of timing out
+            # every query, at the cost of counting the skips as failures
+            circuit_breaker_threshold=circuit_breaker or None,
             timeout=timeout,
             enable_cache=False,
             enable_dnssec=dnssec_validate,
             enforce_dnssec=dnssec_validate,
+            # Rankings only need latency and status — skip answer decoding
+            decode_answers=False,
         )
 
         if progress_bar:
@@ -921,14 +1483,13 @@ def top(
             def _progress_cb(completed: int, total: int) -> None:
                 try:
                     if progress_bar:
-                        progress_bar.n = completed
-                        progress_bar.refresh()
+                        update_progress_bar(progress_bar, completed, engine)
                 except Exception:
                     pass
 
             engine.set_progress_callback(_progress_cb)
 
-        # Single coroutine to avoid closed event loop from two asyncio.run calls
+        # Single coroutine to avoid closed event loop from two run_event_loop calls
         async def _run() -> List[DNSQueryResult]:
             results = await engine.run_benchmark(
                 resolvers=resolver_list,
@@ -941,7 +1502,7 @@ def top(
             await engine.close()
             return results
 
-        results = asyncio.run(_run())
+        results = run_event_loop(_run(), event_loop)
 
         if progress_bar:
             progress_bar.close()
@@ -949,6 +1510,7 @@ def top(
         duration = time.time() - start_time
         if not quiet:
             click.echo(success(f"Benchmark completed in {duration:.2f} seconds"))
+            _echo_circuit_breakers(engine)
 
         # Analyze and rank
         analyzer = BenchmarkAnalyzer(results)
@@ -1117,6 +1679,12 @@ def top(
 @cli.command()
 @click.option("--doh", is_flag=True, default=False, help="Use DNS-over-HTTPS.")
 @click.option("--dot", is_flag=True, default=False, help="Use DNS-over-TLS.")
+@click.option(
+    "--tcp",
+    is_flag=True,
+    default=False,
+    help="Use plain DNS over persistent, pipelined TCP connections.",
+)
 @click.option(
     "--doh-url",
     default=None,
@@ -1142,9 +1710,11 @@ def top(
 @click.option("--output", "-o", help="Optional: save comparison to file")
 @click.option("--quiet", is_flag=True, help="Suppress progress output")
 @click.option("--show-details", is_flag=True, help="Show detailed per-domain breakdown")
+@_event_loop_option
 def compare(
     doh: bool,
     dot: bool,
+    tcp: bool,
     doh_url: Optional[str],
     dnssec_validate: bool,
     resolvers: Tuple[str],
@@ -1156,6 +1726,7 @@ def compare(
     output: Optional[str],
     quiet: bool,
     show_details: bool,
+    event_loop: str,
 ) -> None:
     """Compare specific DNS resolvers side-by-side.
 
@@ -1213,6 +1784,7 @@ def compare(
         protocol, doh_urls = _resolve_protocol_and_doh_urls(
             doh=doh,
             dot=dot,
+            tcp=tcp,
             doh_url=doh_url,
             resolvers=resolver_list,
         )
@@ -1249,6 +1821,8 @@ def compare(
             enable_cache=False,
             enable_dnssec=dnssec_validate,
             enforce_dnssec=dnssec_validate,
+            # Rankings only need latency and status — skip answer decoding
+            decode_answers=False,
         )
 
         if progress_bar:
@@ -1256,14 +1830,13 @@ def compare(
             def _progress_cb(completed: int, total: int) -> None:
                 try:
                     if progress_bar:
-                        progress_bar.n = completed
-                        progress_bar.refresh()
+                        update_progress_bar(progress_bar, completed, engine)
                 except Exception:
                     pass
 
             engine.set_progress_callback(_progress_cb)
 
-        # Single coroutine to avoid closed event loop from two asyncio.run calls
+        # Single coroutine to avoid closed event loop from two run_event_loop calls
         async def _run() -> List[DNSQueryResult]:
             results = await engine.run_benchmark(
                 resolvers=resolver_list,
@@ -1277,7 +1850,7 @@ def compare(
             await engine.close()
             return results
 
-        results = asyncio.run(_run())
+        results = run_event_loop(_run(), event_loop)
 
         if progress_bar:
             progress_bar.close()
@@ -1416,6 +1989,12 @@ def compare(
 @cli.command()
 @click.option("--doh", is_flag=True, default=False, help="Use DNS-over-HTTPS.")
 @click.option("--dot", is_flag=True, default=False, help="Use DNS-over-TLS.")
+@click.option(
+    "--tcp",
+    is_flag=True,
+    default=False,
+    help="Use plain DNS over persistent, pipelined TCP connections.",
+)
 @click.option(
     "--doh-url",
     default=None,
@@ -1454,9 +2033,11 @@ def compare(
 @click.option(
     "--use-defaults", is_flag=True, help="Use default resolvers and sample domains"
 )
+@_event_loop_option
 def monitoring(
     doh: bool,
     dot: bool,
+    tcp: bool,
     doh_url: Optional[str],
     dnssec_validate: bool,
     resolvers: Optional[str],
@@ -1467,6 +2048,7 @@ def monitoring(
     alert_failure_rate: float,
     output: Optional[str],
     use_defaults: bool,
+    event_loop: str,
 ) -> None:
     """Continuously monitor DNS resolver performance.
 
@@ -1512,6 +2094,7 @@ def monitoring(
         protocol, doh_urls = _resolve_protocol_and_doh_urls(
             doh=doh,
             dot=dot,
+            tcp=tcp,
             doh_url=doh_url,
             resolvers=resolver_list,
         )
@@ -1551,6 +2134,7 @@ def monitoring(
         enable_cache=False,
         enable_dnssec=dnssec_validate,
         enforce_dnssec=dnssec_validate,
+        decode_answers=False,
     )
 
     try:
@@ -1573,7 +2157,7 @@ def monitoring(
                 # Do NOT close engine here — it is reused on next interval
                 return results
 
-            results = asyncio.run(_run())
+            results = run_event_loop(_run(), event_loop)
 
             analyzer = BenchmarkAnalyzer(results)
             resolver_stats_list = analyzer.get_resolver_statistics()
@@ -1640,9 +2224,7 @@ def monitoring(
     finally:
         # Use a fresh event loop for cleanup since the previous one may be closed
         try:
-            loop = asyncio.new_event_loop()
-            loop.run_until_complete(engine.close())
-            loop.close()
+            run_event_loop(engine.close(), event_loop)
         except Exception:
             pass  # best-effort cleanup — don't crash on exit
         if log_file:
@@ -1653,6 +2235,267 @@ def monitoring(
             click.echo(success(f"Monitoring log saved to: {output}"))
 
 
+# ===================== Capacity Command
+@cli.command()
+@click.option("--doh", is_flag=True, default=False, help="Use DNS-over-HTTPS.")
+@click.option("--dot", is_flag=True, default=False, help="Use DNS-over-TLS.")
+@click.option(
+    "--tcp",
+    is_flag=True,
+    default=False,
+    help="Use plain DNS over persistent, pipelined TCP connections.",
+)
+@click.option("--doh-url", default=None, help="DoH URL (required if not in db).")
+@click.option("--resolver", "-r", required=True, help="Resolver to drive (IP or name)")
+@click.option("--domains", "-d", help="Domain file or comma-separated list")
+@click.option(
+    "--record-types",
+    "-t",
+    default="A",
+    help="DNS record types to query (comma-separated)",
+)
+@click.option(
+    "--mode",
+    type=click.Choice(["concurrency", "rate"], case_sensitive=False),
+    default="concurrency",
+    show_default=True,
+    help="Ramp concurrent queries, or open-loop offered QPS",
+)
+@click.option("--start", default=10.0, show_default=True, help="Load of the first step")
+@click.option(
+    "--max", "max_load", default=1000.0, show_default=True, help="Load of last step"
+)
+@click.option(
+    "--factor", default=2.0, show_default=True, help="Load multiplier per step"
+)
+@click.option(
+    "--queries-per-step", default=500, show_default=True, help="Queries per step"
+)
+@click.option(
+    "--slo-p99", default=100.0, show_default=True, help="p99 latency SLO (ms)"
+)
+@click.option(
+    "--slo-error-rate",
+    default=1.0,
+    show_default=True,
+    help="Error rate SLO (%), timeouts included",
+)
+@click.option("--timeout", default=2.0, show_default=True, help="Query timeout (s)")
+@click.option(
+    "--max-concurrent",
+    default=1000,
+    show_default=True,
+    help="Rate mode: concurrency cap (queries beyond it queue, adding latency)",
+)
+@click.option("--output", "-o", help="Save the curve to a .json or .csv file")
+@_event_loop_option
+def capacity(
+    doh: bool,
+    dot: bool,
+    tcp: bool,
+    doh_url: Optional[str],
+    resolver: str,
+    domains: Optional[str],
+    record_types: str,
+    mode: str,
+    start: float,
+    max_load: float,
+    factor: float,
+    queries_per_step: int,
+    slo_p99: float,
+    slo_error_rate: float,
+    timeout: float,
+    max_concurrent: int,
+    output: Optional[str],
+    event_loop: str,
+) -> None:
+    """Ramp load on one resolver until it breaches the latency/error SLO.
+
+    Examples:
+        dns-benchmark capacity -r 192.0.2.53 --max 512
+        dns-benchmark capacity -r 192.0.2.53 --mode rate --start 500 --max 20000
+        dns-benchmark capacity -r Cloudflare --slo-p99 50 --output curve.csv
+    """
+    try:
+        resolver_list = ResolverManager.parse_resolvers_input(resolver)
+    except Exception as e:
+        click.echo(error(f"Error loading resolver: {e}"))
+        return
+    if len(resolver_list) != 1:
+        raise click.UsageError("capacity drives exactly one resolver.")
+
+    if domains:
+        try:
+            domain_list = DomainManager.parse_domains_input(domains)
+        except Exception as e:
+            click.echo(error(f"Error loading domains: {e}"))
+            return
+    else:
+        domain_list = DomainManager.get_sample_domains()
+    record_type_list = [rt.strip().upper() for rt in record_types.split(",")]
+
+    protocol, doh_urls = _resolve_protocol_and_doh_urls(
+        doh=doh, dot=dot, tcp=tcp, doh_url=doh_url, resolvers=resolver_list
+    )
+    try:
+        levels = ramp(start, max_load, factor)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    mode = mode.lower()
+    unit = "qps" if mode == "rate" else "in flight"
+    click.echo(
+        info(
+            f"Ramping {resolver_list[0]['name']} ({resolver_list[0]['ip']}) "
+            f"over {len(levels)} step(s); SLO p99 <= {slo_p99:g} ms, "
+            f"errors <= {slo_error_rate:g}%"
+        )
+    )
+
+    def _echo_step(step: CapacityStep) -> None:
+        line = (
+            f"  {step.load:>8g} {unit}: {step.achieved_qps:8.1f} qps  "
+            f"p50 {step.p50_ms:7.2f} ms  p99 {step.p99_ms:7.2f} ms  "
+            f"errors {step.error_rate:5.1f}% (timeouts {step.timeout_rate:.1f}%)"
+        )
+        click.echo(warning(line + f"  ✗ {step.breach}") if step.breach else line)
+
+    report = run_event_loop(
+        find_capacity(
+            resolver_list[0],
+            domain_list,
+            levels,
+            mode=mode,
+            queries_per_step=queries_per_step,
+            slo_p99_ms=slo_p99,
+            slo_error_rate=slo_error_rate,
+            record_types=record_type_list,
+            protocol=protocol,
+            doh_urls=doh_urls,
+            engine_options={
+                "timeout": timeout,
+                "max_concurrent_queries": max_concurrent,
+            },
+            on_step=_echo_step,
+        ),
+        event_loop,
+    )
+
+    saturation = report.saturation
+    if saturation is None:
+        click.echo(error("SLO breached at the first step; lower --start"))
+    elif report.steps[-1].breach is None:
+        last = report.steps[-1]
+        click.echo(
+            success(
+                f"No SLO breach up to {last.load:g} {unit} "
+                f"({last.achieved_qps:.1f} qps); raise --max to go further"
+            )
+        )
+    else:
+        click.echo(
+            success(
+                f"Saturation point: {saturation.load:g} {unit} → "
+                f"{saturation.achieved_qps:.1f} qps at p99 "
+                f"{saturation.p99_ms:.2f} ms"
+            )
+        )
+
+    if output:
+        output_path = Path(output)
+        if output_path.suffix.lower() == ".csv":
+            import csv
+
+            with open(output_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(
+                    [
+                        "Load",
+                        "Queries",
+                        "Achieved QPS",
+                        "P50 (ms)",
+                        "P99 (ms)",
+                        "Error Rate (%)",
+                        "Timeout Rate (%)",
+                        "SLO Breach",
+                    ]
+                )
+                for step in report.steps:
+                    writer.writerow(
+                        [
+                            step.load,
+                            step.queries,
+                            f"{step.achieved_qps:.1f}",
+                            f"{step.p50_ms:.2f}",
+                            f"{step.p99_ms:.2f}",
+                            f"{step.error_rate:.1f}",
+                            f"{step.timeout_rate:.1f}",
+                            step.breach or "",
+                        ]
+                    )
+        else:
+            export_data = {
+                "timestamp": datetime.now().isoformat(),
+                "protocol": protocol.value,
+                **report.to_dict(),
+            }
+            with open(output_path, "w") as f:
+                json.dump(export_data, f, indent=2)
+        click.echo(success(f"Capacity curve saved to: {output_path}"))
+
+
+# ===================== Self-benchmark Command
+@cli.command()
+@click.option(
+    "--queries",
+    default=20_000,
+    show_default=True,
+    help="Queries per event loop",
+)
+@click.option(
+    "--concurrency",
+    default=100,
+    show_default=True,
+    help="Maximum concurrent queries",
+)
+def selfbench(queries: int, concurrency: int) -> None:
+    """Measure the engine's own overhead on each event loop.
+
+    Queries go to a responder on 127.0.0.1 that answers instantly, so
+    throughput and latency reflect the client side only.
+    """
+    event_loops = ["asyncio"]
+    if uvloop_available():
+        event_loops.append("uvloop")
+    else:
+        click.echo(
+            warning(
+                "uvloop is not installed; measuring the asyncio loop only "
+                "(pip install dns-benchmark-tool[uvloop])"
+            )
+        )
+
+    reports = run_self_benchmark(event_loops, queries, concurrency)
+    for report in reports:
+        click.echo(
+            info(
+                f"{report.event_loop:<8} {report.qps:>9.0f} qps  "
+                f"p50 {report.p50_ms:.3f} ms  p99 {report.p99_ms:.3f} ms  "
+                f"({report.queries} queries, {report.errors} errors, "
+                f"{report.duration_s:.2f} s)"
+            )
+        )
+    if len(reports) == 2:
+        base, fast = reports
+        click.echo(
+            success(
+                f"uvloop vs asyncio: {(fast.qps / base.qps - 1) * 100:+.1f}% "
+                f"throughput, {fast.p50_ms - base.p50_ms:+.3f} ms p50 and "
+                f"{fast.p99_ms - base.p99_ms:+.3f} ms p99 overhead"
+            )
+        )
+
+
 # ===================== List Defaults Command
 @cli.command()
 def list_defaults() -> None:
@@ -1,29 +1,68 @@
 """Core DNS benchmarking functionality."""
 
 import asyncio
+import contextvars
+import functools
 import ipaddress
+import itertools
 import json
+import random
 import ssl
-import struct
+import sys
 import time
-import uuid
-from collections import defaultdict
-from dataclasses import asdict, dataclass, field
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field, replace
 from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypedDict,
+    cast,
+)
 
 import click
-import dns.asyncresolver
+import dns.asyncquery
 import dns.exception
 import dns.flags
 import dns.message
 import dns.name
+import dns.rcode
 import dns.rdatatype
 import httpx
 import idna
 
+from dns_benchmark.cache import CacheKey, QueryCache
+from dns_benchmark.transport import (
+    ConnectionRecord,
+    DoHTransport,
+    RTTEstimator,
+    StreamConnection,
+    StreamPool,
+    TLSSessionContext,
+    UDPTransport,
+)
 from dns_benchmark.utils.messages import error, warning
+from dns_benchmark.wire import (
+    QueryTemplate,
+    QueryTemplateCache,
+    parse_response,
+    summarize_message,
+)
+
+if TYPE_CHECKING:
+    from dns_benchmark.table import ResultTable
 
 
 class QueryStatus(Enum):
@@ -35,17 +74,45 @@ class QueryStatus(Enum):
     UNKNOWN_ERROR = "unknown_error"
     DNSSEC_FAILED = "dnssec_failed"
     TLS_ERROR = "tls_error"
+    CIRCUIT_OPEN = "circuit_open"  # not sent: resolver's circuit breaker open
 
 
 class QueryProtocol(Enum):
-    PLAIN = "plain"  # traditional DNS over UDP/TCP, dnspython will handle protocol selection and fallback
+    PLAIN = "plain"  # traditional DNS over UDP, falling back to TCP on truncation
     DOH = "doh"
     DOT = "dot"
+    TCP = "tcp"  # plain DNS over persistent, pipelined TCP streams (no TLS)
 
 
-@dataclass
+# Results are kept by the million: no per-instance __dict__ where the
+# interpreter supports slotted dataclasses (3.10+)
+_DATACLASS_SLOTS: Dict[str, Any] = (
+    {"slots": True} if sys.version_info >= (3, 10) else {}
+)
+# Query IDs are unique within a process and increase in creation order
+_QUERY_IDS = itertools.count(1)
+# Shared by every header-only or failed result instead of a new list each
+_EMPTY_ANSWERS: Tuple[str, ...] = ()
+ADDRESS_FAMILIES = ("4", "6", "both")
+
+
+@functools.lru_cache(maxsize=4096)
+def address_family(address: str) -> Optional[str]:
+    """Family ("IPv4" or "IPv6") of an IP address; None otherwise (e.g. a hostname)."""
+    try:
+        return f"IPv{ipaddress.ip_address(address).version}"
+    except ValueError:
+        return None
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class DNSQueryResult:
-    """Result of a single DNS query."""
+    """Result of a single DNS query.
+
+    Resolver, domain and record type strings are interned, so millions of
+    results share one copy of each. ``answers`` is only filled when the
+    engine decodes answers.
+    """
 
     resolver_ip: str
     resolver_name: str
@@ -55,7 +122,7 @@ class DNSQueryResult:
     end_time: float
     latency_ms: float
     status: QueryStatus
-    answers: List[str]
+    answers: Sequence[str]
     ttl: Optional[int]
     error_message: Optional[str] = None
     attempt_number: int = 1
@@ -63,7 +130,41 @@ class DNSQueryResult:
     dnssec_validated: bool = False
     protocol: QueryProtocol = QueryProtocol.PLAIN
     iteration: int = 1  # which iteration this query belongs to
-    query_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    query_id: int = field(default_factory=_QUERY_IDS.__next__)
+    # Records of the queried type; set even when answers were not decoded
+    answers_count: int = 0
+    # Time spent waiting for a per-resolver slot, then for a global slot
+    resolver_wait_ms: float = 0.0
+    global_wait_ms: float = 0.0
+    # Client-side time before the send: slot waits plus setup such as a DoT
+    # pool checkout or handshake. latency_ms covers only send to response.
+    queue_wait_ms: float = 0.0
+    first_byte_ms: float = 0.0  # send to first response read
+    parse_ms: float = 0.0
+    # Hedged runs only: a duplicate query was sent, and it answered first
+    hedged: bool = False
+    hedge_won: bool = False
+    # Open-loop (--rate) runs only: how late the query was dispatched
+    # relative to its scheduled send time. latency_ms then runs from the
+    # scheduled time, so queueing behind a slow resolver is not hidden.
+    schedule_lag_ms: float = 0.0
+    # Pooled DoT/TCP/DoH answers only: "cold" if the query opened the
+    # connection it was sent on (so it paid the connect and handshake),
+    # "warm" if the connection was already open
+    connection: Optional[str] = None
+    # "IPv4" or "IPv6": the family of resolver_ip, the address queried.
+    # None for DoH, whose URL rather than the resolver IP picks the address.
+    family: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        self.resolver_ip = sys.intern(self.resolver_ip)
+        self.resolver_name = sys.intern(self.resolver_name)
+        self.domain = sys.intern(self.domain)
+        self.record_type = sys.intern(self.record_type)
+        if self.family is None and self.protocol != QueryProtocol.DOH:
+            self.family = address_family(self.resolver_ip)
+        if self.answers and not self.answers_count:
+            self.answers_count = len(self.answers)
 
     def to_dict(self) -> Dict[str, Any]:
         d = asdict(self)
@@ -72,6 +173,257 @@ class DNSQueryResult:
         return d
 
 
+class _RetryLater(Exception):
+    """Raised instead of sleeping when a retry is handed back to the scheduler."""
+
+    def __init__(self, attempt: int, delay: float) -> None:
+        super().__init__(f"retry attempt {attempt} in {delay:.3f}s")
+        self.attempt = attempt
+        self.delay = delay
+
+
+class _Timings(TypedDict):
+    """Timing fields of a DNSQueryResult, as measured by a _QuerySlot."""
+
+    latency_ms: float
+    queue_wait_ms: float
+    first_byte_ms: float
+    parse_ms: float
+    resolver_wait_ms: float
+    global_wait_ms: float
+
+
+class _QuerySlot:
+    """Per-resolver then global concurrency slot for one query, and its timer.
+
+    The resolver slot is taken first, so queries stuck behind a slow resolver
+    never hold global slots that other resolvers could use. Wait times
+    accumulate across attempts.
+
+    All durations use ``perf_counter_ns``. The query path marks ``sent()``,
+    ``received()`` and ``parsed()``; ``timings()`` then splits the attempt
+    into client-side wait (slot waits plus anything between taking the slot
+    and sending, such as a DoT pool checkout or handshake), on-wire latency
+    and parse time. ``sent()`` may be marked again before the response, e.g.
+    once a transport gets past its own queueing; the last mark counts.
+    """
+
+    def __init__(
+        self,
+        resolver_semaphore: Optional[asyncio.Semaphore],
+        global_semaphore: asyncio.Semaphore,
+    ) -> None:
+        self._resolver = resolver_semaphore
+        self._global = global_semaphore
+        self.resolver_wait_ms = 0.0
+        self.global_wait_ms = 0.0
+        self.setup_ms = 0.0  # inside the slot, before the send
+        self.parse_ms = 0.0
+        self._setup_before_ms = 0.0  # setup_ms of earlier attempts
+        self._entered_ns = 0
+        self._sent_ns = 0
+        self._first_byte_ns = 0
+        self._received_ns = 0
+
+    async def __aenter__(self) -> "_QuerySlot":
+        start = time.perf_counter_ns()
+        if self._resolver is not None:
+            await self._resolver.acquire()
+        got_resolver = time.perf_counter_ns()
+        try:
+            await self._global.acquire()
+        except BaseException:
+            if self._resolver is not None:
+                self._resolver.release()
+            raise
+        self._entered_ns = time.perf_counter_ns()
+        self._sent_ns = self._first_byte_ns = self._received_ns = 0
+        self._setup_before_ms = self.setup_ms
+        self.parse_ms = 0.0
+        self.resolver_wait_ms += (got_resolver - start) / 1e6
+        self.global_wait_ms += (self._entered_ns - got_resolver) / 1e6
+        taken = _SLOT_TAKEN.get()
+        if taken is not None and not taken.done():
+            taken.set_result((self.resolver_wait_ms, self.global_wait_ms))
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._global.release()
+        if self._resolver is not None:
+            self._resolver.release()
+
+    def sent(self) -> None:
+        self._sent_ns = time.perf_counter_ns()
+        self.setup_ms = self._setup_before_ms + (self._sent_ns - self._entered_ns) / 1e6
+
+    def received(self) -> None:
+        """Mark a response read; the first mark of an attempt is first byte."""
+        self._received_ns = time.perf_counter_ns()
+        if not self._first_byte_ns:
+            self._first_byte_ns = self._received_ns
+
+    def parsed(self) -> None:
+        self.parse_ms += (time.perf_counter_ns() - self._received_ns) / 1e6
+
+    @property
+    def wire_ms(self) -> float:
+        """Send to first response of the current attempt."""
+        return (self._first_byte_ns - self._sent_ns) / 1e6
+
+    def timings(self) -> _Timings:
+        """Timing fields for the current attempt's result.
+
+        Without a response (timeouts, errors) latency runs up to now, from
+        the send or, if nothing was sent, from taking the slot.
+        """
+        now = time.perf_counter_ns()
+        sent = self._sent_ns or self._entered_ns or now
+        received = self._received_ns or now
+        return {
+            "latency_ms": (received - sent) / 1e6,
+            "queue_wait_ms": self.resolver_wait_ms
+            + self.global_wait_ms
+            + self.setup_ms,
+            "first_byte_ms": ((self._first_byte_ns or received) - sent) / 1e6,
+            "parse_ms": self.parse_ms,
+            "resolver_wait_ms": self.resolver_wait_ms,
+            "global_wait_ms": self.global_wait_ms,
+        }
+
+
+class CircuitBreaker:
+    """Stops sending queries to a resolver that keeps failing.
+
+    Closed until ``threshold`` consecutive queries get no answer, then open:
+    queries are skipped for ``cooldown`` seconds. After that one probe is let
+    through (half-open); an answer closes the circuit, another failure opens
+    it for a new cooldown.
+    """
+
+    def __init__(self, threshold: int, cooldown: float = 30.0) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+        self.skipped = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a query may be sent now; claims the probe when half-open."""
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+            self.skipped += 1
+            return False
+        self.probing = True
+        return True
+
+    def abandon(self) -> None:
+        """The allowed query ended without an outcome (cancelled or requeued)."""
+        self.probing = False
+
+    def record(self, answered: bool) -> None:
+        self.probing = False
+        if answered:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "skipped": self.skipped,
+        }
+
+
+@dataclass
+class _WorkItem:
+    """One planned query on the scheduler's work queue."""
+
+    index: int
+    iteration: int
+    resolver: Dict[str, str]
+    domain: str
+    record_type: str
+    attempt: int = 0
+    parked_ms: float = 0.0  # time spent parked behind a full resolver
+
+
+# Work parked per resolver IP while that resolver is at its in-flight cap
+_Parked = Dict[str, Deque[Tuple[_WorkItem, int]]]
+
+# Receives each finished result with its plan index, in place of yielding it
+_Sink = Callable[[int, DNSQueryResult], None]
+
+# Hedge copies run with progress counting off; the hedging wrapper reports
+# one completed query however many copies it sent.
+_COUNT_PROGRESS: "contextvars.ContextVar[bool]" = contextvars.ContextVar(
+    "count_progress", default=True
+)
+
+# Set by a hedge's primary copy: resolved with its resolver and global slot
+# waits once it holds a slot, which is when the hedge delay starts
+_SlotWaits = Tuple[float, float]
+_SLOT_TAKEN: "contextvars.ContextVar[Optional[asyncio.Future[_SlotWaits]]]" = (
+    contextvars.ContextVar("slot_taken", default=None)
+)
+
+# Statuses that mean the resolver never answered, so a hedge copy still
+# in flight may yet do better
+_NO_ANSWER = (
+    QueryStatus.CIRCUIT_OPEN,
+    QueryStatus.TIMEOUT,
+    QueryStatus.CONNECTION_REFUSED,
+    QueryStatus.TLS_ERROR,
+    QueryStatus.UNKNOWN_ERROR,
+)
+_HEDGE_MIN_SAMPLES = 20
+_HEDGE_WINDOW = 1000
+
+# Open-loop arrival processes and how late a send may fire before it counts
+# as a missed schedule
+ARRIVAL_PROCESSES = ("fixed", "poisson")
+_SCHEDULE_TOLERANCE_S = 0.001
+
+
+def _deliver(
+    done: "asyncio.Queue[Tuple[int, Any]]",
+    sink: Optional[_Sink],
+    index: int,
+    result: DNSQueryResult,
+) -> None:
+    """Queue a finished result for the consumer, or hand it to ``sink``.
+
+    A sunk result only counts as done on the queue (``None``); an error
+    raised by the sink is queued in its place.
+    """
+    if sink is None:
+        done.put_nowait((index, result))
+        return
+    try:
+        sink(index, result)
+    except Exception as e:
+        done.put_nowait((index, e))
+    else:
+        done.put_nowait((index, None))
+
+
 class DNSQueryEngine:
     """Async DNS query engine with rate limiting and retry logic."""
 
@@ -85,41 +437,140 @@ class DNSQueryEngine:
         retry_backoff_base: float = 2.0,
         enable_dnssec: bool = False,
         enforce_dnssec: bool = False,  # True when --dnssec-validate passed
+        udp_sockets_per_resolver: int = 1,
+        dot_min_connections: int = 1,
+        dot_max_connections: int = 1,
+        doh_method: str = "POST",
+        doh_max_connections: int = 100,
+        doh_max_keepalive: int = 20,
+        doh_max_streams: Optional[int] = None,
+        doh_zero_id: bool = True,
+        decode_answers: bool = True,
+        max_concurrent_per_resolver: Optional[int] = None,
+        resolver_concurrency: Optional[Dict[str, int]] = None,
+        adaptive_timeout: bool = False,
+        min_timeout: float = 0.05,
+        hedge_percentile: Optional[float] = None,
+        hedge_initial_delay_ms: float = 100.0,
+        hedge_resolver: Optional[Dict[str, str]] = None,
+        happy_eyeballs_delay_ms: Optional[float] = None,
+        circuit_breaker_threshold: Optional[int] = None,
+        circuit_breaker_cooldown: float = 30.0,
+        cache_max_entries: int = 10_000,
+        cache_min_ttl: float = 0.0,
+        cache_max_ttl: Optional[float] = None,
+        dns_port: int = 53,
+        progress_interval: float = 0.1,
     ) -> None:
         self.max_concurrent_queries = max_concurrent_queries
         self.timeout = timeout
         self.max_retries = max_retries
+        # Plain DNS only: retransmit after a per-resolver timeout derived
+        # from smoothed RTT and its variance instead of the fixed timeout.
+        # The last attempt still waits the full timeout, so a slow answer
+        # is measured rather than reported as a timeout.
+        self.adaptive_timeout = adaptive_timeout
+        self.min_timeout = min_timeout
+        self._rtt_estimators: Dict[str, RTTEstimator] = {}
+        # Hedging: if a query has no answer after this percentile of the
+        # resolver's recent latencies (hedge_initial_delay_ms until enough
+        # samples), send a duplicate to hedge_resolver (default: the same
+        # resolver) and keep whichever answers first.
+        self.hedge_percentile = hedge_percentile
+        self.hedge_initial_delay_ms = hedge_initial_delay_ms
+        self.hedge_resolver = hedge_resolver
+        self._hedge_samples: Dict[str, Deque[float]] = {}
+        # Happy eyeballs (RFC 8305; None: off): a resolver with an "ipv6"
+        # address besides its IPv4 "ip" is queried over IPv6 first, and
+        # over IPv4 too if IPv6 has not answered after this delay.
+        self.happy_eyeballs_delay_ms = happy_eyeballs_delay_ms
+        # Per-resolver circuit breakers (None: off). Queries skipped while a
+        # circuit is open come back with status CIRCUIT_OPEN.
+        self.circuit_breaker_threshold = circuit_breaker_threshold
+        self.circuit_breaker_cooldown = circuit_breaker_cooldown
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
         # lazy-init async primitives to avoid creating them outside an event loop
         self.semaphore: Optional[asyncio.Semaphore] = None
         self._lock: Optional[asyncio.Lock] = None
+        # In-flight cap per resolver IP, enforced alongside the global one.
+        # None means no per-resolver cap; resolver_concurrency overrides it
+        # per IP, and a "max_concurrent" key in a resolver dict overrides
+        # both for the run that resolver dict is passed to.
+        self.max_concurrent_per_resolver = max_concurrent_per_resolver
+        self.resolver_concurrency: Dict[str, int] = dict(resolver_concurrency or {})
+        self._run_concurrency: Dict[str, int] = {}
+        self._resolver_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._resolver_semaphores_loop: Optional[asyncio.AbstractEventLoop] = None
         self.progress_callback: Optional[Callable[[int, int], None]] = None
         self.query_counter = 0
         self.total_queries = 0
+        # Completed queries by status, for live success/error rates. The
+        # callback fires at most once per progress_interval seconds (and on
+        # the last query); 0 calls it for every query.
+        self.status_counts: Dict[QueryStatus, int] = defaultdict(int)
+        self.progress_interval = progress_interval
+        self._progress_reported_at = float("-inf")
         self.enable_cache = enable_cache
-        self.cache: Dict[str, DNSQueryResult] = {}
+        # Bounded LRU; entries expire at their answer TTL (clamped)
+        self.cache = QueryCache(cache_max_entries, cache_min_ttl, cache_max_ttl)
         self.retry_backoff_multiplier = retry_backoff_multiplier
         self.retry_backoff_base = retry_backoff_base
         self.failed_resolvers: Dict[str, int] = defaultdict(int)
         self.enable_dnssec = enable_dnssec
         self.enforce_dnssec = enforce_dnssec
-
-        # Shared DoH clients and DoT connections, one per resolver IP.
-        # Reusing these avoids repeated TLS handshakes — biggest latency win
-        # for encrypted protocols. Cleaned up via engine.close().
+        # False: read rcode, flags, answer count and TTL from the wire header
+        # and skip decoding/stringifying answers (results get no answers)
+        self.decode_answers = decode_answers
+
+        # Shared DoH client pools (one per URL authority) and DoT connections
+        # (per resolver IP). Reusing these avoids repeated TLS handshakes —
+        # biggest latency win for encrypted protocols. Cleaned up via
+        # engine.close().
         # NOT thread-safe — safe only because asyncio is single-threaded.
         # Do not access from threads without adding locks.
-        self._doh_clients: Dict[str, httpx.AsyncClient] = {}
-        self._dot_connections: Dict[
-            str, Tuple[asyncio.StreamReader, asyncio.StreamWriter]
-        ] = {}
+        self._doh = DoHTransport(
+            method=doh_method,
+            max_connections=doh_max_connections,
+            max_keepalive=doh_max_keepalive,
+            max_streams=doh_max_streams,
+            zero_id=doh_zero_id,
+            timeout=timeout,
+        )
+        # DoT connections pipeline many queries on one TLS session; a reader
+        # task per connection hands responses back by message ID. Each
+        # resolver gets a pool of min..max such connections.
+        self.dot_min_connections = dot_min_connections
+        self.dot_max_connections = max(dot_min_connections, dot_max_connections)
+        self._dot_pools: Dict[str, StreamPool] = {}
+        # One TLS context per (resolver, SNI name), so reconnects resume the
+        # resolver's last TLS session instead of doing a full handshake.
+        self._tls_contexts: Dict[Tuple[str, str], TLSSessionContext] = {}
+        self.dot_prewarm_report: Dict[str, Dict[str, Any]] = {}
+        # Plain DNS over TCP uses the same pooled, pipelined streams without
+        # TLS (and the same pool sizes), so TCP and DoT runs against one
+        # resolver differ only by the TLS layer.
+        self._tcp_pools: Dict[str, StreamPool] = {}
+        self.tcp_prewarm_report: Dict[str, Dict[str, Any]] = {}
+        # Offered vs achieved load of the last open-loop (rate) run
+        self.open_loop_report: Dict[str, Any] = {}
+        # Long-lived UDP sockets for plain DNS, one transport per resolver IP.
+        # In-flight queries are matched back by message ID and question.
+        self.udp_sockets_per_resolver = udp_sockets_per_resolver
+        self.dns_port = dns_port
+        self._udp_transports: Dict[str, UDPTransport] = {}
+        # Query wire encoded once per (domain, type, DO bit); each send only
+        # patches the message ID.
+        self._query_templates = QueryTemplateCache()
 
     def set_progress_callback(self, callback: Callable[[int, int], None]) -> None:
         """Set callback for progress updates with completed/total counts."""
         self.progress_callback = callback
 
-    def _get_cache_key(self, resolver_ip: str, domain: str, record_type: str) -> str:
+    def _get_cache_key(
+        self, resolver_ip: str, domain: str, record_type: str
+    ) -> CacheKey:
         """Generate cache key for query."""
-        return f"{resolver_ip}:{domain}:{record_type}"
+        return (resolver_ip, domain.lower(), record_type)
 
     def _validate_resolver(self, resolver: Dict[str, str]) -> None:
         """Validate resolver configuration."""
@@ -135,72 +586,337 @@ class DNSQueryEngine:
         if self._lock is None:
             self._lock = asyncio.Lock()
 
-    async def _update_progress(self) -> None:
-        """Thread-safe progress update."""
-        await self._ensure_async_primitives()
-        assert self._lock is not None
-        async with self._lock:
-            self.query_counter += 1
-            if self.progress_callback:
-                self.progress_callback(self.query_counter, self.total_queries)
-
-    async def _get_doh_client(self, resolver_ip: str) -> httpx.AsyncClient:
-        """Return cached AsyncClient for this resolver, creating if needed."""
-        if resolver_ip not in self._doh_clients:
-            self._doh_clients[resolver_ip] = httpx.AsyncClient(
-                http2=True,
-                timeout=self.timeout,
-                verify=True,
+    def _resolver_limit(self, resolver_ip: str) -> Optional[int]:
+        limit = self._run_concurrency.get(resolver_ip)
+        if limit is not None:
+            return limit
+        return self.resolver_concurrency.get(
+            resolver_ip, self.max_concurrent_per_resolver
+        )
+
+    def _set_run_concurrency(self, limits: Dict[str, int]) -> None:
+        """Use ``limits`` as this run's per-resolver caps.
+
+        They replace the previous run's, so a reused engine (e.g. when
+        monitoring) never keeps caps from resolver dicts it is no longer
+        given. Semaphores of resolvers whose cap changed are rebuilt.
+        """
+        previous, self._run_concurrency = self._run_concurrency, limits
+        for ip in previous.keys() | limits.keys():
+            if previous.get(ip) != limits.get(ip):
+                self._resolver_semaphores.pop(ip, None)
+
+    def _resolver_semaphore(self, resolver_ip: str) -> Optional[asyncio.Semaphore]:
+        """Return this resolver's in-flight semaphore, or None if uncapped."""
+        limit = self._resolver_limit(resolver_ip)
+        if not limit:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._resolver_semaphores_loop is not loop:
+            self._resolver_semaphores.clear()
+            self._resolver_semaphores_loop = loop
+        semaphore = self._resolver_semaphores.get(resolver_ip)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limit)
+            self._resolver_semaphores[resolver_ip] = semaphore
+        return semaphore
+
+    def _query_slot(self, resolver_ip: str) -> _QuerySlot:
+        assert self.semaphore is not None
+        return _QuerySlot(self._resolver_semaphore(resolver_ip), self.semaphore)
+
+    def _update_progress(self, result: DNSQueryResult) -> None:
+        """Count a completed query and call the progress callback, throttled.
+
+        No lock: this runs on the event loop thread and never awaits.
+        """
+        if not _COUNT_PROGRESS.get():
+            return
+        self.query_counter += 1
+        self.status_counts[result.status] += 1
+        if self.progress_callback is None:
+            return
+        now = time.monotonic()
+        if (
+            self.query_counter >= self.total_queries
+            or now - self._progress_reported_at >= self.progress_interval
+        ):
+            self._progress_reported_at = now
+            self.progress_callback(self.query_counter, self.total_queries)
+
+    def progress_stats(self) -> Dict[str, int]:
+        """Live counters: completed, total, and completed queries per status."""
+        stats = {"completed": self.query_counter, "total": self.total_queries}
+        for status in QueryStatus:
+            stats[status.value] = self.status_counts.get(status, 0)
+        return stats
+
+    def _query_template(self, domain: str, record_type: str) -> QueryTemplate:
+        """Return the pre-encoded query for this question."""
+        return self._query_templates.get(domain, record_type, self.enable_dnssec)
+
+    def _rtt_estimator(self, resolver_ip: str) -> Optional[RTTEstimator]:
+        if not self.adaptive_timeout:
+            return None
+        estimator = self._rtt_estimators.get(resolver_ip)
+        if estimator is None:
+            estimator = RTTEstimator(self.timeout, self.min_timeout)
+            self._rtt_estimators[resolver_ip] = estimator
+        return estimator
+
+    def _attempt_timeout(self, resolver_ip: str, attempt: int) -> float:
+        """Timeout for one plain DNS attempt."""
+        estimator = self._rtt_estimator(resolver_ip)
+        if estimator is None or attempt == self.max_retries:
+            return self.timeout
+        return estimator.timeout()
+
+    def get_rtt_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Smoothed RTT, variance and current timeout per resolver IP."""
+        return {ip: e.stats() for ip, e in self._rtt_estimators.items()}
+
+    def _get_udp_transport(self, resolver_ip: str) -> UDPTransport:
+        """Return the shared UDP transport for this resolver, creating if needed."""
+        transport = self._udp_transports.get(resolver_ip)
+        if transport is None:
+            transport = UDPTransport(
+                resolver_ip, self.dns_port, sockets=self.udp_sockets_per_resolver
+            )
+            self._udp_transports[resolver_ip] = transport
+        return transport
+
+    def _get_dot_pool(self, resolver_ip: str, port: int = 853) -> StreamPool:
+        """Return the DoT connection pool for this resolver, creating if needed."""
+        pool = self._dot_pools.get(resolver_ip)
+        if pool is None:
+            pool = StreamPool(
+                resolver_ip,
+                port,
+                ssl_context=self._tls_context(resolver_ip),
+                min_connections=self.dot_min_connections,
+                max_connections=self.dot_max_connections,
+                connect_timeout=self.timeout,
             )
-        return self._doh_clients[resolver_ip]
+            self._dot_pools[resolver_ip] = pool
+        return pool
+
+    def _tls_context(
+        self, resolver_ip: str, server_name: Optional[str] = None
+    ) -> TLSSessionContext:
+        """Cached verifying TLS context for a resolver and SNI name.
+
+        The name defaults to the resolver IP, which is what DoT connections
+        send and verify the certificate against.
+        """
+        key = (resolver_ip, server_name or resolver_ip)
+        context = self._tls_contexts.get(key)
+        if context is None:
+            context = self._tls_contexts[key] = TLSSessionContext.client()
+        return context
+
+    def _get_tcp_pool(self, resolver_ip: str, port: Optional[int] = None) -> StreamPool:
+        """Return the plain TCP connection pool for this resolver, creating if needed."""
+        pool = self._tcp_pools.get(resolver_ip)
+        if pool is None:
+            pool = StreamPool(
+                resolver_ip,
+                self.dns_port if port is None else port,
+                ssl_context=None,
+                min_connections=self.dot_min_connections,
+                max_connections=self.dot_max_connections,
+                connect_timeout=self.timeout,
+            )
+            self._tcp_pools[resolver_ip] = pool
+        return pool
+
+    def _stream_pools(self, protocol: QueryProtocol) -> Dict[str, StreamPool]:
+        return self._dot_pools if protocol == QueryProtocol.DOT else self._tcp_pools
 
     async def _get_dot_connection(
         self,
         resolver_ip: str,
         port: int = 853,
-    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
-        """Return a cached DoT connection for this resolver, creating if needed.
+    ) -> Tuple[StreamConnection, bool]:
+        """Check out the least-loaded DoT connection for this resolver.
+
+        Dead connections (stream closed or bound to a previous event loop)
+        are evicted, and a new one is opened only when all open connections
+        are busy and the pool has room. Also returns whether this checkout
+        opened it (a cold query).
+        """
+        return await self._get_dot_pool(resolver_ip, port).acquire()
+
+    async def _evict_stream_connection(
+        self, protocol: QueryProtocol, resolver_ip: str, conn: StreamConnection
+    ) -> None:
+        """Drop and close one pooled DoT or TCP connection for this resolver."""
+        pool = self._stream_pools(protocol).get(resolver_ip)
+        if pool is not None:
+            pool.discard(conn)
+        else:
+            await conn.close()
+
+    async def prewarm_dot_connections(
+        self, resolvers: List[Dict[str, str]], port: int = 853
+    ) -> Dict[str, Dict[str, Any]]:
+        """Open every resolver's minimum DoT pool in parallel.
+
+        Handshakes done here are kept out of the measured query latencies.
 
-        If the cached connection is dead (writer closing), it is evicted and
-        a fresh connection is opened. This avoids repeated TLS handshakes
-        across queries to the same resolver.
+        Returns:
+            Dict keyed by resolver IP with ``handshake_ms`` (one entry per
+            connection opened) and ``error`` (None, or why a handshake failed).
+        """
+        return await self._prewarm_pools(
+            resolvers, [self._get_dot_pool(r["ip"], port) for r in resolvers]
+        )
+
+    async def prewarm_tcp_connections(
+        self, resolvers: List[Dict[str, str]], port: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Open every resolver's minimum plain TCP pool in parallel.
+
+        Returns:
+            Same shape as :meth:`prewarm_dot_connections`.
         """
-        existing = self._dot_connections.get(resolver_ip)
-        if existing:
-            reader, writer = existing
-            if not writer.is_closing():
-                return reader, writer
-            # Dead connection — evict and fall through to reconnect
-            del self._dot_connections[resolver_ip]
-
-        ssl_ctx = ssl.create_default_context()
-        ssl_ctx.verify_mode = ssl.CERT_REQUIRED
-        ssl_ctx.check_hostname = True
-
-        reader, writer = await asyncio.wait_for(
-            asyncio.open_connection(resolver_ip, port, ssl=ssl_ctx),
-            timeout=self.timeout,
+        return await self._prewarm_pools(
+            resolvers, [self._get_tcp_pool(r["ip"], port) for r in resolvers]
         )
-        self._dot_connections[resolver_ip] = (reader, writer)
-        return reader, writer
+
+    async def _prewarm_pools(
+        self, resolvers: List[Dict[str, str]], pools: List[StreamPool]
+    ) -> Dict[str, Dict[str, Any]]:
+        outcomes = await asyncio.gather(
+            *(pool.prewarm() for pool in pools), return_exceptions=True
+        )
+        report: Dict[str, Dict[str, Any]] = {}
+        for resolver, outcome in zip(resolvers, outcomes):
+            if isinstance(outcome, BaseException):
+                report[resolver["ip"]] = {
+                    "handshake_ms": [],
+                    "error": str(outcome) or type(outcome).__name__,
+                }
+            else:
+                report[resolver["ip"]] = {"handshake_ms": outcome, "error": None}
+        return report
+
+    def get_dot_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-resolver DoT pool sizes and handshake counts.
+
+        ``lazy_handshakes`` are connections opened inside a measured query,
+        so their handshake cost is included in that query's latency.
+        ``full_handshakes`` and ``resumed_handshakes`` split the TLS
+        handshakes by whether a previous session was resumed.
+        """
+        return self._pool_stats(self._dot_pools)
+
+    def get_tcp_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-resolver plain TCP pool sizes and connect counts.
+
+        Same shape as :meth:`get_dot_pool_stats`; a "handshake" here is the
+        TCP connect alone.
+        """
+        return self._pool_stats(self._tcp_pools)
+
+    @staticmethod
+    def _pool_stats(pools: Dict[str, StreamPool]) -> Dict[str, Dict[str, Any]]:
+        return {
+            ip: {
+                "connections": len(pool.connections),
+                "prewarmed_handshakes": len(pool.prewarm_handshakes_ms),
+                "lazy_handshakes": len(pool.lazy_handshakes_ms),
+                "lazy_handshake_ms": list(pool.lazy_handshakes_ms),
+                "evictions": pool.evictions,
+                "reconnects": pool.reconnects,
+                "full_handshakes": sum(r.resumed is False for r in pool.records),
+                "resumed_handshakes": sum(r.resumed is True for r in pool.records),
+            }
+            for ip, pool in pools.items()
+        }
+
+    def get_connection_records(self) -> List[ConnectionRecord]:
+        """Every DoT, TCP and DoH connection this engine has opened."""
+        pools = [*self._dot_pools.values(), *self._tcp_pools.values()]
+        return [r for pool in pools for r in pool.records] + self._doh.connections
+
+    def get_connection_stats(self) -> List[Dict[str, Any]]:
+        """Connection setup cost and reuse per protocol and host.
+
+        One row per DoT/TCP resolver IP or DoH URL authority: connections
+        opened (how many were prewarmed, and how many TLS handshakes were
+        full or resumed), queries sent on them, average connect and
+        handshake times and lifetime.
+        ``reconnects`` (DoT/TCP only) counts connections opened to replace
+        an evicted one.
+        """
+        reconnects = {
+            (protocol.value, ip): pool.reconnects
+            for protocol in (QueryProtocol.DOT, QueryProtocol.TCP)
+            for ip, pool in self._stream_pools(protocol).items()
+        }
+        groups: Dict[Tuple[str, str], List[ConnectionRecord]] = defaultdict(list)
+        for record in self.get_connection_records():
+            groups[(record.protocol, record.host)].append(record)
+
+        def _mean(values: List[float]) -> Optional[float]:
+            return sum(values) / len(values) if values else None
+
+        rows = []
+        for (protocol, host), records in groups.items():
+            queries = sum(r.queries for r in records)
+            versions = sorted({r.tls_version for r in records if r.tls_version})
+            rows.append(
+                {
+                    "protocol": protocol,
+                    "host": host,
+                    "connections": len(records),
+                    "prewarmed": sum(r.prewarmed for r in records),
+                    "full_handshakes": sum(r.resumed is False for r in records),
+                    "resumed": sum(bool(r.resumed) for r in records),
+                    "reconnects": reconnects.get((protocol, host)),
+                    "queries": queries,
+                    "queries_per_connection": queries / len(records),
+                    "avg_connect_ms": _mean(
+                        [r.connect_ms for r in records if r.connect_ms is not None]
+                    ),
+                    "avg_handshake_ms": _mean(
+                        [r.handshake_ms for r in records if r.handshake_ms is not None]
+                    ),
+                    "avg_lifetime_s": _mean([r.lifetime_s for r in records]),
+                    "tls_versions": ", ".join(versions) or None,
+                }
+            )
+        return rows
 
     async def close(self) -> None:
-        """Close all shared DoH clients and DoT connections.
+        """Close all shared UDP sockets, DoH clients and DoT/TCP connections.
 
         Must be awaited after run_benchmark completes — especially important
         in FastAPI where connections are reused across requests.
         """
-        for client in self._doh_clients.values():
-            await client.aclose()
-        self._doh_clients.clear()
+        await self._doh.close()
 
-        for _reader, writer in self._dot_connections.values():
-            writer.close()
-            try:
-                await writer.wait_closed()
-            except Exception:
-                pass
-        self._dot_connections.clear()
+        for pool in [*self._dot_pools.values(), *self._tcp_pools.values()]:
+            await pool.close()
+
+        for transport in self._udp_transports.values():
+            transport.close()
+        self._udp_transports.clear()
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with configurable base before attempt + 1."""
+        return float(self.retry_backoff_base**attempt * self.retry_backoff_multiplier)
+
+    async def _retry_backoff(self, attempt: int, defer_retry: bool) -> None:
+        """Sleep before the next attempt, or hand the retry to the scheduler.
+
+        With ``defer_retry`` the caller's worker is freed immediately: the
+        scheduler requeues the query to run ``first_attempt=attempt + 1``
+        once the backoff has elapsed.
+        """
+        if defer_retry:
+            raise _RetryLater(attempt + 1, self._retry_delay(attempt))
+        await asyncio.sleep(self._retry_delay(attempt))
 
     async def query_single(
         self,
@@ -210,65 +926,82 @@ class DNSQueryEngine:
         record_type: str = "A",
         use_cache: bool = True,
         iteration: int = 1,
+        first_attempt: int = 0,
+        defer_retry: bool = False,
     ) -> DNSQueryResult:
         """Execute a single DNS query with retry logic and caching."""
         await self._ensure_async_primitives()
         assert self.semaphore is not None
         # Check cache if enabled
         if self.enable_cache and use_cache:
-            cache_key = self._get_cache_key(resolver_ip, domain, record_type)
-            if cache_key in self.cache:
-                cached_result = self.cache[cache_key]
-                # Create new instance preserving original data but marking as cache hit
-                result = DNSQueryResult(
-                    **{
-                        **asdict(cached_result),
-                        "cache_hit": True,
-                        "iteration": iteration,
-                    }
+            lookup_start = time.perf_counter_ns()
+            entry = self.cache.get_entry(
+                self._get_cache_key(resolver_ip, domain, record_type)
+            )
+            if entry is not None:
+                cached_result, ttl_left = entry
+                now = time.time()
+                # Served like a stub cache would: local lookup latency and
+                # the TTL left on the entry; no time spent queueing
+                result = replace(
+                    cached_result,
+                    start_time=now,
+                    end_time=now,
+                    latency_ms=(time.perf_counter_ns() - lookup_start) / 1e6,
+                    ttl=int(ttl_left) if cached_result.ttl is not None else None,
+                    attempt_number=1,
+                    cache_hit=True,
+                    iteration=iteration,
+                    query_id=next(_QUERY_IDS),
+                    resolver_wait_ms=0.0,
+                    global_wait_ms=0.0,
+                    queue_wait_ms=0.0,
+                    first_byte_ms=0.0,
+                    parse_ms=0.0,
+                    schedule_lag_ms=0.0,
+                    hedged=False,
+                    hedge_won=False,
                 )
-                await self._update_progress()
+                self._update_progress(result)
                 return result
 
-        start_time = time.time()  # fallback; overwritten inside semaphore per attempt
+        start_time = time.time()  # fallback; overwritten at each send
+        transport = self._get_udp_transport(resolver_ip)
+        slot = self._query_slot(resolver_ip)
 
-        for attempt in range(self.max_retries + 1):
+        for attempt in range(first_attempt, self.max_retries + 1):
             try:
-                async with self.semaphore:
+                template = self._query_template(domain, record_type)
+                async with slot:
                     start_time = time.time()
-                    resolver = dns.asyncresolver.Resolver()
-                    resolver.nameservers = [resolver_ip]
-                    resolver.timeout = self.timeout
-                    resolver.lifetime = self.timeout
-
-                    if self.enable_dnssec:
-                        resolver.use_edns(0, dns.flags.DO, 1232)
-
-                    response = await resolver.resolve(
-                        domain, record_type, raise_on_no_answer=False
+                    slot.sent()
+                    raw = await transport.query(
+                        template, timeout=self._attempt_timeout(resolver_ip, attempt)
                     )
-
+                    slot.received()
+                    estimator = self._rtt_estimator(resolver_ip)
+                    if estimator is not None:
+                        estimator.observe(slot.wire_ms / 1000)
                     end_time = time.time()
-                    latency_ms = (end_time - start_time) * 1000
-
-                    answers = (
-                        [str(rdata) for rdata in response.rrset]
-                        if response.rrset
-                        else []
-                    )
-                    ttl = response.rrset.ttl if response.rrset else None
-
-                    # DNSSEC: always read AD flag, enforce only if requested
-                    ad_flag = False
-                    try:
-                        ad_flag = bool(response.response.flags & dns.flags.AD)
-                    except AttributeError:
-                        pass
-
-                    dnssec_status = QueryStatus.SUCCESS
-                    if self.enforce_dnssec and not ad_flag:
-                        dnssec_status = QueryStatus.DNSSEC_FAILED
+                    response = parse_response(raw, template.rdtype, self.decode_answers)
+                    slot.parsed()
+                    if response.truncated:
+                        # Truncated — retry over TCP like a stub resolver would
+                        tcp_response = await dns.asyncquery.tcp(
+                            dns.message.from_wire(template.wire),
+                            resolver_ip,
+                            timeout=self.timeout,
+                            port=self.dns_port,
+                        )
+                        slot.received()
+                        end_time = time.time()
+                        response = summarize_message(
+                            tcp_response, template.rdtype, self.decode_answers
+                        )
+                        slot.parsed()
+                    rcode = response.rcode
 
+                if rcode == dns.rcode.NXDOMAIN:
                     result = DNSQueryResult(
                         resolver_ip=resolver_ip,
                         resolver_name=resolver_name,
@@ -276,30 +1009,20 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=latency_ms,
-                        status=dnssec_status,
-                        answers=answers,
-                        ttl=ttl,
+                        status=QueryStatus.NXDOMAIN,
+                        answers=_EMPTY_ANSWERS,
+                        ttl=None,
+                        error_message="Non-existent domain",
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
-                        dnssec_validated=ad_flag,
-                        protocol=QueryProtocol.PLAIN,
+                        **slot.timings(),
                     )
-
-                    # Cache successful result
-                    if self.enable_cache:
-                        cache_key = self._get_cache_key(
-                            resolver_ip, domain, record_type
-                        )
-                        self.cache[cache_key] = result
-
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
 
-            except dns.exception.Timeout:
-                if attempt == self.max_retries:
-                    end_time = time.time()
+                if rcode != dns.rcode.NOERROR:
+                    # SERVFAIL/REFUSED/etc. — definitive server answer, no retry
                     assert self._lock is not None
                     async with self._lock:
                         self.failed_resolvers[resolver_ip] += 1
@@ -310,73 +1033,36 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
-                        status=QueryStatus.TIMEOUT,
-                        answers=[],
+                        status=QueryStatus.SERVFAIL,
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
-                        error_message="Query timeout",
+                        error_message=(
+                            "Server failure"
+                            if rcode == dns.rcode.SERVFAIL
+                            else f"Server failure ({dns.rcode.to_text(dns.rcode.Rcode.make(rcode))})"
+                        ),
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                # Exponential backoff with configurable base
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
 
-            except dns.resolver.NXDOMAIN:
-                # NXDOMAIN is a definitive answer, no retry needed
-                end_time = time.time()
-                result = DNSQueryResult(
-                    resolver_ip=resolver_ip,
-                    resolver_name=resolver_name,
-                    domain=domain,
-                    record_type=record_type,
-                    start_time=start_time,
-                    end_time=end_time,
-                    latency_ms=(end_time - start_time) * 1000,
-                    status=QueryStatus.NXDOMAIN,
-                    answers=[],
-                    ttl=None,
-                    error_message="Non-existent domain",
-                    attempt_number=attempt + 1,
-                    cache_hit=False,
-                    iteration=iteration,
-                )
-                await self._update_progress()
-                return result
+                # Only the rrset for the queried type counts as the answer —
+                # CNAMEs leading to it are part of the chain, not the result.
+                # Blocked/sinkholed domains (e.g. AdGuard/Pi-hole) return
+                # NOERROR with no matching rrset: a valid fast response, not a
+                # failure, so it is not retried.
+                answers = response.answers or _EMPTY_ANSWERS
+                ttl = response.ttl
 
-            except dns.resolver.NoAnswer:
-                # Blocked/sinkholed domains (e.g. 0.0.0.0 from AdGuard/Pi-hole)
-                # return NOERROR with an empty rrset. This is a valid fast response,
-                # not a failure — do not retry.
-                end_time = time.time()
-                result = DNSQueryResult(
-                    resolver_ip=resolver_ip,
-                    resolver_name=resolver_name,
-                    domain=domain,
-                    record_type=record_type,
-                    start_time=start_time,
-                    end_time=end_time,
-                    latency_ms=(end_time - start_time) * 1000,
-                    status=QueryStatus.SUCCESS,
-                    answers=[],
-                    ttl=None,
-                    attempt_number=attempt + 1,
-                    cache_hit=False,
-                    iteration=iteration,
-                )
-                await self._update_progress()
-                return result
+                # DNSSEC: always read AD flag, enforce only if requested
+                ad_flag = response.authenticated
+                dnssec_status = QueryStatus.SUCCESS
+                if self.enforce_dnssec and not ad_flag:
+                    dnssec_status = QueryStatus.DNSSEC_FAILED
 
-            except dns.resolver.NoNameservers:
-                # Server failure, no retry needed
-                end_time = time.time()
-                assert self._lock is not None
-                async with self._lock:
-                    self.failed_resolvers[resolver_ip] += 1
                 result = DNSQueryResult(
                     resolver_ip=resolver_ip,
                     resolver_name=resolver_name,
@@ -384,18 +1070,56 @@ class DNSQueryEngine:
                     record_type=record_type,
                     start_time=start_time,
                     end_time=end_time,
-                    latency_ms=(end_time - start_time) * 1000,
-                    status=QueryStatus.SERVFAIL,
-                    answers=[],
-                    ttl=None,
-                    error_message="Server failure",
+                    status=dnssec_status,
+                    answers=answers,
+                    answers_count=response.answers_count,
+                    ttl=ttl,
                     attempt_number=attempt + 1,
                     cache_hit=False,
                     iteration=iteration,
+                    **slot.timings(),
+                    dnssec_validated=ad_flag,
+                    protocol=QueryProtocol.PLAIN,
                 )
-                await self._update_progress()
+
+                # Cache successful result until its TTL runs out
+                if self.enable_cache:
+                    self.cache[
+                        self._get_cache_key(resolver_ip, domain, record_type)
+                    ] = result
+
+                self._update_progress(result)
                 return result
 
+            except (asyncio.TimeoutError, dns.exception.Timeout):
+                estimator = self._rtt_estimator(resolver_ip)
+                if estimator is not None:
+                    estimator.backoff()
+                if attempt == self.max_retries:
+                    end_time = time.time()
+                    assert self._lock is not None
+                    async with self._lock:
+                        self.failed_resolvers[resolver_ip] += 1
+                    result = DNSQueryResult(
+                        resolver_ip=resolver_ip,
+                        resolver_name=resolver_name,
+                        domain=domain,
+                        record_type=record_type,
+                        start_time=start_time,
+                        end_time=end_time,
+                        status=QueryStatus.TIMEOUT,
+                        answers=_EMPTY_ANSWERS,
+                        ttl=None,
+                        error_message="Query timeout",
+                        attempt_number=attempt + 1,
+                        cache_hit=False,
+                        iteration=iteration,
+                        **slot.timings(),
+                    )
+                    self._update_progress(result)
+                    return result
+                await self._retry_backoff(attempt, defer_retry)
+
             except Exception as e:
                 if attempt == self.max_retries:
                     end_time = time.time()
@@ -413,21 +1137,18 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
                         status=error_status,
-                        answers=[],
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
                         error_message=str(e),
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                # Exponential backoff with configurable base
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
+                await self._retry_backoff(attempt, defer_retry)
 
         # This should never be reached due to loop logic, but provide fallback
         # for safety
@@ -439,15 +1160,15 @@ class DNSQueryEngine:
             record_type=record_type,
             start_time=start_time,
             end_time=end_time,
-            latency_ms=(end_time - start_time) * 1000,
             status=QueryStatus.UNKNOWN_ERROR,
-            answers=[],
+            answers=_EMPTY_ANSWERS,
             ttl=None,
             error_message="Unexpected error: exhausted all retries without return",
             cache_hit=False,
             iteration=iteration,
+            **slot.timings(),
         )
-        await self._update_progress()
+        self._update_progress(result)
         return result
 
     async def query_single_doh(
@@ -458,43 +1179,39 @@ class DNSQueryEngine:
         doh_url: str,
         record_type: str = "A",
         iteration: int = 1,
+        first_attempt: int = 0,
+        defer_retry: bool = False,
     ) -> DNSQueryResult:
-        """Execute a single DNS-over-HTTPS query."""
+        """Execute a single DNS-over-HTTPS query.
+
+        Sent as POST or GET per ``doh_method``; connections are pooled per
+        URL authority, so resolvers behind the same DoH host share them.
+        """
 
         await self._ensure_async_primitives()
         assert self.semaphore is not None
 
         start_time = time.time()
-        client = await self._get_doh_client(resolver_ip)
-        for attempt in range(self.max_retries + 1):
+        slot = self._query_slot(resolver_ip)
+        for attempt in range(first_attempt, self.max_retries + 1):
             try:
-                async with self.semaphore:
+                async with slot:
+                    template = self._query_template(domain, record_type)
                     start_time = time.time()
-                    qname = dns.name.from_text(domain)
-                    rdtype = dns.rdatatype.from_text(record_type)
-                    request = dns.message.make_query(qname, rdtype)
-                    if self.enable_dnssec:
-                        request.use_edns(ednsflags=dns.flags.DO)
-                    wire = request.to_wire()
-                    response_raw = await client.post(
-                        doh_url,
-                        content=wire,
-                        headers={
-                            "Content-Type": "application/dns-message",
-                            "Accept": "application/dns-message",
-                        },
+                    raw_msg, cold = await self._doh.query_with_state(
+                        doh_url, template, on_send=slot.sent
                     )
-                    response_raw.raise_for_status()
+                    slot.received()
                     end_time = time.time()
-                    latency_ms = (end_time - start_time) * 1000
 
-                    dns_response = dns.message.from_wire(response_raw.content)
-                    answers = [
-                        str(rdata) for rrset in dns_response.answer for rdata in rrset
-                    ]
-                    ttl = dns_response.answer[0].ttl if dns_response.answer else None
+                    response = parse_response(
+                        raw_msg, template.rdtype, self.decode_answers
+                    )
+                    slot.parsed()
+                    answers = response.answers or _EMPTY_ANSWERS
+                    ttl = response.ttl
 
-                    ad_flag = bool(dns_response.flags & dns.flags.AD)
+                    ad_flag = response.authenticated
                     dnssec_status = QueryStatus.SUCCESS
                     if self.enforce_dnssec and not ad_flag:
                         dnssec_status = QueryStatus.DNSSEC_FAILED
@@ -506,17 +1223,19 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=latency_ms,
                         status=dnssec_status,
                         answers=answers,
+                        answers_count=response.answers_count,
                         ttl=ttl,
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                         dnssec_validated=ad_flag,
                         protocol=QueryProtocol.DOH,
+                        connection="cold" if cold else "warm",
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
 
             except httpx.TimeoutException:
@@ -531,21 +1250,19 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
                         status=QueryStatus.TIMEOUT,
-                        answers=[],
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
                         error_message="DoH timeout",
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                         protocol=QueryProtocol.DOH,
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
+                await self._retry_backoff(attempt, defer_retry)
 
             except httpx.HTTPStatusError as e:
                 if attempt == self.max_retries:
@@ -559,21 +1276,19 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
                         status=QueryStatus.SERVFAIL,
-                        answers=[],
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
                         error_message=f"HTTP {e.response.status_code}",
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                         protocol=QueryProtocol.DOH,
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
+                await self._retry_backoff(attempt, defer_retry)
 
             except Exception as e:
                 if attempt == self.max_retries:
@@ -587,21 +1302,19 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
                         status=QueryStatus.UNKNOWN_ERROR,
-                        answers=[],
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
                         error_message=str(e),
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                         protocol=QueryProtocol.DOH,
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
+                await self._retry_backoff(attempt, defer_retry)
 
         # unreachable fallback
         return DNSQueryResult(
@@ -611,13 +1324,13 @@ class DNSQueryEngine:
             record_type=record_type,
             start_time=start_time,
             end_time=time.time(),
-            latency_ms=0.0,
             status=QueryStatus.UNKNOWN_ERROR,
-            answers=[],
+            answers=_EMPTY_ANSWERS,
             ttl=None,
             error_message="Exhausted retries",
             cache_hit=False,
             iteration=iteration,
+            **slot.timings(),
             protocol=QueryProtocol.DOH,
         )
 
@@ -629,58 +1342,107 @@ class DNSQueryEngine:
         record_type: str = "A",
         port: int = 853,
         iteration: int = 1,
+        first_attempt: int = 0,
+        defer_retry: bool = False,
     ) -> DNSQueryResult:
         """Execute a single DNS-over-TLS query.
 
         Reuses a pooled TLS connection per resolver to avoid handshake overhead
-        on every query. Connection is evicted from the pool on any error so the
-        next query gets a fresh connection.
+        on every query. Queries are pipelined on that connection and matched
+        to responses by message ID, so concurrent queries never read each
+        other's replies. A timeout only abandons this query; the connection is
+        evicted on TLS errors or when the stream itself has failed.
+        """
+        return await self._query_single_stream(
+            QueryProtocol.DOT,
+            resolver_ip,
+            resolver_name,
+            domain,
+            record_type,
+            port,
+            iteration,
+            first_attempt,
+            defer_retry,
+        )
+
+    async def query_single_tcp(
+        self,
+        resolver_ip: str,
+        resolver_name: str,
+        domain: str,
+        record_type: str = "A",
+        port: Optional[int] = None,
+        iteration: int = 1,
+        first_attempt: int = 0,
+        defer_retry: bool = False,
+    ) -> DNSQueryResult:
+        """Execute a single plain DNS query over a pooled TCP connection.
+
+        Same pipelining and connection reuse as :meth:`query_single_dot`,
+        without TLS; ``port`` defaults to the engine's ``dns_port``.
         """
+        return await self._query_single_stream(
+            QueryProtocol.TCP,
+            resolver_ip,
+            resolver_name,
+            domain,
+            record_type,
+            port,
+            iteration,
+            first_attempt,
+            defer_retry,
+        )
+
+    async def _query_single_stream(
+        self,
+        protocol: QueryProtocol,
+        resolver_ip: str,
+        resolver_name: str,
+        domain: str,
+        record_type: str,
+        port: Optional[int],
+        iteration: int,
+        first_attempt: int,
+        defer_retry: bool,
+    ) -> DNSQueryResult:
+        """Query over a pooled, pipelined DoT or plain TCP stream."""
+        label = "DoT" if protocol == QueryProtocol.DOT else "TCP"
         await self._ensure_async_primitives()
         assert self.semaphore is not None
 
         start_time = time.time()
+        slot = self._query_slot(resolver_ip)
 
-        for attempt in range(self.max_retries + 1):
+        for attempt in range(first_attempt, self.max_retries + 1):
+            conn: Optional[StreamConnection] = None
             try:
-                async with self.semaphore:
+                async with slot:
+                    template = self._query_template(domain, record_type)
+
+                    # Reuse pooled connection — no handshake if already
+                    # open. Checkout and any handshake count as queue wait.
+                    if protocol == QueryProtocol.DOT:
+                        conn, cold = await self._get_dot_connection(
+                            resolver_ip, 853 if port is None else port
+                        )
+                    else:
+                        conn, cold = await self._get_tcp_pool(
+                            resolver_ip, port
+                        ).acquire()
                     start_time = time.time()
-
-                    qname = dns.name.from_text(domain)
-                    rdtype = dns.rdatatype.from_text(record_type)
-                    request = dns.message.make_query(qname, rdtype)
-                    if self.enable_dnssec:
-                        request.use_edns(ednsflags=dns.flags.DO)
-                    wire = request.to_wire()
-                    # 2-byte length prefix required by RFC 7858
-                    prefixed = struct.pack("!H", len(wire)) + wire
-
-                    # Reuse pooled connection — no TLS handshake if already open
-                    reader, writer = await self._get_dot_connection(resolver_ip, port)
-
-                    writer.write(prefixed)
-                    await writer.drain()
-
-                    # Read 2-byte length prefix then full message
-                    raw_len = await asyncio.wait_for(
-                        reader.readexactly(2), timeout=self.timeout
-                    )
-                    msg_len = struct.unpack("!H", raw_len)[0]
-                    raw_msg = await asyncio.wait_for(
-                        reader.readexactly(msg_len), timeout=self.timeout
-                    )
-                    # Do NOT close writer — connection is pooled and reused
-
+                    slot.sent()
+                    raw_msg = await conn.query(template, timeout=self.timeout)
+                    slot.received()
                     end_time = time.time()
-                    latency_ms = (end_time - start_time) * 1000
 
-                    dns_response = dns.message.from_wire(raw_msg)
-                    answers = [
-                        str(rdata) for rrset in dns_response.answer for rdata in rrset
-                    ]
-                    ttl = dns_response.answer[0].ttl if dns_response.answer else None
+                    response = parse_response(
+                        raw_msg, template.rdtype, self.decode_answers
+                    )
+                    slot.parsed()
+                    answers = response.answers or _EMPTY_ANSWERS
+                    ttl = response.ttl
 
-                    ad_flag = bool(dns_response.flags & dns.flags.AD)
+                    ad_flag = response.authenticated
                     dnssec_status = QueryStatus.SUCCESS
                     if self.enforce_dnssec and not ad_flag:
                         dnssec_status = QueryStatus.DNSSEC_FAILED
@@ -692,22 +1454,24 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=latency_ms,
                         status=dnssec_status,
                         answers=answers,
+                        answers_count=response.answers_count,
                         ttl=ttl,
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
+                        **slot.timings(),
                         dnssec_validated=ad_flag,
-                        protocol=QueryProtocol.DOT,
+                        protocol=protocol,
+                        connection="cold" if cold else "warm",
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
 
             except asyncio.TimeoutError:
-                # Evict connection — may be in a bad state after timeout
-                self._dot_connections.pop(resolver_ip, None)
+                # No eviction: the reader task keeps the stream in sync, and
+                # other queries may still be in flight on this connection.
                 if attempt == self.max_retries:
                     end_time = time.time()
                     async with self._lock:  # type: ignore[union-attr]
@@ -719,25 +1483,24 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
                         status=QueryStatus.TIMEOUT,
-                        answers=[],
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
-                        error_message="DoT timeout",
+                        error_message=f"{label} timeout",
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
-                        protocol=QueryProtocol.DOT,
+                        **slot.timings(),
+                        protocol=protocol,
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
+                await self._retry_backoff(attempt, defer_retry)
 
             except ssl.SSLError as e:
                 # SSL errors are not retryable — evict and return immediately
-                self._dot_connections.pop(resolver_ip, None)
+                if conn is not None:
+                    await self._evict_stream_connection(protocol, resolver_ip, conn)
                 end_time = time.time()
                 async with self._lock:  # type: ignore[union-attr]
                     self.failed_resolvers[resolver_ip] += 1
@@ -748,22 +1511,24 @@ class DNSQueryEngine:
                     record_type=record_type,
                     start_time=start_time,
                     end_time=end_time,
-                    latency_ms=(end_time - start_time) * 1000,
                     status=QueryStatus.TLS_ERROR,
-                    answers=[],
+                    answers=_EMPTY_ANSWERS,
                     ttl=None,
                     error_message=f"TLS error: {e}",
                     attempt_number=attempt + 1,
                     cache_hit=False,
                     iteration=iteration,
-                    protocol=QueryProtocol.DOT,
+                    **slot.timings(),
+                    protocol=protocol,
                 )
-                await self._update_progress()
+                self._update_progress(result)
                 return result
 
             except Exception as e:
-                # Evict connection on any unknown error before retrying
-                self._dot_connections.pop(resolver_ip, None)
+                # Evict a failed stream before retrying; a healthy one is kept
+                # for the other queries pipelined on it
+                if conn is not None and not conn.is_usable():
+                    await self._evict_stream_connection(protocol, resolver_ip, conn)
                 if attempt == self.max_retries:
                     end_time = time.time()
                     async with self._lock:  # type: ignore[union-attr]
@@ -775,21 +1540,19 @@ class DNSQueryEngine:
                         record_type=record_type,
                         start_time=start_time,
                         end_time=end_time,
-                        latency_ms=(end_time - start_time) * 1000,
                         status=QueryStatus.UNKNOWN_ERROR,
-                        answers=[],
+                        answers=_EMPTY_ANSWERS,
                         ttl=None,
                         error_message=str(e),
                         attempt_number=attempt + 1,
                         cache_hit=False,
                         iteration=iteration,
-                        protocol=QueryProtocol.DOT,
+                        **slot.timings(),
+                        protocol=protocol,
                     )
-                    await self._update_progress()
+                    self._update_progress(result)
                     return result
-                await asyncio.sleep(
-                    self.retry_backoff_base**attempt * self.retry_backoff_multiplier
-                )
+                await self._retry_backoff(attempt, defer_retry)
 
         # unreachable fallback
         return DNSQueryResult(
@@ -799,14 +1562,14 @@ class DNSQueryEngine:
             record_type=record_type,
             start_time=start_time,
             end_time=time.time(),
-            latency_ms=0.0,
             status=QueryStatus.UNKNOWN_ERROR,
-            answers=[],
+            answers=_EMPTY_ANSWERS,
             ttl=None,
             error_message="Exhausted retries",
             cache_hit=False,
             iteration=iteration,
-            protocol=QueryProtocol.DOT,
+            **slot.timings(),
+            protocol=protocol,
         )
 
     async def run_benchmark(
@@ -820,6 +1583,9 @@ class DNSQueryEngine:
         use_cache: bool = False,
         protocol: QueryProtocol = QueryProtocol.PLAIN,
         doh_urls: Optional[Dict[str, str]] = None,  # resolver_ip -> doh_url
+        prewarm_connections: bool = False,
+        rate: Optional[float] = None,
+        arrival: str = "fixed",
     ) -> List[DNSQueryResult]:
         """Run benchmark across all resolvers and domains.
 
@@ -831,25 +1597,203 @@ class DNSQueryEngine:
             warmup: Run full warmup (all resolvers × all domains × all record types)
             warmup_fast: Run fast warmup (one probe per resolver, overrides warmup)
             use_cache: Allow cache usage across iterations
+            prewarm_connections: For DoT and TCP, open each resolver's
+                minimum pool before the first measured query (see
+                ``dot_prewarm_report`` and ``tcp_prewarm_report``)
+            rate: Offered load in queries per second. Switches to open-loop
+                mode: sends follow a schedule instead of waiting for earlier
+                queries, and latency is measured from the scheduled send time
+                (see ``open_loop_report``)
+            arrival: Open-loop arrival process, "fixed" (evenly spaced) or
+                "poisson" (exponential gaps with the same mean rate)
 
         Returns:
-            List of DNSQueryResult objects
+            List of DNSQueryResult objects, in plan order (iteration, resolver,
+            domain, record type)
+        """
+        record_types = record_types or ["A"]
+        results: List[Optional[DNSQueryResult]] = [None] * (
+            len(resolvers) * len(domains) * len(record_types) * iterations
+        )
+        async for index, result in self._stream_indexed(
+            resolvers,
+            domains,
+            record_types,
+            iterations,
+            warmup,
+            warmup_fast,
+            use_cache,
+            protocol,
+            doh_urls,
+            prewarm_connections,
+            rate=rate,
+            arrival=arrival,
+        ):
+            results[index] = result
+        return cast(List[DNSQueryResult], results)
+
+    async def run_benchmark_table(
+        self,
+        resolvers: List[Dict[str, str]],
+        domains: List[str],
+        record_types: Optional[List[str]] = None,
+        iterations: int = 1,
+        warmup: bool = False,
+        warmup_fast: bool = False,
+        use_cache: bool = False,
+        protocol: QueryProtocol = QueryProtocol.PLAIN,
+        doh_urls: Optional[Dict[str, str]] = None,
+        prewarm_connections: bool = False,
+        rate: Optional[float] = None,
+        arrival: str = "fixed",
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> "ResultTable":
+        """Run a benchmark into a columnar :class:`ResultTable`.
+
+        Takes the same arguments as :meth:`run_benchmark` and keeps the same
+        plan order, but each result is written into the table's columns by
+        the task that finished it and then dropped: results are never queued
+        or yielded, and large runs never hold a list of result objects.
+
+        Args:
+            shard: ``(k, n)`` runs only every n-th query of the plan,
+                starting at plan index k; row ``i`` of the table is then plan
+                index ``i * n + k``. Used to split a run across processes.
         """
+        from dns_benchmark.table import ResultTable
+
+        record_types = record_types or ["A"]
+        _shard_index, shard_count = shard or (0, 1)
+        total = len(resolvers) * len(domains) * len(record_types) * iterations
+        table = ResultTable(-(-total // shard_count))
+
+        def _put(index: int, result: DNSQueryResult) -> None:
+            table.put(index // shard_count, result)
+
+        async for _ in self._stream_indexed(
+            resolvers,
+            domains,
+            record_types,
+            iterations,
+            warmup,
+            warmup_fast,
+            use_cache,
+            protocol,
+            doh_urls,
+            prewarm_connections,
+            rate=rate,
+            arrival=arrival,
+            shard=shard,
+            sink=_put,
+        ):
+            pass
+        return table
 
+    async def stream_benchmark(
+        self,
+        resolvers: List[Dict[str, str]],
+        domains: List[str],
+        record_types: Optional[List[str]] = None,
+        iterations: int = 1,
+        warmup: bool = False,
+        warmup_fast: bool = False,
+        use_cache: bool = False,
+        protocol: QueryProtocol = QueryProtocol.PLAIN,
+        doh_urls: Optional[Dict[str, str]] = None,
+        prewarm_connections: bool = False,
+        max_in_flight: Optional[int] = None,
+        rate: Optional[float] = None,
+        arrival: str = "fixed",
+    ) -> AsyncGenerator[DNSQueryResult, None]:
+        """Run a benchmark, yielding each result as soon as it completes.
+
+        Takes the same arguments as :meth:`run_benchmark`. A fixed pool of
+        ``max_in_flight`` (default: ``max_concurrent_queries``) workers pulls
+        queries from a bounded queue fed lazily from the plan, so memory stays
+        flat no matter how large the plan is. Retries go back on the queue
+        after their backoff instead of holding a worker. Results arrive in
+        completion order. Breaking out of the loop (or closing the generator)
+        cancels the queries still in flight. With ``rate`` set, queries are
+        sent open-loop on schedule and ``max_in_flight`` is not used.
+        """
+        indexed = self._stream_indexed(
+            resolvers,
+            domains,
+            record_types or ["A"],
+            iterations,
+            warmup,
+            warmup_fast,
+            use_cache,
+            protocol,
+            doh_urls,
+            prewarm_connections,
+            max_in_flight,
+            rate,
+            arrival,
+        )
+        try:
+            async for _index, result in indexed:
+                yield result
+        finally:
+            # Cancel outstanding queries now, not when the generator is collected
+            await indexed.aclose()
+
+    async def _prepare_run(
+        self,
+        resolvers: List[Dict[str, str]],
+        domains: List[str],
+        record_types: List[str],
+        iterations: int,
+        warmup: bool,
+        warmup_fast: bool,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        prewarm_connections: bool,
+    ) -> None:
+        """Validate inputs, pre-connect, warm up and reset progress counters."""
         # Validate resolvers
         for resolver in resolvers:
             self._validate_resolver(resolver)
+        # Happy eyeballs races query both addresses; set both up alike
+        targets = [
+            copy
+            for resolver in resolvers
+            for copy in self._race_pair(resolver, protocol) or (resolver,)
+        ]
+        # Per-resolver caps from the resolver JSON, e.g. "max_concurrent": 4
+        self._set_run_concurrency(
+            {
+                resolver["ip"]: int(resolver["max_concurrent"])
+                for resolver in targets
+                if resolver.get("max_concurrent")
+            }
+        )
 
-        if not record_types:
-            record_types = ["A"]
+        # Handshakes done here stay out of measured latencies
+        if prewarm_connections and protocol in (QueryProtocol.DOT, QueryProtocol.TCP):
+            if protocol == QueryProtocol.DOT:
+                self.dot_prewarm_report = await self.prewarm_dot_connections(targets)
+                report = self.dot_prewarm_report
+            else:
+                self.tcp_prewarm_report = await self.prewarm_tcp_connections(targets)
+                report = self.tcp_prewarm_report
+            for resolver in targets:
+                failure = report[resolver["ip"]]["error"]
+                if failure:
+                    click.echo(
+                        warning(
+                            f"{protocol.value.upper()} pre-connect failed: "
+                            f"{resolver['name']} ({resolver['ip']}) → {failure}"
+                        )
+                    )
 
         # Warmup uses same protocol as benchmark so connection overhead is
         # representative. warmup_fast takes precedence over warmup.
         if warmup_fast:
-            warmup_results = await self._run_fast_warmup(resolvers, protocol, doh_urls)
+            warmup_results = await self._run_fast_warmup(targets, protocol, doh_urls)
         elif warmup:
             warmup_results = await self._run_warmup(
-                resolvers, domains, record_types, protocol, doh_urls
+                targets, domains, record_types, protocol, doh_urls
             )
         else:
             warmup_results = []
@@ -863,54 +1807,636 @@ class DNSQueryEngine:
                     )
                 )
 
+        if protocol == QueryProtocol.DOH:
+            for resolver in targets:
+                if not (doh_urls or {}).get(resolver["ip"]):
+                    click.echo(
+                        error(
+                            f"No DoH URL configured for resolver {resolver['ip']} ({resolver['name']})"
+                        )
+                    )
+
         # Reset counters after warmup so progress tracks benchmark queries only
         self.query_counter = 0
+        self.status_counts.clear()
+        self._progress_reported_at = float("-inf")
         self.total_queries = (
             len(resolvers) * len(domains) * len(record_types) * iterations
         )
 
-        tasks = []
-        for iteration in range(iterations):
-            for resolver in resolvers:
-                for domain in domains:
-                    for record_type in record_types:
-                        if protocol == QueryProtocol.DOH:
-                            url = (doh_urls or {}).get(resolver["ip"], "")
-                            if not url:
-                                click.echo(
-                                    error(
-                                        f"No DoH URL configured for resolver {resolver['ip']} ({resolver['name']})"
-                                    )
-                                )
-                            task = self.query_single_doh(
-                                resolver_ip=resolver["ip"],
-                                resolver_name=resolver["name"],
-                                domain=domain,
-                                doh_url=url,
-                                record_type=record_type,
-                                iteration=iteration + 1,
-                            )
-                        elif protocol == QueryProtocol.DOT:
-                            task = self.query_single_dot(
-                                resolver_ip=resolver["ip"],
-                                resolver_name=resolver["name"],
-                                domain=domain,
-                                record_type=record_type,
-                                iteration=iteration + 1,
-                            )
-                        else:
-                            task = self.query_single(
-                                resolver_ip=resolver["ip"],
-                                resolver_name=resolver["name"],
-                                domain=domain,
-                                record_type=record_type,
-                                use_cache=use_cache,
-                                iteration=iteration + 1,
-                            )
-                        tasks.append(task)
-
-        results = await asyncio.gather(*tasks)
-        return list(results)
+    def _query_coroutine(
+        self,
+        item: _WorkItem,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+        defer_retry: bool = True,
+        hedge: bool = True,
+    ) -> Awaitable[DNSQueryResult]:
+        """Build the next attempt of a work item on the requested protocol.
+
+        Unless ``defer_retry`` is off, retries are deferred to the scheduler
+        rather than slept on. With hedging enabled the query is wrapped in
+        :meth:`_hedged_query`, whose copies retry inline, and a dual-stack
+        resolver under happy eyeballs in :meth:`_raced_query`.
+        """
+        pair = self._race_pair(item.resolver, protocol)
+        if pair is not None:
+            return self._raced_query(item, pair, protocol, doh_urls, use_cache)
+        if hedge and self.hedge_percentile is not None:
+            return self._hedged_query(item, protocol, doh_urls, use_cache)
+        breaker = self._circuit_breaker(item.resolver["ip"])
+        if breaker is not None:
+            return self._guarded_query(
+                breaker, item, protocol, doh_urls, use_cache, defer_retry
+            )
+        return self._protocol_query(item, protocol, doh_urls, use_cache, defer_retry)
+
+    def _protocol_query(
+        self,
+        item: _WorkItem,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+        defer_retry: bool,
+    ) -> Awaitable[DNSQueryResult]:
+        resolver = item.resolver
+        if protocol == QueryProtocol.DOH:
+            return self.query_single_doh(
+                resolver_ip=resolver["ip"],
+                resolver_name=resolver["name"],
+                domain=item.domain,
+                doh_url=(doh_urls or {}).get(resolver["ip"], ""),
+                record_type=item.record_type,
+                iteration=item.iteration,
+                first_attempt=item.attempt,
+                defer_retry=defer_retry,
+            )
+        if protocol in (QueryProtocol.DOT, QueryProtocol.TCP):
+            query_stream = (
+                self.query_single_dot
+                if protocol == QueryProtocol.DOT
+                else self.query_single_tcp
+            )
+            return query_stream(
+                resolver_ip=resolver["ip"],
+                resolver_name=resolver["name"],
+                domain=item.domain,
+                record_type=item.record_type,
+                iteration=item.iteration,
+                first_attempt=item.attempt,
+                defer_retry=defer_retry,
+            )
+        return self.query_single(
+            resolver_ip=resolver["ip"],
+            resolver_name=resolver["name"],
+            domain=item.domain,
+            record_type=item.record_type,
+            use_cache=use_cache,
+            iteration=item.iteration,
+            first_attempt=item.attempt,
+            defer_retry=defer_retry,
+        )
+
+    def _circuit_breaker(self, resolver_ip: str) -> Optional[CircuitBreaker]:
+        if not self.circuit_breaker_threshold:
+            return None
+        breaker = self._circuit_breakers.get(resolver_ip)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                self.circuit_breaker_threshold, self.circuit_breaker_cooldown
+            )
+            self._circuit_breakers[resolver_ip] = breaker
+        return breaker
+
+    def get_circuit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit state, trips and skipped queries per resolver IP."""
+        return {ip: b.stats() for ip, b in self._circuit_breakers.items()}
+
+    async def _guarded_query(
+        self,
+        breaker: CircuitBreaker,
+        item: _WorkItem,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+        defer_retry: bool,
+    ) -> DNSQueryResult:
+        """Run a query unless its resolver's circuit is open."""
+        if not breaker.allow():
+            now = time.time()
+            result = DNSQueryResult(
+                resolver_ip=item.resolver["ip"],
+                resolver_name=item.resolver["name"],
+                domain=item.domain,
+                record_type=item.record_type,
+                start_time=now,
+                end_time=now,
+                latency_ms=0.0,
+                status=QueryStatus.CIRCUIT_OPEN,
+                answers=_EMPTY_ANSWERS,
+                ttl=None,
+                error_message=(
+                    f"Skipped: circuit open after {breaker.failures} "
+                    "consecutive failures"
+                ),
+                attempt_number=0,
+                iteration=item.iteration,
+                protocol=protocol,
+            )
+            self._update_progress(result)
+            return result
+        try:
+            result = await self._protocol_query(
+                item, protocol, doh_urls, use_cache, defer_retry
+            )
+        except BaseException:
+            breaker.abandon()
+            raise
+        if not result.cache_hit:
+            breaker.record(result.status not in _NO_ANSWER)
+        return result
+
+    def _hedge_delay(self, resolver_ip: str) -> float:
+        """Seconds to wait for an answer before sending a hedge copy."""
+        samples = self._hedge_samples.get(resolver_ip)
+        if (
+            self.hedge_percentile is None
+            or not samples
+            or len(samples) < _HEDGE_MIN_SAMPLES
+        ):
+            return self.hedge_initial_delay_ms / 1000
+        ordered = sorted(samples)
+        rank = int(len(ordered) * self.hedge_percentile / 100)
+        return ordered[min(rank, len(ordered) - 1)] / 1000
+
+    def _record_hedge_sample(self, result: DNSQueryResult, resolver_ip: str) -> None:
+        if result.status in _NO_ANSWER or result.cache_hit:
+            return
+        samples = self._hedge_samples.get(resolver_ip)
+        if samples is None:
+            samples = self._hedge_samples[resolver_ip] = deque(maxlen=_HEDGE_WINDOW)
+        samples.append(result.latency_ms)
+
+    async def _hedged_query(
+        self,
+        item: _WorkItem,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+    ) -> DNSQueryResult:
+        """Run a query, duplicating it if it is slower than the hedge delay.
+
+        The hedge delay runs from when the primary copy holds its slot, so
+        time queued behind other queries never triggers a hedge. The first
+        copy to get an answer wins and the other is cancelled. The result
+        keeps the primary resolver's identity; a winning hedge's latency
+        includes the delay before it was sent and its queue wait includes
+        the primary's slot waits. Each copy retries on its own.
+        """
+        primary_ip = item.resolver["ip"]
+        secondary = self.hedge_resolver or item.resolver
+        delay = self._hedge_delay(primary_ip)
+        slot_taken: "asyncio.Future[_SlotWaits]" = (
+            asyncio.get_running_loop().create_future()
+        )
+
+        async def _copy(
+            resolver: Dict[str, str], is_primary: bool = False
+        ) -> DNSQueryResult:
+            _COUNT_PROGRESS.set(False)
+            if is_primary:
+                _SLOT_TAKEN.set(slot_taken)
+            copy = _WorkItem(
+                item.index,
+                item.iteration,
+                resolver,
+                item.domain,
+                item.record_type,
+                item.attempt,
+            )
+            result = await self._query_coroutine(
+                copy, protocol, doh_urls, use_cache, defer_retry=False, hedge=False
+            )
+            self._record_hedge_sample(result, resolver["ip"])
+            return result
+
+        primary = asyncio.ensure_future(_copy(item.resolver, is_primary=True))
+        copies = {primary}
+        try:
+            # Cache hits and open circuits finish without taking a slot
+            started: Set["asyncio.Future[Any]"] = {primary, slot_taken}
+            await asyncio.wait(started, return_when=asyncio.FIRST_COMPLETED)
+            done, _pending = await asyncio.wait(copies, timeout=delay)
+            if not done:
+                copies.add(asyncio.ensure_future(_copy(secondary)))
+            fallback: Optional[DNSQueryResult] = None
+            winner: Optional["asyncio.Future[DNSQueryResult]"] = None
+            pending = set(copies)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.result().status not in _NO_ANSWER:
+                        winner = task
+                        break
+                    if task is primary or fallback is None:
+                        fallback = task.result()
+        finally:
+            for task in copies:
+                task.cancel()
+            await asyncio.gather(*copies, return_exceptions=True)
+            slot_taken.cancel()
+
+        result = winner.result() if winner is not None else fallback
+        assert result is not None
+        # Copies may be cached under their own resolver: relabel a copy
+        result = replace(result, hedged=len(copies) > 1)
+        if winner is not None and winner is not primary:
+            resolver_wait, global_wait = slot_taken.result()
+            result = replace(
+                result,
+                hedge_won=True,
+                latency_ms=result.latency_ms + delay * 1000,
+                queue_wait_ms=result.queue_wait_ms + resolver_wait + global_wait,
+                resolver_wait_ms=result.resolver_wait_ms + resolver_wait,
+                global_wait_ms=result.global_wait_ms + global_wait,
+                resolver_ip=item.resolver["ip"],
+                resolver_name=item.resolver["name"],
+            )
+            if result.family is not None:
+                result.family = address_family(result.resolver_ip)
+        self._update_progress(result)
+        return result
+
+    def _race_pair(
+        self, resolver: Dict[str, str], protocol: QueryProtocol
+    ) -> Optional[Tuple[Dict[str, str], Dict[str, str]]]:
+        """IPv6 and IPv4 copies of a resolver to race, or None if not racing.
+
+        Only with happy eyeballs on, for a resolver whose "ip" is IPv4 and
+        "ipv6" IPv6. DoH is never raced: its URL picks the address.
+        """
+        if self.happy_eyeballs_delay_ms is None or protocol == QueryProtocol.DOH:
+            return None
+        ipv6 = resolver.get("ipv6")
+        if (
+            not ipv6
+            or address_family(ipv6) != "IPv6"
+            or address_family(resolver["ip"]) != "IPv4"
+        ):
+            return None
+        ipv4 = {key: value for key, value in resolver.items() if key != "ipv6"}
+        return {**ipv4, "ip": ipv6}, ipv4
+
+    async def _raced_query(
+        self,
+        item: _WorkItem,
+        pair: Tuple[Dict[str, str], Dict[str, str]],
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+    ) -> DNSQueryResult:
+        """Happy eyeballs: query over IPv6, then over IPv4 if IPv6 is slow.
+
+        The IPv4 copy is sent once ``happy_eyeballs_delay_ms`` passes
+        without an IPv6 answer, or as soon as the IPv6 copy fails. The first
+        copy to get an answer wins and the other is cancelled. The result
+        keeps the winner's address, so its ``family`` is the one a
+        dual-stack client would have used, and its latency counts from the
+        start of the race. Each copy retries on its own.
+        """
+        assert self.happy_eyeballs_delay_ms is not None
+        start = time.perf_counter()
+        offsets: Dict["asyncio.Future[DNSQueryResult]", float] = {}
+
+        async def _copy(resolver: Dict[str, str]) -> DNSQueryResult:
+            _COUNT_PROGRESS.set(False)
+            copy = _WorkItem(
+                item.index,
+                item.iteration,
+                resolver,
+                item.domain,
+                item.record_type,
+                item.attempt,
+            )
+            return await self._query_coroutine(
+                copy, protocol, doh_urls, use_cache, defer_retry=False
+            )
+
+        def _start(resolver: Dict[str, str]) -> "asyncio.Future[DNSQueryResult]":
+            task = asyncio.ensure_future(_copy(resolver))
+            offsets[task] = time.perf_counter() - start
+            return task
+
+        ipv6, ipv4 = pair
+        first = _start(ipv6)
+        copies = {first}
+        try:
+            done, _pending = await asyncio.wait(
+                copies, timeout=self.happy_eyeballs_delay_ms / 1000
+            )
+            if not done or first.result().status in _NO_ANSWER:
+                copies.add(_start(ipv4))
+            fallback: Optional[DNSQueryResult] = None
+            winner: Optional["asyncio.Future[DNSQueryResult]"] = None
+            pending = set(copies)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.result().status not in _NO_ANSWER:
+                        winner = task
+                        break
+                    if task is first or fallback is None:
+                        fallback = task.result()
+        finally:
+            for task in copies:
+                task.cancel()
+            await asyncio.gather(*copies, return_exceptions=True)
+
+        result = winner.result() if winner is not None else fallback
+        assert result is not None
+        if winner is not None:
+            result.latency_ms += offsets[winner] * 1000
+        self._update_progress(result)
+        return result
+
+    async def _stream_indexed(
+        self,
+        resolvers: List[Dict[str, str]],
+        domains: List[str],
+        record_types: List[str],
+        iterations: int,
+        warmup: bool,
+        warmup_fast: bool,
+        use_cache: bool,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        prewarm_connections: bool,
+        max_in_flight: Optional[int] = None,
+        rate: Optional[float] = None,
+        arrival: str = "fixed",
+        shard: Optional[Tuple[int, int]] = None,
+        sink: Optional[_Sink] = None,
+    ) -> AsyncGenerator[Tuple[int, DNSQueryResult], None]:
+        """Yield ``(plan index, result)`` pairs in completion order.
+
+        With ``shard=(k, n)`` only plan indexes congruent to ``k`` modulo
+        ``n`` are run. With ``sink``, each result is passed to it as soon as
+        its query finishes and nothing is yielded.
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        if arrival not in ARRIVAL_PROCESSES:
+            raise ValueError(f"Unsupported arrival process: {arrival}")
+        await self._prepare_run(
+            resolvers,
+            domains,
+            record_types,
+            iterations,
+            warmup,
+            warmup_fast,
+            protocol,
+            doh_urls,
+            prewarm_connections,
+        )
+
+        total = len(resolvers) * len(domains) * len(record_types) * iterations
+        shard_index, shard_count = shard or (0, 1)
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"Invalid shard {shard_index} of {shard_count}")
+        if shard_count > 1:
+            total = len(range(shard_index, total, shard_count))
+            self.total_queries = total
+        # Dispatch interleaves resolvers so per-resolver caps never leave the
+        # queue full of one resolver's work; indexes keep the result order
+        # (iteration, resolver, domain, record type).
+        n_res, n_dom, n_rt = len(resolvers), len(domains), len(record_types)
+        plan = (
+            _WorkItem(
+                ((iteration * n_res + r) * n_dom + d) * n_rt + t,
+                iteration + 1,
+                resolvers[r],
+                domains[d],
+                record_types[t],
+            )
+            for iteration, d, t, r in itertools.product(
+                range(iterations), range(n_dom), range(n_rt), range(n_res)
+            )
+        )
+        if shard_count > 1:
+            plan = (item for item in plan if item.index % shard_count == shard_index)
+        if rate is not None:
+            async for pair in self._open_loop_indexed(
+                plan, total, rate, arrival, protocol, doh_urls, use_cache, sink
+            ):
+                yield pair
+            return
+
+        workers = max(1, max_in_flight or self.max_concurrent_queries)
+        # Bounds queued + running + backing-off + unconsumed work items, so
+        # memory stays flat however large the plan is.
+        capacity = asyncio.Semaphore(workers * 2)
+        queue: "asyncio.Queue[_WorkItem]" = asyncio.Queue(maxsize=workers * 2)
+        done: "asyncio.Queue[Tuple[int, Any]]" = asyncio.Queue()
+        parked: _Parked = defaultdict(deque)
+
+        async def _produce() -> None:
+            for item in plan:
+                await capacity.acquire()
+                queue.put_nowait(item)
+
+        tasks = [asyncio.ensure_future(_produce())]
+        tasks.extend(
+            asyncio.ensure_future(
+                self._worker(queue, done, parked, protocol, doh_urls, use_cache, sink)
+            )
+            for _ in range(min(workers, total))
+        )
+        try:
+            for _ in range(total):
+                index, outcome = await done.get()
+                capacity.release()
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                if outcome is not None:
+                    yield index, outcome
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _open_loop_indexed(
+        self,
+        plan: Iterator[_WorkItem],
+        total: int,
+        rate: float,
+        arrival: str,
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+        sink: Optional[_Sink] = None,
+    ) -> AsyncGenerator[Tuple[int, DNSQueryResult], None]:
+        """Send plan items on an arrival schedule, whatever is in flight.
+
+        Each send is a ``loop.call_at`` at its scheduled time and launches its
+        query without waiting for earlier ones, so a slow resolver cannot
+        lower the offered load (no coordinated omission). Retries sleep
+        inside their own task. Queries that find no free concurrency slot
+        wait for one, and that wait counts towards their latency.
+        """
+        loop = asyncio.get_running_loop()
+        done: "asyncio.Queue[Tuple[int, Any]]" = asyncio.Queue()
+        tasks: Set["asyncio.Future[None]"] = set()
+        report: Dict[str, Any] = {
+            "arrival": arrival,
+            "offered_qps": rate,
+            "scheduled": total,
+            "sent": 0,
+            "missed_schedule": 0,
+            "max_schedule_lag_ms": 0.0,
+            "backlogged": 0,
+            "peak_outstanding": 0,
+            "duration_s": 0.0,
+            "achieved_qps": 0.0,
+        }
+        self.open_loop_report = report
+        outstanding = 0
+        handle: Optional[asyncio.TimerHandle] = None
+
+        def _gap() -> float:
+            if arrival == "poisson":
+                return random.expovariate(rate)
+            return 1.0 / rate
+
+        async def _run(item: _WorkItem, scheduled: float, lag: float) -> None:
+            nonlocal outstanding
+            try:
+                result = await self._query_coroutine(
+                    item, protocol, doh_urls, use_cache, defer_retry=False
+                )
+            except Exception as e:
+                done.put_nowait((item.index, e))
+                return
+            finally:
+                outstanding -= 1
+            if not result.cache_hit:
+                result.schedule_lag_ms = lag * 1000
+                result.latency_ms = (loop.time() - scheduled) * 1000
+            if (
+                result.resolver_wait_ms + result.global_wait_ms
+                > _SCHEDULE_TOLERANCE_S * 1000
+            ):
+                report["backlogged"] += 1
+            _deliver(done, sink, item.index, result)
+
+        def _send(item: _WorkItem, scheduled: float) -> None:
+            nonlocal outstanding, handle
+            lag = max(0.0, loop.time() - scheduled)
+            if lag > _SCHEDULE_TOLERANCE_S:
+                report["missed_schedule"] += 1
+            report["max_schedule_lag_ms"] = max(
+                report["max_schedule_lag_ms"], lag * 1000
+            )
+            report["sent"] += 1
+            outstanding += 1
+            report["peak_outstanding"] = max(report["peak_outstanding"], outstanding)
+            task = asyncio.ensure_future(_run(item, scheduled, lag))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            # Next send is timed from this one's schedule, not from when it
+            # actually fired, so loop stalls never slow the offered rate.
+            following = next(plan, None)
+            if following is not None:
+                next_at = scheduled + _gap()
+                handle = loop.call_at(next_at, _send, following, next_at)
+
+        loop_start = loop.time()
+        first = next(plan, None)
+        if first is not None:
+            handle = loop.call_at(loop_start, _send, first, loop_start)
+        try:
+            for _ in range(total):
+                index, outcome = await done.get()
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                if outcome is not None:
+                    yield index, outcome
+        finally:
+            if handle is not None:
+                handle.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            report["duration_s"] = loop.time() - loop_start
+            if report["duration_s"] > 0:
+                report["achieved_qps"] = report["sent"] / report["duration_s"]
+
+    async def _worker(
+        self,
+        queue: "asyncio.Queue[_WorkItem]",
+        done: "asyncio.Queue[Tuple[int, Any]]",
+        parked: "_Parked",
+        protocol: QueryProtocol,
+        doh_urls: Optional[Dict[str, str]],
+        use_cache: bool,
+        sink: Optional[_Sink] = None,
+    ) -> None:
+        """Run attempts from the queue until cancelled.
+
+        A failed attempt that may be retried goes back on the queue once its
+        backoff elapses, so no worker sits idle while a query waits. Work for
+        a resolver that is at its in-flight cap is parked rather than waited
+        on, and requeued as soon as that resolver has a free slot again.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            resolver_ip = item.resolver["ip"]
+            semaphore = self._resolver_semaphore(resolver_ip)
+            if semaphore is not None and semaphore.locked():
+                parked[resolver_ip].append((item, time.perf_counter_ns()))
+                continue
+            try:
+                result = await self._query_coroutine(
+                    item, protocol, doh_urls, use_cache
+                )
+            except _RetryLater as retry:
+                item.attempt = retry.attempt
+                loop.call_later(retry.delay, queue.put_nowait, item)
+                continue
+            except Exception as e:
+                done.put_nowait((item.index, e))
+                continue
+            finally:
+                self._wake_parked(parked, queue)
+            if isinstance(result, DNSQueryResult):
+                result.resolver_wait_ms += item.parked_ms
+                result.queue_wait_ms += item.parked_ms
+            _deliver(done, sink, item.index, result)
+
+    def _wake_parked(
+        self, parked: "_Parked", queue: "asyncio.Queue[_WorkItem]"
+    ) -> None:
+        """Requeue one parked item for each resolver with a free slot.
+
+        Called whenever a query finishes. Hedge and race copies take other
+        resolvers' slots, so any resolver may have been freed, not just the
+        one the finished item was for.
+        """
+        for resolver_ip in list(parked):
+            semaphore = self._resolver_semaphore(resolver_ip)
+            if semaphore is not None and semaphore.locked():
+                continue
+            waiting = parked[resolver_ip]
+            next_item, since = waiting.popleft()
+            if not waiting:
+                del parked[resolver_ip]
+            next_item.parked_ms += (time.perf_counter_ns() - since) / 1e6
+            queue.put_nowait(next_item)
 
     async def _run_warmup(
         self,
@@ -924,38 +2450,19 @@ class DNSQueryEngine:
 
         Does not update progress counters or cache results.
         """
-        tasks = []
-        for resolver in resolvers:
-            for domain in domains:
-                for record_type in record_types:
-                    if protocol == QueryProtocol.DOH:
-                        url = (doh_urls or {}).get(resolver["ip"], "")
-                        task = self.query_single_doh(
-                            resolver_ip=resolver["ip"],
-                            resolver_name=resolver["name"],
-                            domain=domain,
-                            doh_url=url,
-                            record_type=record_type,
-                            iteration=0,  # Mark as warmup
-                        )
-                    elif protocol == QueryProtocol.DOT:
-                        task = self.query_single_dot(
-                            resolver_ip=resolver["ip"],
-                            resolver_name=resolver["name"],
-                            domain=domain,
-                            record_type=record_type,
-                            iteration=0,
-                        )
-                    else:
-                        task = self.query_single(
-                            resolver_ip=resolver["ip"],
-                            resolver_name=resolver["name"],
-                            domain=domain,
-                            record_type=record_type,
-                            use_cache=False,
-                            iteration=0,
-                        )
-                    tasks.append(task)
+        tasks = [
+            # Iteration 0 marks warmup
+            self._protocol_query(
+                _WorkItem(0, 0, resolver, domain, record_type),
+                protocol,
+                doh_urls,
+                use_cache=False,
+                defer_retry=False,
+            )
+            for resolver in resolvers
+            for domain in domains
+            for record_type in record_types
+        ]
         return await asyncio.gather(*tasks)
 
     async def _run_fast_warmup(
@@ -972,36 +2479,17 @@ class DNSQueryEngine:
         Respects the active protocol so warmup overhead matches benchmark overhead.
         Does not update progress counters or cache results.
         """
-        tasks = []
-        for r in resolvers:
-            if protocol == QueryProtocol.DOH:
-                url = (doh_urls or {}).get(r["ip"], "")
-                task = self.query_single_doh(
-                    resolver_ip=r["ip"],
-                    resolver_name=r["name"],
-                    domain=probe_domain,
-                    doh_url=url,
-                    record_type=record_type,
-                    iteration=0,  # Mark as warmup
-                )
-            elif protocol == QueryProtocol.DOT:
-                task = self.query_single_dot(
-                    resolver_ip=r["ip"],
-                    resolver_name=r["name"],
-                    domain=probe_domain,
-                    record_type=record_type,
-                    iteration=0,
-                )
-            else:
-                task = self.query_single(
-                    resolver_ip=r["ip"],
-                    resolver_name=r["name"],
-                    domain=probe_domain,
-                    record_type=record_type,
-                    use_cache=False,
-                    iteration=0,
-                )
-            tasks.append(task)
+        tasks = [
+            # Iteration 0 marks warmup
+            self._protocol_query(
+                _WorkItem(0, 0, r, probe_domain, record_type),
+                protocol,
+                doh_urls,
+                use_cache=False,
+                defer_retry=False,
+            )
+            for r in resolvers
+        ]
         return await asyncio.gather(*tasks)
 
     def clear_cache(self) -> None:
@@ -1009,11 +2497,8 @@ class DNSQueryEngine:
         self.cache.clear()
 
     def get_cache_stats(self) -> Dict[str, int]:
-        """Get cache statistics."""
-        return {
-            "cached_entries": len(self.cache),
-            "cache_enabled": self.enable_cache,
-        }
+        """Get cache statistics: size, bound, hits, misses, evictions, expiries."""
+        return {**self.cache.stats(), "cache_enabled": self.enable_cache}
 
     def get_failed_resolvers(self) -> Dict[str, int]:
         """Get resolvers with failure counts."""
@@ -1406,6 +2891,70 @@ class ResolverManager:
 
         return ResolverManager.load_resolvers_from_file(input_value)
 
+    @staticmethod
+    def resolver_addresses(
+        resolver: Dict[str, Any],
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """IPv4 and IPv6 address of a resolver (None for a family it lacks).
+
+        Addresses the resolver dict does not carry are taken from the
+        database entry with the same IP or name.
+        """
+        candidates = [str(resolver.get("ip") or ""), str(resolver.get("ipv6") or "")]
+        if not {"IPv4", "IPv6"} <= {address_family(c) for c in candidates}:
+            match = next(
+                (
+                    r
+                    for r in ResolverManager.RESOLVERS_DATABASE
+                    if resolver.get("ip") in (r["ip"], r.get("ipv6"))
+                    or ResolverManager._match_resolver_name(
+                        r, str(resolver.get("name", ""))
+                    )
+                ),
+                None,
+            )
+            if match:
+                candidates += [str(match["ip"]), str(match.get("ipv6") or "")]
+        ipv4 = next((c for c in candidates if address_family(c) == "IPv4"), None)
+        ipv6 = next((c for c in candidates if address_family(c) == "IPv6"), None)
+        return ipv4, ipv6
+
+    @staticmethod
+    def for_family(
+        resolvers: List[Dict[str, str]], family: str, race: bool = False
+    ) -> List[Dict[str, str]]:
+        """Resolvers to query over address ``family`` ("4", "6" or "both").
+
+        "4" and "6" query each resolver at its address of that family.
+        "both" queries both, as separate resolvers named "<name> (IPv4)" and
+        "<name> (IPv6)"; with ``race`` it instead keeps one resolver with an
+        IPv4 "ip" and an "ipv6", for the engine's happy eyeballs race.
+        Resolvers without an address in a requested family are left out.
+
+        Raises:
+            ValueError: Unknown family.
+        """
+        if family not in ADDRESS_FAMILIES:
+            raise ValueError(f"Unsupported address family: {family}")
+        selected = []
+        for resolver in resolvers:
+            ipv4, ipv6 = ResolverManager.resolver_addresses(resolver)
+            base = {key: value for key, value in resolver.items() if key != "ipv6"}
+            wanted = family
+            if family == "both" and race:
+                if ipv4 and ipv6:
+                    selected.append({**base, "ip": ipv4, "ipv6": ipv6})
+                    continue
+                wanted = "4" if ipv4 else "6"  # single-stack: nothing to race
+            for version, address in (("4", ipv4), ("6", ipv6)):
+                if address is None or wanted not in (version, "both"):
+                    continue
+                name = base["name"]
+                if wanted == "both":
+                    name = f"{name} (IPv{version})"
+                selected.append({**base, "name": name, "ip": address})
+        return selected
+
     @staticmethod
     def get_default_resolvers() -> List[Dict[str, str]]:
         """Get a list of commonly used public resolvers."""
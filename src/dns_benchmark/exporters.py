@@ -2,7 +2,7 @@
 
 import os
 import tempfile
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 import matplotlib
 import matplotlib.pyplot as plt
@@ -18,46 +18,134 @@ except ImportError:
 
 from dns_benchmark.analysis import BenchmarkAnalyzer
 from dns_benchmark.core import DNSQueryResult
+from dns_benchmark.table import ResultTable
 
 matplotlib.use("Agg")  # Use non-interactive backend
 
+Results = Union[ResultTable, Sequence[DNSQueryResult]]
+
+_RAW_JSON_FIELDS = (
+    "resolver_name",
+    "resolver_ip",
+    "domain",
+    "record_type",
+    "latency_ms",
+    "status",
+    "answers_count",
+    "answers",
+    "ttl",
+    "error_message",
+    "start_time",
+    "end_time",
+    "attempt_number",
+    "cache_hit",
+    "iteration",
+    "query_id",
+    "protocol",
+    "dnssec_validated",
+    "resolver_wait_ms",
+    "global_wait_ms",
+    "queue_wait_ms",
+    "first_byte_ms",
+    "parse_ms",
+    "hedged",
+    "hedge_won",
+    "schedule_lag_ms",
+    "connection",
+    "family",
+)
+_RAW_CSV_COLUMNS = (
+    "timestamp",
+    "resolver_name",
+    "resolver_ip",
+    "domain",
+    "record_type",
+    "latency_ms",
+    "status",
+    "answers_count",
+    "ttl",
+    "error_message",
+    "cache_hit",
+    "iteration",
+    "query_id",
+    "protocol",
+    "dnssec_validated",
+    "resolver_wait_ms",
+    "global_wait_ms",
+    "queue_wait_ms",
+    "first_byte_ms",
+    "parse_ms",
+    "hedged",
+    "hedge_won",
+    "schedule_lag_ms",
+    "connection",
+    "family",
+)
+# Table column -> "Raw Data" sheet header
+_RAW_SHEET_HEADERS = {
+    "resolver_name": "Resolver Name",
+    "resolver_ip": "Resolver IP",
+    "domain": "Domain",
+    "record_type": "Record Type",
+    "latency_ms": "Latency (ms)",
+    "status": "Status",
+    "answers_count": "Answers Count",
+    "ttl": "TTL",
+    "error_message": "Error Message",
+    "attempt_number": "Attempts",
+    "cache_hit": "Cached",
+    "iteration": "Iteration",
+    "protocol": "Protocol",
+    "dnssec_validated": "DNSSEC Validated",
+    "connection": "Connection",
+    "family": "Address Family",
+}
+
+
+def _result_table(
+    results: Results, analyzer: Optional[BenchmarkAnalyzer] = None
+) -> ResultTable:
+    """Columnar form of ``results``, reusing the analyzer's when it has it."""
+    if analyzer is not None and analyzer.results is results:
+        return analyzer.table
+    return ResultTable.of(results)
+
+
+def _blank_missing(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """``rows`` as a frame whose missing values become empty cells, not NaN."""
+    df = pd.DataFrame(rows)
+    return df.astype(object).where(df.notna(), None)
+
 
 class ExportBundle:
     @staticmethod
     def export_json(
-        results: List[DNSQueryResult],
+        results: Results,
         analyzer: BenchmarkAnalyzer,
         domain_stats: Optional[List[Dict[str, Any]]],
         record_type_stats: Optional[List[Dict[str, Any]]],
         error_stats: Optional[Dict[str, int]],
         output_path: str,
+        pool_stats: Optional[List[Dict[str, Any]]] = None,
+        connections: Optional[List[Dict[str, Any]]] = None,
     ) -> None:
+        """Write everything to one JSON file.
+
+        ``pool_stats`` and ``connections`` are the engine's
+        ``get_connection_stats()`` rows and connection records, when known.
+        """
         payload = {
             "overall": analyzer.get_overall_statistics(),
             "resolver_stats": [vars(s) for s in analyzer.get_resolver_statistics()],
             "protocol_stats": analyzer.get_protocol_statistics(),
             "dnssec_stats": analyzer.get_dnssec_statistics(),
+            "connection_stats": analyzer.get_connection_statistics(),
+            "family_stats": analyzer.get_family_statistics(),
+            "pool_stats": pool_stats,
+            "connections": connections,
             "raw_results": [
-                {
-                    "resolver_name": r.resolver_name,
-                    "resolver_ip": r.resolver_ip,
-                    "domain": r.domain,
-                    "record_type": r.record_type,
-                    "latency_ms": r.latency_ms,
-                    "status": r.status.value,
-                    "answers_count": len(r.answers),
-                    "ttl": r.ttl,
-                    "error_message": r.error_message,
-                    "start_time": r.start_time,
-                    "end_time": r.end_time,
-                    "attempt_number": r.attempt_number,
-                    "cache_hit": r.cache_hit,
-                    "iteration": r.iteration,
-                    "query_id": r.query_id,
-                    "protocol": r.protocol.value,
-                    "dnssec_validated": r.dnssec_validated,
-                }
-                for r in results
+                {name: record[name] for name in _RAW_JSON_FIELDS}
+                for record in _result_table(results, analyzer).records()
             ],
             "domain_stats": domain_stats,
             "record_type_stats": record_type_stats,
@@ -73,32 +161,11 @@ class CSVExporter:
     """Export DNS benchmark results to CSV format."""
 
     @staticmethod
-    def export_raw_results(results: List[DNSQueryResult], output_path: str) -> None:
+    def export_raw_results(results: Results, output_path: str) -> None:
         """Export raw query results to CSV."""
-        data = []
-        for result in results:
-            data.append(
-                {
-                    "timestamp": result.start_time,
-                    "resolver_name": result.resolver_name,
-                    "resolver_ip": result.resolver_ip,
-                    "domain": result.domain,
-                    "record_type": result.record_type,
-                    "latency_ms": result.latency_ms,
-                    "status": result.status.value,
-                    "answers_count": len(result.answers),
-                    "ttl": result.ttl or "",
-                    "error_message": result.error_message or "",
-                    "cache_hit": result.cache_hit,
-                    "iteration": result.iteration,
-                    "query_id": result.query_id,
-                    "protocol": result.protocol.value,
-                    "dnssec_validated": result.dnssec_validated,
-                }
-            )
-
-        df = pd.DataFrame(data)
-        df.to_csv(output_path, index=False)
+        df = ResultTable.of(results).to_dataframe()
+        df = df.rename(columns={"start_time": "timestamp"})
+        df[list(_RAW_CSV_COLUMNS)].to_csv(output_path, index=False)
 
     @staticmethod
     def export_summary_statistics(
@@ -168,19 +235,34 @@ class CSVExporter:
         df = pd.DataFrame(dnssec_stats)
         df.to_csv(output_path, index=False)
 
+    @staticmethod
+    def export_connection_statistics(
+        pool_stats: List[Dict[str, Any]], output_path: str
+    ) -> None:
+        df = pd.DataFrame(pool_stats)
+        df.to_csv(output_path, index=False)
+
+    @staticmethod
+    def export_family_statistics(
+        family_stats: List[Dict[str, Any]], output_path: str
+    ) -> None:
+        df = pd.DataFrame(family_stats)
+        df.to_csv(output_path, index=False)
+
 
 class ExcelExporter:
     """Export DNS benchmark results to Excel format."""
 
     @staticmethod
     def export_results(
-        results: List[DNSQueryResult],
+        results: Results,
         analyzer: BenchmarkAnalyzer,
         output_path: str,
         domain_stats: Optional[List[Dict[str, Any]]] = None,
         record_type_stats: Optional[List[Dict[str, Any]]] = None,
         error_stats: Optional[Dict[str, int]] = None,
         include_charts: bool = False,
+        pool_stats: Optional[List[Dict[str, Any]]] = None,
     ) -> None:
         wb = Workbook()
         wb.remove(wb.active)
@@ -190,7 +272,7 @@ class ExcelExporter:
         chart_paths = []
         try:
             # Add standard sheets
-            ExcelExporter._add_raw_data_sheet(wb, results)
+            ExcelExporter._add_raw_data_sheet(wb, _result_table(results, analyzer))
             ExcelExporter._add_resolver_summary_sheet(wb, analyzer)
 
             if domain_stats:
@@ -219,6 +301,24 @@ class ExcelExporter:
             if dnssec_stats:
                 ExcelExporter._add_dnssec_sheet(wb, dnssec_stats)
 
+            # Connection setup cost: pools, then cold vs warm queries
+            if pool_stats:
+                ExcelExporter._add_simple_table_sheet(
+                    wb, "Connection Pools", _blank_missing(pool_stats)
+                )
+            connection_stats = analyzer.get_connection_statistics()
+            if connection_stats:
+                ExcelExporter._add_simple_table_sheet(
+                    wb, "Cold vs Warm", _blank_missing(connection_stats)
+                )
+
+            # IPv4 vs IPv6, when the run queried both
+            family_stats = analyzer.get_family_statistics()
+            if len({row["family"] for row in family_stats}) > 1:
+                ExcelExporter._add_simple_table_sheet(
+                    wb, "Address Families", _blank_missing(family_stats)
+                )
+
             # Add charts if requested
             if include_charts:
                 temp_dir = tempfile.mkdtemp()
@@ -268,32 +368,14 @@ class ExcelExporter:
             ws.column_dimensions[letter].width = min(max_length + 2, 50)
 
     @staticmethod
-    def _add_raw_data_sheet(wb: Workbook, results: List[DNSQueryResult]) -> None:
+    def _add_raw_data_sheet(wb: Workbook, table: ResultTable) -> None:
         """Add raw query results sheet."""
         ws = wb.create_sheet("Raw Data")
 
-        data = []
-        for result in results:
-            data.append(
-                {
-                    "Resolver Name": result.resolver_name,
-                    "Resolver IP": result.resolver_ip,
-                    "Domain": result.domain,
-                    "Record Type": result.record_type,
-                    "Latency (ms)": result.latency_ms,
-                    "Status": result.status.value,
-                    "Answers Count": len(result.answers),
-                    "TTL": result.ttl or "",
-                    "Error Message": result.error_message or "",
-                    "Attempts": result.attempt_number,
-                    "Cached": result.cache_hit,
-                    "Iteration": result.iteration,
-                    "Protocol": result.protocol.value,
-                    "DNSSEC Validated": result.dnssec_validated,
-                }
-            )
-
-        df = pd.DataFrame(data)
+        df = table.to_dataframe()
+        ttl = df["ttl"].astype(object).where(df["ttl"].notna(), "")
+        df = df.assign(ttl=ttl)[list(_RAW_SHEET_HEADERS)]
+        df = df.rename(columns=_RAW_SHEET_HEADERS)
 
         # Add headers with formatting
         headers = list(df.columns)
@@ -576,7 +658,7 @@ class PDFExporter:
 
     @staticmethod
     def export_results(
-        results: List[DNSQueryResult],
+        results: Results,
         analyzer: BenchmarkAnalyzer,
         output_path: str,
         include_success_chart: bool = False,
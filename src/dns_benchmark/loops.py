@@ -0,0 +1,47 @@
+"""Event loop selection: the default asyncio loop or uvloop."""
+
+import asyncio
+import importlib.util
+from typing import Any, Coroutine, TypeVar, cast
+
+T = TypeVar("T")
+
+EVENT_LOOPS = ("auto", "asyncio", "uvloop")
+
+
+def uvloop_available() -> bool:
+    return importlib.util.find_spec("uvloop") is not None
+
+
+def resolve_event_loop(name: str = "auto") -> str:
+    """Concrete loop for ``name``; "auto" picks uvloop when it is installed.
+
+    Raises:
+        ValueError: Unknown loop name.
+        RuntimeError: "uvloop" was asked for but is not installed.
+    """
+    name = name.lower()
+    if name not in EVENT_LOOPS:
+        raise ValueError(f"Unsupported event loop: {name}")
+    if name == "auto":
+        return "uvloop" if uvloop_available() else "asyncio"
+    if name == "uvloop" and not uvloop_available():
+        raise RuntimeError(
+            "The uvloop event loop requires 'uvloop'. "
+            "Install with: pip install dns-benchmark-tool[uvloop]"
+        )
+    return name
+
+
+def run(main: Coroutine[Any, Any, T], event_loop: str = "auto") -> T:
+    """Run ``main`` to completion on a new loop, like :func:`asyncio.run`."""
+    try:
+        event_loop = resolve_event_loop(event_loop)
+    except (ValueError, RuntimeError):
+        main.close()  # never awaited
+        raise
+    if event_loop == "uvloop":
+        import uvloop
+
+        return cast(T, uvloop.run(main))
+    return asyncio.run(main)
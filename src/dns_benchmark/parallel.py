@@ -0,0 +1,183 @@
+"""Benchmark runs sharded across worker processes."""
+
+import contextlib
+import multiprocessing
+import multiprocessing.context
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dns_benchmark.core import DNSQueryEngine
+from dns_benchmark.loops import run
+from dns_benchmark.table import ResultTable
+
+SHARD_MODES = ("query", "resolver")
+_PROGRESS_INTERVAL_S = 0.1
+
+
+class _ProgressReporter:
+    """Engine progress callback that forwards a worker's count, throttled."""
+
+    def __init__(self, progress: "queue.Queue[Tuple[int, int]]", worker: int):
+        self.progress = progress
+        self.worker = worker
+        self._last = 0.0
+
+    def __call__(self, completed: int, total: int) -> None:
+        now = time.monotonic()
+        if completed >= total or now - self._last >= _PROGRESS_INTERVAL_S:
+            self._last = now
+            self.progress.put((self.worker, completed))
+
+
+def _run_shard(
+    engine_options: Dict[str, Any],
+    run_options: Dict[str, Any],
+    progress: "Optional[queue.Queue[Tuple[int, int]]]",
+    worker: int,
+    event_loop: str,
+) -> ResultTable:
+    """Worker process entry point: one engine on its own event loop."""
+    engine = DNSQueryEngine(**engine_options)
+    if progress is not None:
+        engine.set_progress_callback(_ProgressReporter(progress, worker))
+
+    async def _run() -> ResultTable:
+        try:
+            return await engine.run_benchmark_table(**run_options)
+        finally:
+            await engine.close()
+
+    return run(_run(), event_loop)
+
+
+def _resolver_shard_rows(
+    local: int, shard: int, workers: int, n_res: int, n_dom: int, n_rt: int
+) -> np.ndarray:
+    """Plan indexes of a resolver shard's rows (it ran ``resolvers[shard::workers]``)."""
+    rows = np.arange(local, dtype=np.int64)
+    n_local = len(range(shard, n_res, workers))
+    record_type = rows % n_rt
+    rows //= n_rt
+    domain = rows % n_dom
+    rows //= n_dom
+    resolver = shard + (rows % n_local) * workers
+    iteration = rows // n_local
+    return ((iteration * n_res + resolver) * n_dom + domain) * n_rt + record_type
+
+
+def run_sharded_benchmark(
+    workers: int,
+    resolvers: List[Dict[str, str]],
+    domains: List[str],
+    record_types: Optional[List[str]] = None,
+    iterations: int = 1,
+    shard_by: str = "query",
+    engine_options: Optional[Dict[str, Any]] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    rate: Optional[float] = None,
+    event_loop: str = "auto",
+    mp_context: Optional[multiprocessing.context.BaseContext] = None,
+    **run_options: Any,
+) -> ResultTable:
+    """Split a benchmark across ``workers`` processes and merge the results.
+
+    Each worker builds its own :class:`DNSQueryEngine` from
+    ``engine_options`` and runs its share of the plan on its own event loop,
+    so load generation is not limited to one core. With ``shard_by="query"``
+    worker k runs every ``workers``-th query of the plan; with
+    ``shard_by="resolver"`` it runs all queries for every ``workers``-th
+    resolver, so per-resolver limits, RTT estimates and circuit breakers see
+    the resolver's whole traffic. Engine state (caches, connection pools,
+    concurrency limits) is per worker. An open-loop ``rate`` is split
+    between workers in proportion to their share of the plan. Workers run
+    on ``event_loop`` (see :func:`dns_benchmark.loops.run`). Other keyword
+    arguments (warmup, protocol, ...) are passed to every worker's run.
+
+    Returns:
+        A ResultTable in plan order, as :meth:`DNSQueryEngine.run_benchmark_table`
+        would return for the whole run, with query IDs renumbered from 1 so
+        they stay unique. ``progress_callback`` receives the combined
+        completed count and the total.
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f"Unsupported shard mode: {shard_by}")
+    record_types = record_types or ["A"]
+    n_res, n_dom, n_rt = len(resolvers), len(domains), len(record_types)
+    total = n_res * n_dom * n_rt * iterations
+    workers = max(1, min(workers, n_res if shard_by == "resolver" else total))
+
+    shards: List[Dict[str, Any]] = []
+    for shard in range(workers):
+        options = dict(
+            run_options,
+            domains=domains,
+            record_types=record_types,
+            iterations=iterations,
+        )
+        if shard_by == "resolver":
+            options["resolvers"] = resolvers[shard::workers]
+            share = len(options["resolvers"]) / n_res
+        else:
+            options["resolvers"] = resolvers
+            options["shard"] = (shard, workers)
+            share = len(range(shard, total, workers)) / total
+        options["rate"] = rate * share if rate is not None else None
+        shards.append(options)
+
+    context = mp_context or multiprocessing.get_context()
+    with contextlib.ExitStack() as stack:
+        progress: "Optional[queue.Queue[Tuple[int, int]]]" = None
+        if progress_callback is not None:
+            progress = stack.enter_context(context.Manager()).Queue()
+        pool = stack.enter_context(
+            ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        )
+        futures = [
+            pool.submit(
+                _run_shard, engine_options or {}, options, progress, shard, event_loop
+            )
+            for shard, options in enumerate(shards)
+        ]
+        completed = [0] * workers
+
+        def _drain() -> None:
+            if progress is None or progress_callback is None:
+                return
+            updated = False
+            while True:
+                try:
+                    worker, count = progress.get_nowait()
+                except queue.Empty:
+                    break
+                completed[worker] = max(completed[worker], count)
+                updated = True
+            if updated:
+                progress_callback(sum(completed), total)
+
+        pending = set(futures)
+        while pending:
+            _done, pending = wait(
+                pending, timeout=_PROGRESS_INTERVAL_S, return_when=FIRST_COMPLETED
+            )
+            _drain()
+        tables = [future.result() for future in futures]
+        _drain()
+
+    merged = ResultTable(total)
+    next_id = 1
+    for shard, table in enumerate(tables):
+        if shard_by == "resolver":
+            rows = _resolver_shard_rows(len(table), shard, workers, n_res, n_dom, n_rt)
+        else:
+            rows = np.arange(len(table), dtype=np.int64) * workers + shard
+        # Workers number their queries independently; renumber each shard
+        # after the previous one, keeping its own order
+        ids = table.column("query_id")
+        ids[np.argsort(ids, kind="stable")] = np.arange(next_id, next_id + len(ids))
+        next_id += len(ids)
+        merged.put_table(rows, table)
+    return merged
@@ -0,0 +1,107 @@
+"""Engine self-benchmark: client overhead per event loop, no network involved."""
+
+import multiprocessing
+import multiprocessing.connection
+import socket
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from dns_benchmark.core import DNSQueryEngine
+from dns_benchmark.loops import run
+from dns_benchmark.table import ResultTable
+
+_DOMAINS = [f"q{i}.selfbench.test" for i in range(100)]
+_LOCAL = {"name": "local responder", "ip": "127.0.0.1"}
+
+
+@dataclass
+class LoopBenchmark:
+    """Engine throughput and per-query overhead on one event loop."""
+
+    event_loop: str
+    queries: int
+    errors: int
+    duration_s: float
+    qps: float
+    p50_ms: float
+    p99_ms: float
+
+
+def _respond(conn: multiprocessing.connection.Connection) -> None:
+    """Responder process: answer each query with itself, flagged as a response.
+
+    Echoing the query (QR and RA set, NOERROR) costs next to nothing, so
+    what the engine measures is its own and its event loop's overhead.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    conn.send(sock.getsockname()[1])
+    conn.close()
+    while True:
+        data, addr = sock.recvfrom(65535)
+        if len(data) >= 12:
+            sock.sendto(data[:2] + bytes((data[2] | 0x80, 0x80)) + data[4:], addr)
+
+
+async def _measure(
+    engine: DNSQueryEngine, iterations: int
+) -> Tuple[ResultTable, float]:
+    """Timed run (seconds) after an untimed pass that opens the sockets."""
+    try:
+        await engine.run_benchmark_table([_LOCAL], _DOMAINS)
+        start = time.perf_counter_ns()
+        table = await engine.run_benchmark_table(
+            [_LOCAL], _DOMAINS, iterations=iterations
+        )
+        return table, (time.perf_counter_ns() - start) / 1e9
+    finally:
+        await engine.close()
+
+
+def run_self_benchmark(
+    event_loops: List[str],
+    queries: int = 20_000,
+    concurrency: int = 100,
+) -> List[LoopBenchmark]:
+    """Drive the engine against a local UDP responder on each event loop.
+
+    The responder runs in its own process so it does not compete with the
+    loop being measured. Latencies are therefore client-side overhead:
+    scheduling, socket callbacks and response handling.
+    """
+    context = multiprocessing.get_context()
+    receiver, sender = context.Pipe(duplex=False)
+    responder = context.Process(target=_respond, args=(sender,), daemon=True)
+    responder.start()
+    try:
+        port = receiver.recv()
+        iterations = max(1, queries // len(_DOMAINS))
+        reports = []
+        for event_loop in event_loops:
+            engine = DNSQueryEngine(
+                max_concurrent_queries=concurrency,
+                timeout=2.0,
+                max_retries=0,
+                decode_answers=False,
+                dns_port=port,
+            )
+            table, duration = run(_measure(engine, iterations), event_loop)
+            latencies = table.column("latency_ms")
+            reports.append(
+                LoopBenchmark(
+                    event_loop=event_loop,
+                    queries=len(table),
+                    errors=int((~table.to_dataframe()["success"]).sum()),
+                    duration_s=duration,
+                    qps=len(table) / duration if duration > 0 else 0.0,
+                    p50_ms=float(np.percentile(latencies, 50)),
+                    p99_ms=float(np.percentile(latencies, 99)),
+                )
+            )
+        return reports
+    finally:
+        responder.terminate()
+        responder.join()
@@ -0,0 +1,240 @@
+"""Columnar storage of query results."""
+
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from dns_benchmark.core import DNSQueryResult, QueryProtocol, QueryStatus
+
+# Fixed-width columns, in export order
+_NUMERIC_COLUMNS: Dict[str, Any] = {
+    "start_time": np.float64,
+    "end_time": np.float64,
+    "latency_ms": np.float64,
+    "answers_count": np.int32,
+    "attempt_number": np.int16,
+    "cache_hit": np.bool_,
+    "iteration": np.int32,
+    "query_id": np.int64,
+    "dnssec_validated": np.bool_,
+    "resolver_wait_ms": np.float64,
+    "global_wait_ms": np.float64,
+    "queue_wait_ms": np.float64,
+    "first_byte_ms": np.float64,
+    "parse_ms": np.float64,
+    "hedged": np.bool_,
+    "hedge_won": np.bool_,
+    "schedule_lag_ms": np.float64,
+}
+# Repeating strings, stored as codes into a per-table category list
+_CATEGORICAL_COLUMNS = (
+    "resolver_name",
+    "resolver_ip",
+    "domain",
+    "record_type",
+    "error_message",
+    "connection",
+    "family",
+)
+_STATUSES = list(QueryStatus)
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+_PROTOCOLS = list(QueryProtocol)
+_PROTOCOL_CODES = {protocol: code for code, protocol in enumerate(_PROTOCOLS)}
+_SUCCESS = _STATUS_CODES[QueryStatus.SUCCESS]
+_COMPLETED = [_SUCCESS, _STATUS_CODES[QueryStatus.DNSSEC_FAILED]]
+_NO_TTL = -1
+
+
+class _Categories:
+    """Assigns small integer codes to strings in first-seen order."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ResultTable:
+    """Query results stored column by column.
+
+    Numbers live in NumPy arrays that grow by doubling; resolver, domain,
+    record type, error message, connection state, address family, status
+    and protocol are stored as integer codes. :meth:`to_dataframe` hands the
+    numeric columns to pandas as views, without copying, and the analyzer
+    and exporters read from that frame, so no per-query object is needed
+    after a row is written. Answer lists are kept only for rows that have
+    answers (i.e. when answers are decoded).
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        capacity = max(capacity, 1)
+        self._size = 0
+        self._numeric = {
+            name: np.zeros(capacity, dtype=dtype)
+            for name, dtype in _NUMERIC_COLUMNS.items()
+        }
+        self._ttl = np.full(capacity, _NO_TTL, dtype=np.int64)
+        self._status = np.zeros(capacity, dtype=np.int8)
+        self._protocol = np.zeros(capacity, dtype=np.int8)
+        self._codes = {
+            name: np.zeros(capacity, dtype=np.int32) for name in _CATEGORICAL_COLUMNS
+        }
+        self._categories = {name: _Categories() for name in _CATEGORICAL_COLUMNS}
+        self._answers: Dict[int, Sequence[str]] = {}
+
+    @classmethod
+    def of(
+        cls, results: Union["ResultTable", Sequence[DNSQueryResult]]
+    ) -> "ResultTable":
+        """Return ``results`` as a table, converting a list of results once."""
+        if isinstance(results, ResultTable):
+            return results
+        table = cls(len(results))
+        for result in results:
+            table.append(result)
+        return table
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _capacity(self) -> int:
+        return len(self._ttl)
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+
+        def grown(column: np.ndarray, fill: int = 0) -> np.ndarray:
+            new = np.full(capacity, fill, dtype=column.dtype)
+            new[: len(column)] = column
+            return new
+
+        self._numeric = {name: grown(col) for name, col in self._numeric.items()}
+        self._ttl = grown(self._ttl, _NO_TTL)
+        self._status = grown(self._status)
+        self._protocol = grown(self._protocol)
+        self._codes = {name: grown(col) for name, col in self._codes.items()}
+
+    def append(self, result: DNSQueryResult) -> None:
+        """Write ``result`` as the next row."""
+        self.put(self._size, result)
+
+    def put(self, row: int, result: DNSQueryResult) -> None:
+        """Write ``result`` at ``row``, extending the table to cover it.
+
+        Lets a benchmark fill rows in plan order while results arrive in
+        completion order.
+        """
+        if row >= self._capacity:
+            self._grow(row + 1)
+        for name, column in self._numeric.items():
+            column[row] = getattr(result, name)
+        self._ttl[row] = _NO_TTL if result.ttl is None else result.ttl
+        self._status[row] = _STATUS_CODES[result.status]
+        self._protocol[row] = _PROTOCOL_CODES[result.protocol]
+        for name, codes in self._codes.items():
+            codes[row] = self._categories[name].code(getattr(result, name) or "")
+        if result.answers:
+            self._answers[row] = result.answers
+        else:
+            self._answers.pop(row, None)
+        self._size = max(self._size, row + 1)
+
+    def put_table(self, rows: np.ndarray, other: "ResultTable") -> None:
+        """Write every row of ``other`` into this table, row ``i`` at ``rows[i]``.
+
+        Category codes are translated, so tables filled by different
+        engines (e.g. in worker processes) merge into one.
+        """
+        n = len(other)
+        if n == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        needed = int(rows.max()) + 1
+        if needed > self._capacity:
+            self._grow(needed)
+        for name, column in self._numeric.items():
+            column[rows] = other._numeric[name][:n]
+        self._ttl[rows] = other._ttl[:n]
+        self._status[rows] = other._status[:n]
+        self._protocol[rows] = other._protocol[:n]
+        for name, codes in self._codes.items():
+            translate = np.array(
+                [
+                    self._categories[name].code(v)
+                    for v in other._categories[name].values
+                ],
+                dtype=np.int32,
+            )
+            codes[rows] = translate[other._codes[name][:n]]
+        for row, answers in other._answers.items():
+            self._answers[int(rows[row])] = answers
+        self._size = max(self._size, needed)
+
+    def column(self, name: str) -> np.ndarray:
+        """View of a numeric column (no copy)."""
+        return self._numeric[name][: self._size]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """One row per query; numeric columns are views of the table's arrays.
+
+        ``status`` and ``protocol`` hold their string values and ``ttl`` is a
+        nullable integer. ``success`` marks SUCCESS rows and ``completed``
+        SUCCESS or DNSSEC_FAILED rows, whose latency is valid.
+        """
+        n = self._size
+        status = self._status[:n]
+        data: Dict[str, Any] = {
+            name: pd.Categorical.from_codes(
+                self._codes[name][:n], categories=self._categories[name].values
+            )
+            for name in _CATEGORICAL_COLUMNS
+        }
+        data["status"] = pd.Categorical.from_codes(
+            status, categories=[s.value for s in _STATUSES]
+        )
+        data["protocol"] = pd.Categorical.from_codes(
+            self._protocol[:n], categories=[p.value for p in _PROTOCOLS]
+        )
+        data["success"] = status == _SUCCESS
+        data["completed"] = np.isin(status, _COMPLETED)
+        ttl = self._ttl[:n]
+        data["ttl"] = pd.arrays.IntegerArray(ttl, ttl == _NO_TTL)
+        for name, column in self._numeric.items():
+            data[name] = column[:n]
+        return pd.DataFrame(data, copy=False)
+
+    def answers(self, row: int) -> Sequence[str]:
+        return self._answers.get(row, ())
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Rows as plain dicts; a missing TTL, error, connection or family is None."""
+        n = self._size
+        columns: Dict[str, Iterable[Any]] = {
+            name: column[:n].tolist() for name, column in self._numeric.items()
+        }
+        for name in _CATEGORICAL_COLUMNS:
+            strings = self._categories[name].values
+            columns[name] = [strings[code] for code in self._codes[name][:n].tolist()]
+        columns["status"] = [_STATUSES[c].value for c in self._status[:n].tolist()]
+        columns["protocol"] = [_PROTOCOLS[c].value for c in self._protocol[:n].tolist()]
+        columns["ttl"] = [
+            None if ttl == _NO_TTL else ttl for ttl in self._ttl[:n].tolist()
+        ]
+        names = list(columns)
+        for row, values in enumerate(zip(*columns.values())):
+            record: Dict[str, Any] = dict(zip(names, values))
+            record["error_message"] = record["error_message"] or None
+            record["connection"] = record["connection"] or None
+            record["family"] = record["family"] or None
+            record["answers"] = list(self.answers(row))
+            yield record
@@ -0,0 +1,882 @@
+"""Long-lived network transports used by the DNS query engine."""
+
+import asyncio
+import random
+import ssl
+import struct
+import sys
+import time
+import weakref
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from dns_benchmark.wire import QueryTemplate, encode_get_param
+
+# In-flight queries keyed by message ID: (lowercased question bytes, waiter)
+_Pending = Dict[int, Tuple[bytes, "asyncio.Future[bytes]"]]
+
+
+def _free_id(pending: _Pending) -> int:
+    """Pick a random message ID that is not currently in flight."""
+    if len(pending) >= 0xFFFF:
+        raise RuntimeError("All DNS message IDs are in flight")
+    qid = random.getrandbits(16)
+    while qid in pending:
+        qid = random.getrandbits(16)
+    return qid
+
+
+def _resolve_pending(pending: _Pending, data: bytes) -> None:
+    """Complete the waiter whose ID and question match response ``data``."""
+    if len(data) < 12 or not data[2] & 0x80:  # too short or QR bit unset
+        return
+    qid = (data[0] << 8) | data[1]
+    entry = pending.get(qid)
+    if entry is None:
+        return  # late reply to a query that already timed out
+    question, future = entry
+    if data[12 : 12 + len(question)].lower() != question:
+        return
+    del pending[qid]
+    if not future.done():
+        future.set_result(data)
+
+
+def _fail_pending(pending: _Pending, exc: BaseException) -> None:
+    for _question, future in pending.values():
+        if not future.done():
+            future.set_exception(exc)
+    pending.clear()
+
+
+class _DNSDatagramProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol that hands responses back to waiters by message ID.
+
+    A response is only accepted if its ID *and* question section match an
+    in-flight query, so late or stray datagrams never complete the wrong
+    future.
+    """
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.pending: _Pending = {}
+        self.closed = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        _resolve_pending(self.pending, data)
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors (e.g. port unreachable) on a connected socket cannot be
+        # tied to a single query, so every query in flight on it fails.
+        _fail_pending(self.pending, exc)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.closed = True
+        _fail_pending(self.pending, exc or ConnectionResetError("UDP socket closed"))
+
+
+class UDPTransport:
+    """Plain DNS over a small set of long-lived UDP sockets to one resolver.
+
+    Sockets are opened lazily on first use and kept for the lifetime of the
+    engine, so a query costs one ``sendto`` plus one datagram callback — no
+    per-query resolver construction or socket setup inside the timed section.
+    Message IDs are allocated per socket so thousands of queries can share a
+    socket without collisions.
+    """
+
+    def __init__(self, host: str, port: int = 53, sockets: int = 1) -> None:
+        self.host = host
+        self.port = port
+        self.sockets = max(1, sockets)
+        self._protocols: List[_DNSDatagramProtocol] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._open_lock: Optional[asyncio.Lock] = None
+
+    async def _ensure_open(self) -> None:
+        """Open the sockets on the running loop if not already open."""
+        loop = asyncio.get_running_loop()
+        if (
+            self._loop is loop
+            and self._protocols
+            and not any(p.closed for p in self._protocols)
+        ):
+            return
+
+        if self._open_lock is None or self._loop is not loop:
+            # Sockets and locks are bound to the loop that created them; an
+            # engine reused across asyncio.run() calls must start afresh.
+            self.close()
+            self._loop = loop
+            self._open_lock = asyncio.Lock()
+
+        async with self._open_lock:
+            if self._protocols and not any(p.closed for p in self._protocols):
+                return
+            self.close(keep_loop=True)
+            for _ in range(self.sockets):
+                _transport, protocol = await loop.create_datagram_endpoint(
+                    _DNSDatagramProtocol,
+                    remote_addr=(self.host, self.port),
+                )
+                self._protocols.append(protocol)
+
+    def _pick_protocol(self) -> _DNSDatagramProtocol:
+        """Least-loaded socket by number of queries in flight."""
+        return min(self._protocols, key=lambda p: len(p.pending))
+
+    async def query(self, query: Union[bytes, QueryTemplate], timeout: float) -> bytes:
+        """Send a query and return the raw response bytes.
+
+        The message ID in ``query`` is replaced with one that is free on the
+        chosen socket.
+
+        Raises:
+            asyncio.TimeoutError: No matching response within ``timeout``.
+            OSError: The socket reported an error (e.g. connection refused).
+        """
+        await self._ensure_open()
+        template = QueryTemplate.of(query)
+        protocol = self._pick_protocol()
+        qid = _free_id(protocol.pending)
+        future: "asyncio.Future[bytes]" = asyncio.get_running_loop().create_future()
+        protocol.pending[qid] = (template.question, future)
+        try:
+            assert protocol.transport is not None
+            protocol.transport.sendto(template.with_id(qid))
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            entry = protocol.pending.get(qid)
+            if entry is not None and entry[1] is future:
+                del protocol.pending[qid]
+
+    def close(self, keep_loop: bool = False) -> None:
+        """Close all sockets. In-flight queries fail with ConnectionResetError."""
+        for protocol in self._protocols:
+            if protocol.transport is not None:
+                try:
+                    protocol.transport.close()
+                except RuntimeError:
+                    pass  # owning loop already closed — nothing left to schedule
+        self._protocols.clear()
+        if not keep_loop:
+            self._loop = None
+            self._open_lock = None
+
+
+class RTTEstimator:
+    """Adaptive retransmission timeout for one resolver (RFC 6298 style).
+
+    Keeps a smoothed RTT and its mean deviation; the timeout is
+    ``srtt + 4 * rttvar``, clamped to ``[min_timeout, max_timeout]``. Each
+    timeout doubles it until the next RTT sample arrives. Times in seconds.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(
+        self, max_timeout: float, min_timeout: float = 0.05, initial: float = 1.0
+    ) -> None:
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.rto = initial
+        self.samples = 0
+        self.backoffs = 0
+
+    def observe(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+        self.rto = self.srtt + self.K * self.rttvar
+        self.samples += 1
+        self.backoffs = 0
+
+    def backoff(self) -> None:
+        """Record a timeout: the next attempt waits twice as long."""
+        self.backoffs += 1
+
+    def timeout(self) -> float:
+        rto = self.rto * (1 << min(self.backoffs, 16))
+        return min(self.max_timeout, max(self.min_timeout, rto))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "srtt_ms": self.srtt * 1000 if self.srtt is not None else None,
+            "rttvar_ms": self.rttvar * 1000,
+            "timeout_ms": self.timeout() * 1000,
+            "samples": self.samples,
+        }
+
+
+@dataclass
+class ConnectionRecord:
+    """Setup cost, TLS details and use of one DoT, TCP or DoH connection.
+
+    ``connect_ms`` is the TCP connect and ``handshake_ms`` the TLS handshake
+    after it. Before Python 3.11 a DoT handshake cannot be timed on its own,
+    so ``connect_ms`` covers both and ``handshake_ms`` stays None.
+    """
+
+    protocol: str  # "dot", "tcp" or "doh"
+    host: str  # resolver IP, or the DoH URL authority
+    opened_at: float = field(default_factory=time.time)
+    connect_ms: Optional[float] = None
+    handshake_ms: Optional[float] = None
+    tls_version: Optional[str] = None
+    cipher: Optional[str] = None
+    resumed: Optional[bool] = None  # TLS session resumption
+    prewarmed: bool = False  # opened before the measured queries
+    queries: int = 0  # queries sent on this connection
+    closed_at: Optional[float] = None
+
+    def set_tls(self, ssl_object: Any) -> None:
+        """Copy version, cipher and resumption from an ``ssl.SSLObject``."""
+        if ssl_object is None:
+            return
+        self.tls_version = ssl_object.version()
+        cipher = ssl_object.cipher()
+        self.cipher = cipher[0] if cipher else None
+        self.resumed = bool(ssl_object.session_reused)
+
+    def close(self) -> None:
+        if self.closed_at is None:
+            self.closed_at = time.time()
+
+    @property
+    def lifetime_s(self) -> float:
+        """Seconds from open to close, or to now while still open."""
+        end = self.closed_at if self.closed_at is not None else time.time()
+        return end - self.opened_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "lifetime_s": self.lifetime_s}
+
+
+class TLSSessionContext(ssl.SSLContext):
+    """Verifying client context that resumes its latest TLS session.
+
+    asyncio cannot hand a session to a handshake, so :meth:`wrap_bio` (which
+    asyncio calls for every TLS connection) offers the session saved by
+    :meth:`remember`. OpenSSL only resumes a session on the context that
+    created it, so keep one context per server and reuse it for every
+    connection to that server. A server that no longer accepts the session
+    simply completes a full handshake.
+    """
+
+    session: Optional[ssl.SSLSession] = None
+
+    @classmethod
+    def client(cls) -> "TLSSessionContext":
+        """Certificate- and hostname-verifying context, as ``create_default_context``."""
+        context = cls(ssl.PROTOCOL_TLS_CLIENT)
+        context.load_default_certs()
+        return context
+
+    def wrap_bio(
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: Optional[Union[str, bytes]] = None,
+        session: Optional[ssl.SSLSession] = None,
+    ) -> ssl.SSLObject:
+        if session is None and not server_side:
+            session = self.session
+        return super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session
+        )
+
+    def remember(self, ssl_object: Any) -> None:
+        """Keep ``ssl_object``'s session for the next connection, if resumable.
+
+        TLS 1.3 resumes only from a ticket, which arrives after the
+        handshake, so a ticketless TLS 1.3 session never replaces one that
+        has a ticket.
+        """
+        session = getattr(ssl_object, "session", None)
+        if session is None:
+            return
+        if session.has_ticket or ssl_object.version() != "TLSv1.3":
+            self.session = session
+
+
+class StreamConnection:
+    """One TCP or TLS stream carrying pipelined DNS queries (RFC 7766).
+
+    Any number of queries may be written back to back; a single reader task
+    owns the stream and hands each length-prefixed response to the waiter
+    with the matching message ID, so replies may arrive in any order and are
+    never consumed by the wrong coroutine.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        record: Optional[ConnectionRecord] = None,
+        sessions: Optional[TLSSessionContext] = None,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.record = record or ConnectionRecord("tcp", "")
+        # Context to hand this stream's TLS session to once the first
+        # response (and with it any TLS 1.3 ticket) has been read
+        self._sessions = sessions
+        self.pending: _Pending = {}
+        self.closed = False
+        self.loop = asyncio.get_running_loop()
+        # StreamWriter.drain() must not be awaited concurrently on Python 3.9
+        self._write_lock = asyncio.Lock()
+        self._reader_task = self.loop.create_task(self._read_loop())
+
+    @classmethod
+    async def open(
+        cls,
+        host: str,
+        port: int,
+        ssl_context: Optional[ssl.SSLContext],
+        timeout: float,
+    ) -> "StreamConnection":
+        """Connect (and handshake, if ``ssl_context`` is given) within ``timeout``.
+
+        The connect and handshake are timed apart into the connection's
+        :class:`ConnectionRecord`, along with the negotiated TLS parameters.
+        A :class:`TLSSessionContext` resumes its saved session and is given
+        this connection's session in turn.
+        """
+        record = ConnectionRecord("dot" if ssl_context else "tcp", host)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        split_tls = ssl_context is not None and sys.version_info >= (3, 11)
+        start = time.perf_counter_ns()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=None if split_tls else ssl_context),
+            timeout=timeout,
+        )
+        connected = time.perf_counter_ns()
+        record.connect_ms = (connected - start) / 1e6
+        if ssl_context is not None and sys.version_info >= (3, 11):
+            try:
+                await asyncio.wait_for(
+                    writer.start_tls(ssl_context, server_hostname=host),
+                    timeout=max(deadline - loop.time(), 0.0),
+                )
+            except BaseException:
+                writer.close()
+                raise
+            record.handshake_ms = (time.perf_counter_ns() - connected) / 1e6
+        sessions = None
+        if ssl_context is not None:
+            ssl_object = writer.get_extra_info("ssl_object")
+            record.set_tls(ssl_object)
+            if isinstance(ssl_context, TLSSessionContext):
+                ssl_context.remember(ssl_object)
+                sessions = ssl_context
+        return cls(reader, writer, record, sessions)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.pending)
+
+    def is_usable(self) -> bool:
+        """True while the stream is open on the currently running loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return not self.closed and not self.writer.is_closing() and loop is self.loop
+
+    async def _read_loop(self) -> None:
+        exc: BaseException = ConnectionResetError("Connection closed by server")
+        try:
+            while True:
+                raw_len = await self.reader.readexactly(2)
+                (msg_len,) = struct.unpack("!H", raw_len)
+                _resolve_pending(self.pending, await self.reader.readexactly(msg_len))
+                if self._sessions is not None:
+                    self._sessions.remember(self.writer.get_extra_info("ssl_object"))
+                    self._sessions = None
+        except asyncio.IncompleteReadError:
+            pass  # clean EOF — server closed the stream
+        except asyncio.CancelledError:
+            exc = ConnectionResetError("Connection closed")
+            raise
+        except Exception as e:  # ssl.SSLError, ConnectionResetError, ...
+            exc = e
+        finally:
+            self.closed = True
+            self.record.close()
+            _fail_pending(self.pending, exc)
+            self.writer.close()
+
+    async def query(self, query: Union[bytes, QueryTemplate], timeout: float) -> bytes:
+        """Pipeline a query on this stream and return the raw response bytes.
+
+        The message ID in ``query`` is replaced with one that is free on this
+        connection. A timeout only abandons this query; the stream stays open
+        for the others in flight.
+
+        Raises:
+            asyncio.TimeoutError: No matching response within ``timeout``.
+            ConnectionResetError: The stream closed before the response arrived.
+        """
+        if self.closed:
+            raise ConnectionResetError("Connection closed")
+        self.record.queries += 1
+        template = QueryTemplate.of(query)
+        qid = _free_id(self.pending)
+        future: "asyncio.Future[bytes]" = self.loop.create_future()
+        self.pending[qid] = (template.question, future)
+        try:
+            async with self._write_lock:
+                # 2-byte length prefix required by RFC 7858 / RFC 1035
+                self.writer.write(template.framed_with_id(qid))
+                await self.writer.drain()
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            entry = self.pending.get(qid)
+            if entry is not None and entry[1] is future:
+                del self.pending[qid]
+
+    def abort(self) -> bool:
+        """Stop the reader task and close the stream without waiting.
+
+        Returns False if the owning loop is already closed.
+        """
+        self.closed = True
+        self.record.close()
+        try:
+            if not self._reader_task.done():
+                self._reader_task.cancel()
+            self.writer.close()
+        except RuntimeError:
+            return False  # owning loop already closed — nothing left to schedule
+        return True
+
+    async def close(self) -> None:
+        """Stop the reader task and close the stream."""
+        if not self.abort() or self.loop is not asyncio.get_running_loop():
+            return
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+class StreamPool:
+    """Between ``min_connections`` and ``max_connections`` streams to one resolver.
+
+    Each query goes to the least-loaded open connection. A new connection is
+    only opened when every open one already has queries in flight, none is
+    being opened, and the pool is below ``max_connections``; the caller that
+    opens it waits for its handshake and sends the first query on it. While
+    that handshake is in progress, other callers pipeline onto the busy open
+    connections instead of waiting for it. Dead connections (closed by the
+    server, failed, or bound to a previous event loop) are dropped on the
+    next checkout.
+
+    :meth:`prewarm` opens ``min_connections`` in parallel so handshakes
+    happen before the first measured query instead of inside it.
+
+    ``records`` keeps a :class:`ConnectionRecord` for every connection the
+    pool has opened; ``reconnects`` counts those opened to replace an
+    evicted one.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        ssl_context: Optional[ssl.SSLContext],
+        min_connections: int = 1,
+        max_connections: int = 1,
+        connect_timeout: float = 5.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.max_connections = max(1, max_connections)
+        self.min_connections = max(1, min(min_connections, self.max_connections))
+        self.connect_timeout = connect_timeout
+        self.connections: List[StreamConnection] = []
+        # Handshake durations (ms), split by whether they were opened up front
+        self.prewarm_handshakes_ms: List[float] = []
+        self.lazy_handshakes_ms: List[float] = []
+        self.evictions = 0
+        self.records: List[ConnectionRecord] = []
+        self.reconnects = 0
+        self._replaceable = 0  # evicted connections not yet replaced
+        self._opening = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Condition] = None
+
+    def _bind_loop(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            # Streams and the condition belong to the loop that created them;
+            # an engine reused across asyncio.run() calls starts afresh.
+            for conn in self.connections:
+                conn.abort()
+            self.connections.clear()
+            self._opening = 0
+            self._loop = loop
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _prune(self) -> None:
+        """Drop connections that can no longer carry queries."""
+        alive = []
+        for conn in self.connections:
+            if conn.is_usable():
+                alive.append(conn)
+            else:
+                conn.abort()
+                self.evictions += 1
+                self._replaceable += 1
+        self.connections[:] = alive
+
+    async def _open(
+        self, record: List[float], prewarmed: bool = False
+    ) -> StreamConnection:
+        start = time.perf_counter_ns()
+        conn = await StreamConnection.open(
+            self.host, self.port, self.ssl_context, timeout=self.connect_timeout
+        )
+        record.append((time.perf_counter_ns() - start) / 1e6)
+        conn.record.prewarmed = prewarmed
+        self.records.append(conn.record)
+        if self._replaceable:
+            self._replaceable -= 1
+            self.reconnects += 1
+        return conn
+
+    async def acquire(self) -> Tuple[StreamConnection, bool]:
+        """Return the connection the next query should be pipelined on.
+
+        Also says whether the checkout was cold: only the caller that opened
+        the connection on demand paid its connect and handshake. Callers
+        handed an existing connection, even one not yet used, are warm.
+        """
+        changed = self._bind_loop()
+        async with changed:
+            while True:
+                self._prune()
+                conn = min(self.connections, key=lambda c: c.in_flight, default=None)
+                room = len(self.connections) + self._opening < self.max_connections
+                if conn is not None and (
+                    conn.in_flight == 0 or self._opening or not room
+                ):
+                    return conn, False
+                if room:
+                    break
+                # Every slot is a handshake in progress — wait for one to land
+                await changed.wait()
+            self._opening += 1
+
+        conn = None
+        try:
+            conn = await self._open(self.lazy_handshakes_ms)
+            return conn, True
+        finally:
+            async with changed:
+                self._opening -= 1
+                if conn is not None:
+                    self.connections.append(conn)
+                changed.notify_all()
+
+    async def prewarm(self) -> List[float]:
+        """Open connections in parallel until ``min_connections`` are up.
+
+        Returns the handshake durations (ms) of the connections opened.
+
+        Raises:
+            OSError, ssl.SSLError, asyncio.TimeoutError: A handshake failed;
+                connections that did succeed are kept.
+        """
+        changed = self._bind_loop()
+        async with changed:
+            self._prune()
+            missing = self.min_connections - len(self.connections) - self._opening
+            if missing <= 0:
+                return []
+            self._opening += missing
+
+        timings: List[float] = []
+        outcomes = await asyncio.gather(
+            *(self._open(timings, prewarmed=True) for _ in range(missing)),
+            return_exceptions=True,
+        )
+        async with changed:
+            self._opening -= missing
+            self.connections.extend(
+                o for o in outcomes if isinstance(o, StreamConnection)
+            )
+            changed.notify_all()
+        self.prewarm_handshakes_ms.extend(timings)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return timings
+
+    def discard(self, conn: StreamConnection) -> None:
+        """Remove ``conn`` from the pool and close it (e.g. after a TLS error)."""
+        if conn in self.connections:
+            self.connections.remove(conn)
+            self.evictions += 1
+            self._replaceable += 1
+        conn.abort()
+
+    async def close(self) -> None:
+        """Close every connection in the pool."""
+        connections, self.connections = self.connections, []
+        for conn in connections:
+            await conn.close()
+        self._loop = None
+        self._changed = None
+
+
+class _ConnectTrace:
+    """httpcore ``trace`` hook: records the connection a request opened, if any.
+
+    ``on_send`` is called as the request headers start going out, after any
+    connect, TLS handshake or wait for a pooled connection.
+    """
+
+    def __init__(
+        self,
+        transport: "DoHTransport",
+        authority: str,
+        on_send: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.transport = transport
+        self.authority = authority
+        self.on_send = on_send
+        self.record: Optional[ConnectionRecord] = None
+        self._mark = 0
+
+    @property
+    def opened(self) -> bool:
+        return self.record is not None and self.record.connect_ms is not None
+
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter_ns()
+        if event.endswith(".send_request_headers.started"):
+            if self.on_send is not None:
+                self.on_send()
+            return
+        if event == "connection.connect_tcp.started":
+            self.record = ConnectionRecord("doh", self.authority)
+        elif self.record is None:
+            return
+        elif event == "connection.connect_tcp.complete":
+            self.record.connect_ms = (now - self._mark) / 1e6
+            self.transport.connections.append(self.record)
+            self.transport._track(info.get("return_value"), self.record)
+        elif event == "connection.start_tls.complete":
+            self.record.handshake_ms = (now - self._mark) / 1e6
+            stream = info.get("return_value")
+            if stream is not None:
+                self.record.set_tls(stream.get_extra_info("ssl_object"))
+            self.transport._track(stream, self.record)
+        self._mark = now
+
+
+class DoHTransport:
+    """RFC 8484 DNS-over-HTTPS with one connection pool per URL authority.
+
+    Resolvers whose DoH URLs share a scheme, host and port share one
+    ``httpx.AsyncClient``, so HTTP/2 multiplexes all of their queries over
+    the same connections instead of each resolver IP holding its own pool.
+
+    ``method`` selects POST (wire in the body) or GET (base64url ``dns=``
+    parameter). With ``zero_id`` the message ID is sent as 0, as RFC 8484
+    recommends, so identical GET queries are byte-identical and cacheable.
+    ``max_streams`` caps the requests in flight per authority — the client
+    side of HTTP/2 stream concurrency; the server's own
+    SETTINGS_MAX_CONCURRENT_STREAMS still applies per connection.
+
+    Each request carries an httpcore ``trace`` hook, so connections opened
+    by the client are timed into ``connections`` and every response is
+    matched to its connection's record. httpx closes idle connections on
+    its own; their records are only marked closed by :meth:`close`.
+    """
+
+    METHODS = ("POST", "GET")
+    CONTENT_TYPE = "application/dns-message"
+
+    def __init__(
+        self,
+        method: str = "POST",
+        http2: bool = True,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        max_streams: Optional[int] = None,
+        zero_id: bool = True,
+        timeout: float = 5.0,
+    ) -> None:
+        method = method.upper()
+        if method not in self.METHODS:
+            raise ValueError(
+                f"Unsupported DoH method '{method}'. Use one of: {', '.join(self.METHODS)}"
+            )
+        self.method = method
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_streams = max_streams
+        self.zero_id = zero_id
+        self.timeout = timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stream_limits: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connections: List[ConnectionRecord] = []
+        # Network stream -> its connection's record. Weakly keyed, so
+        # entries go away with the connections httpx drops.
+        self._streams: "weakref.WeakKeyDictionary[Any, ConnectionRecord]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @staticmethod
+    def authority(url: str) -> str:
+        """Pool key for ``url``: scheme plus host and port."""
+        parsed = httpx.URL(url)
+        return f"{parsed.scheme}://{parsed.netloc.decode('ascii')}"
+
+    def _client_for(
+        self, url: str
+    ) -> Tuple[httpx.AsyncClient, Optional[asyncio.Semaphore]]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Pooled connections belong to the loop that opened them and
+            # cannot be closed from another one — start afresh.
+            self._clients.clear()
+            self._stream_limits.clear()
+            self._forget_streams()
+            self._loop = loop
+        key = self.authority(url)
+        client = self._clients.get(key)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                verify=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+            )
+            self._clients[key] = client
+            if self.max_streams:
+                self._stream_limits[key] = asyncio.Semaphore(self.max_streams)
+        return client, self._stream_limits.get(key)
+
+    def _track(self, stream: Any, record: ConnectionRecord) -> None:
+        if stream is not None:
+            self._streams[stream] = record
+
+    def _forget_streams(self) -> None:
+        for record in self.connections:
+            record.close()
+        self._streams.clear()
+
+    def _record_for(self, stream: Any) -> Optional[ConnectionRecord]:
+        return self._streams.get(stream) if stream is not None else None
+
+    async def _send(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        template: QueryTemplate,
+        trace: _ConnectTrace,
+    ) -> bytes:
+        if self.zero_id:
+            wire = template.wire
+            param = template.get_param if self.method == "GET" else ""
+        else:
+            wire = template.with_id(random.getrandbits(16))
+            param = encode_get_param(wire) if self.method == "GET" else ""
+        if self.method == "GET":
+            response = await client.get(
+                url,
+                params={"dns": param},
+                headers={"Accept": self.CONTENT_TYPE},
+                extensions={"trace": trace},
+            )
+        else:
+            response = await client.post(
+                url,
+                content=wire,
+                headers={
+                    "Content-Type": self.CONTENT_TYPE,
+                    "Accept": self.CONTENT_TYPE,
+                },
+                extensions={"trace": trace},
+            )
+        record = trace.record if trace.opened else None
+        if record is None and isinstance(response.extensions, dict):
+            record = self._record_for(response.extensions.get("network_stream"))
+        if record is not None:
+            record.queries += 1
+        response.raise_for_status()
+        return bytes(response.content)
+
+    async def query(self, url: str, query: Union[bytes, QueryTemplate]) -> bytes:
+        """Send ``query`` to ``url`` and return the raw response message.
+
+        Raises:
+            httpx.TimeoutException: No response within the client timeout.
+            httpx.HTTPStatusError: The server answered with a non-2xx status.
+        """
+        response, _cold = await self.query_with_state(url, query)
+        return response
+
+    async def query_with_state(
+        self,
+        url: str,
+        query: Union[bytes, QueryTemplate],
+        on_send: Optional[Callable[[], None]] = None,
+    ) -> Tuple[bytes, bool]:
+        """Like :meth:`query`, also saying whether the request was cold.
+
+        A cold request opened the connection it was sent on. ``on_send`` is
+        called once a ``max_streams`` slot is held, and again as the request
+        headers go out, so the last call excludes the stream-cap wait and
+        any TCP connect and TLS handshake.
+        """
+        template = QueryTemplate.of(query)
+        client, streams = self._client_for(url)
+        trace = _ConnectTrace(self, self.authority(url), on_send)
+        if streams is None:
+            if on_send is not None:
+                on_send()
+            response = await self._send(client, url, template, trace)
+        else:
+            async with streams:
+                if on_send is not None:
+                    on_send()
+                response = await self._send(client, url, template, trace)
+        return response, trace.opened
+
+    async def close(self) -> None:
+        """Close every pooled client."""
+        clients, self._clients = self._clients, {}
+        self._stream_limits.clear()
+        self._forget_streams()
+        same_loop = self._loop is asyncio.get_running_loop()
+        self._loop = None
+        if not same_loop:
+            return  # opened on a loop that is gone; nothing left to close
+        for client in clients.values():
+            await client.aclose()
@@ -0,0 +1,214 @@
+"""Pre-encoded DNS queries and fast response parsing."""
+
+import base64
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.rdatatype
+
+
+def question_end(wire: bytes) -> int:
+    """Return the offset just past the first question of a DNS message.
+
+    Only uncompressed names are expected here — queries we build ourselves
+    never compress the question name.
+    """
+    offset = 12
+    while True:
+        length = wire[offset]
+        if length == 0:
+            return offset + 5  # root label + QTYPE + QCLASS
+        offset += length + 1
+
+
+class QueryTemplate:
+    """Wire form of one question, encoded once and sent many times.
+
+    The message is stored with ID 0; each send only patches the two ID bytes.
+    ``framed`` carries the 2-byte length prefix used on TCP/TLS streams, and
+    ``question`` the lowercased question section used to match responses.
+    """
+
+    __slots__ = ("wire", "framed", "question", "rdtype", "_get_param")
+
+    def __init__(self, wire: bytes, rdtype: Optional[int] = None) -> None:
+        self.wire = b"\x00\x00" + wire[2:]
+        self.framed = struct.pack("!H", len(wire)) + self.wire
+        end = question_end(wire)
+        self.question = wire[12:end].lower()
+        self.rdtype = (
+            rdtype
+            if rdtype is not None
+            else struct.unpack("!H", wire[end - 4 : end - 2])[0]
+        )
+        self._get_param: Optional[str] = None
+
+    @classmethod
+    def of(cls, query: Union[bytes, "QueryTemplate"]) -> "QueryTemplate":
+        """Return ``query`` itself if already a template, else wrap raw wire."""
+        return query if isinstance(query, QueryTemplate) else cls(query)
+
+    def with_id(self, qid: int) -> bytes:
+        return qid.to_bytes(2, "big") + self.wire[2:]
+
+    def framed_with_id(self, qid: int) -> bytes:
+        return self.framed[:2] + qid.to_bytes(2, "big") + self.framed[4:]
+
+    @property
+    def get_param(self) -> str:
+        """base64url (unpadded) of the ID-0 message, for RFC 8484 GET ``dns=``."""
+        if self._get_param is None:
+            self._get_param = encode_get_param(self.wire)
+        return self._get_param
+
+
+def encode_get_param(wire: bytes) -> str:
+    """base64url without padding, as the DoH ``dns`` GET parameter requires."""
+    return base64.urlsafe_b64encode(wire).rstrip(b"=").decode("ascii")
+
+
+class QueryTemplateCache:
+    """Query templates keyed by (domain, record type, DO bit).
+
+    Holds at most ``max_entries`` templates; the oldest is dropped first.
+    """
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self._templates: Dict[Tuple[str, str, bool], QueryTemplate] = {}
+
+    def get(self, domain: str, record_type: str, dnssec: bool = False) -> QueryTemplate:
+        """Return the template for this question, encoding it on first use.
+
+        Raises:
+            dns.exception.DNSException: ``domain`` or ``record_type`` is invalid.
+        """
+        key = (domain, record_type, dnssec)
+        template = self._templates.get(key)
+        if template is None:
+            rdtype = dns.rdatatype.from_text(record_type)
+            request = dns.message.make_query(dns.name.from_text(domain), rdtype)
+            if dnssec:
+                request.use_edns(0, dns.flags.DO, 1232)
+            template = QueryTemplate(request.to_wire(), rdtype=rdtype)
+            if len(self._templates) >= self.max_entries:
+                del self._templates[next(iter(self._templates))]
+            self._templates[key] = template
+        return template
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def clear(self) -> None:
+        self._templates.clear()
+
+
+class ParsedResponse:
+    """The parts of a DNS response a benchmark result needs.
+
+    ``answers_count`` and ``ttl`` cover only the records of the queried type;
+    CNAMEs leading to them are part of the chain, not the result.
+    ``answers`` is None unless the response was fully decoded.
+    """
+
+    __slots__ = ("rcode", "flags", "answers_count", "ttl", "answers")
+
+    def __init__(
+        self,
+        rcode: int,
+        flags: int,
+        answers_count: int,
+        ttl: Optional[int],
+        answers: Optional[List[str]] = None,
+    ) -> None:
+        self.rcode = rcode
+        self.flags = flags
+        self.answers_count = answers_count
+        self.ttl = ttl
+        self.answers = answers
+
+    @property
+    def authenticated(self) -> bool:
+        """AD flag — the resolver validated the answer with DNSSEC."""
+        return bool(self.flags & dns.flags.AD)
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.flags & dns.flags.TC)
+
+
+def _skip_name(raw: bytes, offset: int) -> int:
+    """Return the offset just past the (possibly compressed) name at ``offset``."""
+    while True:
+        length = raw[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2  # compression pointer ends the name
+        offset += length + 1
+
+
+def parse_header(raw: bytes, rdtype: int) -> ParsedResponse:
+    """Read rcode, flags, answer count and first TTL straight from the wire.
+
+    Answer records are walked but never decoded, so responses full of RRSIGs
+    cost little more than a header read. Only the header rcode is seen —
+    extended (EDNS) rcodes are not combined in.
+
+    Raises:
+        dns.exception.FormError: The message is truncated or malformed.
+    """
+    try:
+        _qid, flags, qdcount, ancount = struct.unpack_from("!HHHH", raw)
+        offset = 12
+        for _ in range(qdcount):
+            offset = _skip_name(raw, offset) + 4  # QTYPE + QCLASS
+        count = 0
+        ttl: Optional[int] = None
+        for _ in range(ancount):
+            offset = _skip_name(raw, offset)
+            rtype, _rclass, rttl, rdlength = struct.unpack_from("!HHIH", raw, offset)
+            offset += 10 + rdlength
+            if rtype == rdtype:
+                count += 1
+                if ttl is None:
+                    ttl = rttl
+    except (struct.error, IndexError) as e:
+        raise dns.exception.FormError(  # type: ignore[no-untyped-call]
+            f"Malformed DNS response: {e}"
+        ) from e
+    if offset > len(raw):
+        raise dns.exception.FormError(  # type: ignore[no-untyped-call]
+            "Malformed DNS response: truncated record"
+        )
+    return ParsedResponse(flags & 0xF, flags, count, ttl)
+
+
+def summarize_message(
+    message: dns.message.Message, rdtype: int, decode_answers: bool = True
+) -> ParsedResponse:
+    """Build a ParsedResponse from an already decoded message."""
+    rrset = next((r for r in message.answer if r.rdtype == rdtype), None)
+    answers = None
+    if decode_answers:
+        answers = [str(rdata) for rdata in rrset] if rrset else []
+    return ParsedResponse(
+        message.rcode(),
+        message.flags,
+        len(rrset) if rrset else 0,
+        rrset.ttl if rrset else None,
+        answers,
+    )
+
+
+def parse_response(
+    raw: bytes, rdtype: int, decode_answers: bool = False
+) -> ParsedResponse:
+    """Parse a response, fully decoding it only if ``decode_answers`` is set."""
+    if decode_answers:
+        return summarize_message(dns.message.from_wire(raw), rdtype)
+    return parse_header(raw, rdtype)
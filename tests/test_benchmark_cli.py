@@ -14,6 +14,7 @@ from click.testing import CliRunner
 
 from dns_benchmark.cli import (
     FeedbackManager,
+    _connection_summary,
     cli,
     create_progress_bar,
     feedback,
@@ -21,6 +22,7 @@ from dns_benchmark.cli import (
     show_feedback_prompt,
 )
 from dns_benchmark.core import DNSQueryResult, QueryStatus
+from dns_benchmark.table import ResultTable
 
 
 @pytest.fixture
@@ -49,15 +51,13 @@ def test_cli_configuration_and_warmup(monkeypatch):
         "dns_benchmark.cli.DomainManager.get_sample_domains", lambda: ["example.com"]
     )
 
-    # Patch engine.run_benchmark to be async
-    class DummyResult:
-        cache_hit = False
-
-    async def fake_run_benchmark(*a, **k):
-        return [DummyResult()]
+    # Patch engine.run_benchmark_table to be async
+    async def fake_run_benchmark_table(*a, **k):
+        return ResultTable()
 
     monkeypatch.setattr(
-        "dns_benchmark.cli.DNSQueryEngine.run_benchmark", fake_run_benchmark
+        "dns_benchmark.cli.DNSQueryEngine.run_benchmark_table",
+        fake_run_benchmark_table,
     )
 
     # Patch BenchmarkAnalyzer to return dummy stats
@@ -161,7 +161,8 @@ def test_benchmark_exports_csv_excel_pdf_json(tmp_path, sample_results):
     outdir = tmp_path / "results"
 
     with patch(
-        "dns_benchmark.core.DNSQueryEngine.run_benchmark", return_value=sample_results
+        "dns_benchmark.core.DNSQueryEngine.run_benchmark_table",
+        return_value=ResultTable.of(sample_results),
     ):
         with (
             patch(
@@ -294,6 +295,94 @@ def test_cli_domain_generic_error(monkeypatch):
     assert "Error loading domains" in result.output
 
 
+def test_cli_family_both_races_with_happy_eyeballs(monkeypatch, tmp_path):
+    runner = CliRunner()
+    seen = {}
+
+    async def fake_run_benchmark_table(self, resolvers, domains, **kwargs):
+        seen["resolvers"] = resolvers
+        seen["delay"] = self.happy_eyeballs_delay_ms
+        return ResultTable.of(
+            [
+                DNSQueryResult(
+                    resolver_ip=ip,
+                    resolver_name="Cloudflare",
+                    domain="example.com",
+                    record_type="A",
+                    start_time=0.0,
+                    end_time=0.01,
+                    latency_ms=latency,
+                    status=QueryStatus.SUCCESS,
+                    answers=[],
+                    ttl=300,
+                )
+                for ip, latency in (("2606:4700:4700::1111", 5.0), ("1.1.1.1", 9.0))
+            ]
+        )
+
+    monkeypatch.setattr(
+        "dns_benchmark.cli.DNSQueryEngine.run_benchmark_table",
+        fake_run_benchmark_table,
+    )
+    result = runner.invoke(
+        cli,
+        ["benchmark", "-r", "Cloudflare,192.0.2.53", "-d", "example.com"]
+        + ["--family", "both", "--happy-eyeballs", "--formats", "csv"]
+        + ["--output", str(tmp_path)],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert seen["resolvers"] == [
+        {"name": "Cloudflare", "ip": "1.1.1.1", "ipv6": "2606:4700:4700::1111"},
+        {"name": "192.0.2.53", "ip": "192.0.2.53"},
+    ]
+    assert seen["delay"] == 250.0
+    assert "192.0.2.53: no IPv6 address" in result.output
+    assert "Address families: IPv4 1 queries (avg 9.00 ms)" in result.output
+    [families] = tmp_path.glob("*_families.csv")
+    rows = list(csv.DictReader(families.open()))
+    assert [row["family"] for row in rows] == ["IPv4", "IPv6"]
+
+
+def test_connection_summary_shows_wait_next_to_latency():
+    def _result(connection, latency, wait):
+        return DNSQueryResult(
+            resolver_ip="1.1.1.1",
+            resolver_name="Cloudflare",
+            domain="example.com",
+            record_type="A",
+            start_time=0.0,
+            end_time=0.01,
+            latency_ms=latency,
+            status=QueryStatus.SUCCESS,
+            answers=[],
+            ttl=300,
+            queue_wait_ms=wait,
+            connection=connection,
+        )
+
+    df = ResultTable.of(
+        [
+            _result("cold", 10.0, 30.0),
+            _result("warm", 8.0, 0.5),
+            _result("warm", 6.0, 1.5),
+        ]
+    ).to_dataframe()
+
+    assert _connection_summary(df) == (
+        "Connections: 1 cold queries (avg 10.00 ms + 30.00 ms wait), "
+        "2 warm (avg 7.00 ms + 1.00 ms wait)"
+    )
+
+
+def test_cli_happy_eyeballs_requires_both_families(runner):
+    result = runner.invoke(
+        cli, ["benchmark", "--use-defaults", "--family", "6", "--happy-eyeballs"]
+    )
+    assert result.exit_code != 0
+    assert "--happy-eyeballs requires --family both" in result.output
+
+
 def test_load_and_save_state(temp_config_dir):
     manager = FeedbackManager()
     state = manager._get_default_state()
@@ -474,6 +563,29 @@ def test_top_export_txt(tmp_path):
     assert "Google" in text
 
 
+@pytest.mark.parametrize(
+    "args, threshold", [([], None), (["--circuit-breaker", "3"], 3)]
+)
+def test_top_circuit_breaker_is_opt_in(runner, args, threshold):
+    seen = {}
+
+    async def fake_run_benchmark(self, **kwargs):
+        seen["threshold"] = self.circuit_breaker_threshold
+        return []
+
+    with patch(
+        "dns_benchmark.cli.ResolverManager.get_all_resolvers",
+        return_value=[{"name": "Cloudflare", "ip": "1.1.1.1"}],
+    ):
+        with patch(
+            "dns_benchmark.cli.DNSQueryEngine.run_benchmark", fake_run_benchmark
+        ):
+            result = runner.invoke(cli, ["top", "--quiet"] + args)
+
+    assert result.exit_code == 0, result.output
+    assert seen["threshold"] == threshold
+
+
 def test_top_command_runs(runner):
     """Ensure `top` command executes and prints results."""
     fake_stats = [
@@ -843,3 +955,41 @@ def test_monitoring_with_files(runner, sample_results, tmp_path):
                     text = log_file.read_text()
                     assert "Cloudflare" in text
                     assert "Google" in text
+
+
+def test_benchmark_workers_shard_the_run(tmp_path, sample_results):
+    calls = []
+
+    def fake_sharded(workers, **kwargs):
+        calls.append((workers, kwargs))
+        return ResultTable.of(sample_results)
+
+    with patch("dns_benchmark.cli.run_sharded_benchmark", fake_sharded):
+        result = CliRunner().invoke(
+            cli,
+            [
+                "benchmark",
+                "--resolvers",
+                "1.1.1.1,8.8.8.8",
+                "--domains",
+                "example.com",
+                "--workers",
+                "4",
+                "--shard-by",
+                "resolver",
+                "--max-concurrent",
+                "7",
+                "--formats",
+                "csv",
+                "--output",
+                str(tmp_path),
+            ],
+        )
+
+    assert result.exit_code == 0, result.output
+    assert "Workers: 4 processes (sharded by resolver)" in result.output
+    workers, kwargs = calls[0]
+    assert workers == 4 and kwargs["shard_by"] == "resolver"
+    assert kwargs["engine_options"]["max_concurrent_queries"] == 7
+    assert [r["ip"] for r in kwargs["resolvers"]] == ["1.1.1.1", "8.8.8.8"]
+    assert list(tmp_path.glob("dns_benchmark_*_raw.csv"))
@@ -0,0 +1,129 @@
+import pytest
+
+from dns_benchmark.cache import QueryCache
+from dns_benchmark.core import DNSQueryEngine, DNSQueryResult, QueryStatus
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _result(domain="example.com", ttl=300):
+    return DNSQueryResult(
+        resolver_ip="1.1.1.1",
+        resolver_name="Cloudflare",
+        domain=domain,
+        record_type="A",
+        start_time=0.0,
+        end_time=0.0,
+        latency_ms=12.0,
+        status=QueryStatus.SUCCESS,
+        answers=["1.2.3.4"],
+        ttl=ttl,
+    )
+
+
+def test_entries_expire_at_ttl():
+    clock = _Clock()
+    cache = QueryCache(clock=clock)
+    cache["a"] = _result(ttl=30)
+
+    clock.now += 20
+    result, ttl_left = cache.get_entry("a")
+    assert result.domain == "example.com" and ttl_left == pytest.approx(10)
+
+    clock.now += 11
+    assert cache.get_entry("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_clamps():
+    clock = _Clock()
+    cache = QueryCache(min_ttl=60, max_ttl=120, clock=clock)
+    cache["short"] = _result(ttl=1)
+    cache["long"] = _result(ttl=86400)
+    cache["none"] = _result(ttl=None)
+
+    clock.now += 59
+    assert "short" in cache and "none" in cache
+    clock.now += 62
+    assert "long" not in cache
+
+
+def test_result_without_ttl_is_not_cached_by_default():
+    cache = QueryCache()
+    cache["a"] = _result(ttl=None)
+    cache["b"] = _result(ttl=0)
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_entries=2)
+    cache["a"] = _result("a.example")
+    cache["b"] = _result("b.example")
+    assert cache["a"].domain == "a.example"  # a is now most recently used
+    cache["c"] = _result("c.example")
+
+    assert set(cache) == {"a", "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_full_cache_drops_expired_before_evicting():
+    clock = _Clock()
+    cache = QueryCache(max_entries=2, clock=clock)
+    cache["stale"] = _result(ttl=5)
+    cache["fresh"] = _result(ttl=300)
+    clock.now += 10
+    cache["new"] = _result(ttl=300)
+
+    assert set(cache) == {"fresh", "new"}
+    assert cache.stats()["evictions"] == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_expiry_heap_stays_bounded_under_rewrites():
+    clock = _Clock()
+    cache = QueryCache(max_entries=4, clock=clock)
+    for i in range(100):
+        cache[f"k{i % 3}"] = _result(ttl=300)
+        clock.now += 1
+
+    assert len(cache) == 3
+    assert len(cache._expiries) <= 2 * cache.max_entries
+
+
+def test_full_cache_skips_replaced_entries_when_purging():
+    clock = _Clock()
+    cache = QueryCache(max_entries=2, clock=clock)
+    cache["a"] = _result(ttl=5)
+    cache["a"] = _result(ttl=300)  # the ttl=5 expiry is now stale
+    cache["b"] = _result(ttl=300)
+    clock.now += 10
+    cache["c"] = _result(ttl=300)
+
+    assert set(cache) == {"b", "c"}  # a was evicted as LRU, not expired
+    assert cache.stats()["expirations"] == 0
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_serves_hits_like_a_stub_cache():
+    engine = DNSQueryEngine(enable_cache=True)
+    engine.cache[engine._get_cache_key("1.1.1.1", "Example.com", "A")] = _result()
+
+    result = await engine.query_single(
+        "1.1.1.1", "Cloudflare", "example.com", iteration=3
+    )
+
+    assert result.cache_hit and result.iteration == 3
+    assert result.answers == ["1.2.3.4"]
+    assert result.latency_ms < 5  # local lookup, not the original 12 ms
+    assert 0 < result.ttl <= 300
+    stats = engine.get_cache_stats()
+    assert stats["hits"] == 1 and stats["cache_enabled"]
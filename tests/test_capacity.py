@@ -0,0 +1,142 @@
+import asyncio
+import csv
+
+import dns.message
+import pytest
+from click.testing import CliRunner
+
+from dns_benchmark.capacity import CapacityReport, CapacityStep, find_capacity, ramp
+from dns_benchmark.cli import cli
+from dns_benchmark.wire import QueryTemplate
+
+
+def _limited_udp_query(capacity=4, fast=0.001, slow=0.05):
+    """UDPTransport.query replacement that slows down past ``capacity`` in flight."""
+    active = [0]
+
+    async def fake_query(self, query, timeout):
+        active[0] += 1
+        try:
+            await asyncio.sleep(fast if active[0] <= capacity else slow)
+        finally:
+            active[0] -= 1
+        request = dns.message.from_wire(QueryTemplate.of(query).wire)
+        return dns.message.make_response(request).to_wire()
+
+    return fake_query
+
+
+def _step(load, qps, breach=None):
+    return CapacityStep(
+        load=load,
+        queries=10,
+        duration_s=1.0,
+        achieved_qps=qps,
+        success_rate=100.0,
+        error_rate=0.0,
+        timeout_rate=0.0,
+        p50_ms=1.0,
+        p99_ms=2.0,
+        breach=breach,
+    )
+
+
+def test_ramp_is_geometric_and_ends_at_max():
+    assert ramp(10, 100, 2) == [10, 20, 40, 80, 100]
+    assert ramp(1, 1) == [1]
+    with pytest.raises(ValueError):
+        ramp(0, 10)
+    with pytest.raises(ValueError):
+        ramp(1, 10, factor=1)
+
+
+def test_saturation_is_last_passing_step_before_first_breach():
+    report = CapacityReport("R", "10.0.0.1", "concurrency", 100.0, 1.0)
+    # Throughput dips at load 4 yet it is still within SLO: it is the knee
+    report.steps = [
+        _step(1, 100),
+        _step(2, 180),
+        _step(4, 150),
+        _step(8, 190, breach="p99"),
+    ]
+    assert report.saturation is not None and report.saturation.load == 4
+    assert report.to_dict()["saturation"]["achieved_qps"] == 150
+
+    report.steps = [_step(1, 100), _step(2, 180)]
+    assert report.saturation is not None and report.saturation.load == 2
+
+    report.steps = [_step(1, 100, breach="errors")]
+    assert report.saturation is None
+
+
+@pytest.mark.asyncio
+async def test_find_capacity_stops_at_latency_knee(monkeypatch):
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", _limited_udp_query())
+    seen = []
+
+    report = await find_capacity(
+        {"name": "R", "ip": "10.0.0.1"},
+        [f"d{i}.example" for i in range(8)],
+        [1, 4, 16, 64],
+        queries_per_step=32,
+        slo_p99_ms=20.0,
+        on_step=seen.append,
+    )
+
+    # Fast up to 4 in flight, 50 ms beyond: load 16 blows the 20 ms p99
+    assert [s.load for s in report.steps] == [1, 4, 16]
+    assert seen == report.steps
+    assert [s.breach is None for s in report.steps] == [True, True, False]
+    assert report.saturation is not None and report.saturation.load == 4
+    assert all(s.queries == 32 and s.error_rate == 0 for s in report.steps)
+
+
+@pytest.mark.asyncio
+async def test_find_capacity_rate_mode(monkeypatch):
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", _limited_udp_query())
+
+    report = await find_capacity(
+        {"name": "R", "ip": "10.0.0.1"},
+        ["a.example", "b.example"],
+        [200.0],
+        mode="rate",
+        queries_per_step=10,
+    )
+
+    step = report.steps[0]
+    assert step.queries == 10 and step.breach is None
+    # Ten sends 5 ms apart cannot complete faster than the offered rate allows
+    assert step.achieved_qps < 250
+
+
+def test_capacity_command_writes_curve(monkeypatch, tmp_path):
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", _limited_udp_query())
+    output = tmp_path / "curve.csv"
+
+    result = CliRunner().invoke(
+        cli,
+        [
+            "capacity",
+            "--resolver",
+            "10.0.0.1",
+            "--domains",
+            "a.example,b.example",
+            "--start",
+            "1",
+            "--max",
+            "4",
+            "--factor",
+            "4",
+            "--queries-per-step",
+            "8",
+            "--output",
+            str(output),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "No SLO breach up to 4" in result.output
+    with open(output, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "Load"
+    assert [row[0] for row in rows[1:]] == ["1.0", "4.0"]
@@ -1,15 +1,27 @@
+import asyncio
 import json
+import random
+import sys
 import time
 
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
 import pytest
 
 from dns_benchmark.core import (
+    CircuitBreaker,
     DNSQueryEngine,
     DNSQueryResult,
     DomainManager,
     QueryStatus,
     ResolverManager,
+    _RetryLater,
 )
+from dns_benchmark.wire import QueryTemplate
 
 
 class DummyDomain:
@@ -18,39 +30,155 @@ class DummyDomain:
         self.name_server = name_server
 
 
+def _fake_udp_query(rcode=dns.rcode.NOERROR, answers=(), delay=0.0, calls=None):
+    """Build a replacement for UDPTransport.query that answers from the wire."""
+
+    async def fake_query(self, query, timeout):
+        if calls is not None:
+            calls.append(query)
+        if delay:
+            await asyncio.sleep(delay)
+        request = dns.message.from_wire(QueryTemplate.of(query).wire)
+        response = dns.message.make_response(request)
+        response.set_rcode(rcode)
+        if answers:
+            question = request.question[0]
+            rrset = response.find_rrset(
+                response.answer,
+                question.name,
+                dns.rdataclass.IN,
+                question.rdtype,
+                create=True,
+            )
+            for text in answers:
+                rrset.add(
+                    dns.rdata.from_text(dns.rdataclass.IN, question.rdtype, text),
+                    ttl=300,
+                )
+        return response.to_wire()
+
+    return fake_query
+
+
+def _raising_udp_query(exc):
+    async def fake_query(self, query, timeout):
+        raise exc
+
+    return fake_query
+
+
 @pytest.mark.asyncio
 async def test_query_success(monkeypatch):
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
-    class FakeRRset(list):
-        ttl = 300
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _fake_udp_query(answers=["1.2.3.4"])
+    )
+
+    result = await engine.query_single("1.1.1.1", "Cloudflare", "example.com")
+    assert result.status == QueryStatus.SUCCESS
+    assert result.answers == ["1.2.3.4"]
+    assert result.answers_count == 1
+    assert result.ttl == 300
+
+
+def _bare_result(domain):
+    return DNSQueryResult(
+        resolver_ip="".join(["1.1.1", ".1"]),
+        resolver_name="Cloudflare",
+        domain=domain,
+        record_type="A",
+        start_time=0.0,
+        end_time=0.0,
+        latency_ms=1.0,
+        status=QueryStatus.SUCCESS,
+        answers=[],
+        ttl=None,
+    )
+
 
-    class FakeResponse:
-        rrset = FakeRRset(["1.2.3.4"])
+def test_results_are_compact():
+    first = _bare_result("".join(["a", ".example"]))
+    second = _bare_result("".join(["a", ".example"]))
 
-    async def fake_resolve(self, d, rt, raise_on_no_answer=False):
-        return FakeResponse()
+    assert second.query_id > first.query_id
+    assert first.domain is second.domain
+    assert first.resolver_ip is second.resolver_ip
+    if sys.version_info >= (3, 10):
+        assert not hasattr(first, "__dict__")
 
-    monkeypatch.setattr("dns.asyncresolver.Resolver.resolve", fake_resolve)
+
+@pytest.mark.asyncio
+async def test_query_header_only_parse(monkeypatch):
+    engine = DNSQueryEngine(
+        max_concurrent_queries=1, timeout=0.1, max_retries=0, decode_answers=False
+    )
+
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _fake_udp_query(answers=["1.2.3.4", "5.6.7.8"]),
+    )
 
     result = await engine.query_single("1.1.1.1", "Cloudflare", "example.com")
     assert result.status == QueryStatus.SUCCESS
-    assert result.answers == ["1.2.3.4"]
+    assert result.answers == ()
+    assert result.answers_count == 2
     assert result.ttl == 300
 
 
+@pytest.mark.asyncio
+async def test_query_splits_queue_wait_from_latency(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=1, timeout=1.0, max_retries=0)
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _fake_udp_query(answers=["1.2.3.4"], delay=0.03),
+    )
+
+    first, second = await asyncio.gather(
+        engine.query_single("1.1.1.1", "Cloudflare", "a.example"),
+        engine.query_single("1.1.1.1", "Cloudflare", "b.example"),
+    )
+
+    # The second query waits out the first one's slot, but that wait is
+    # reported separately and stays out of its on-wire latency
+    assert first.queue_wait_ms < 10
+    assert second.queue_wait_ms >= 25
+    assert second.queue_wait_ms == pytest.approx(second.global_wait_ms, abs=5)
+    for result in (first, second):
+        assert 25 <= result.latency_ms < 55
+        assert result.first_byte_ms == result.latency_ms
+        assert result.parse_ms > 0
+
+
+@pytest.mark.asyncio
+async def test_dot_checkout_counts_as_queue_wait(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=1, timeout=1.0, max_retries=0)
+    answer = _fake_udp_query(answers=["1.2.3.4"])
+
+    class _Conn:
+        async def query(self, query, timeout):
+            return await answer(None, query, timeout)
+
+    async def slow_checkout(resolver_ip, port):
+        await asyncio.sleep(0.05)  # e.g. a TLS handshake
+        return _Conn(), True
+
+    monkeypatch.setattr(engine, "_get_dot_connection", slow_checkout)
+
+    result = await engine.query_single_dot("1.1.1.1", "Cloudflare", "example.com")
+
+    assert result.status == QueryStatus.SUCCESS
+    assert result.queue_wait_ms >= 45
+    assert result.latency_ms < 20
+
+
 @pytest.mark.asyncio
 async def test_query_timeout(monkeypatch):
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
-    import dns.exception
-
-    # Patch Resolver.resolve to raise Timeout
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer: (_ for _ in ()).throw(
-            dns.exception.Timeout()
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _raising_udp_query(asyncio.TimeoutError()),
     )
 
     result = await engine.query_single("1.1.1.1", "Cloudflare", "example.com")
@@ -58,17 +186,67 @@ async def test_query_timeout(monkeypatch):
     assert "timeout" in result.error_message.lower()
 
 
+@pytest.mark.asyncio
+async def test_adaptive_timeout_retries_lost_query_early(monkeypatch):
+    engine = DNSQueryEngine(
+        max_concurrent_queries=1,
+        timeout=2.0,
+        max_retries=2,
+        retry_backoff_multiplier=0.0,
+        adaptive_timeout=True,
+    )
+    answer = _fake_udp_query(answers=["1.2.3.4"], delay=0.005)
+    timeouts = []
+
+    async def lossy_query(self, query, timeout):
+        timeouts.append(timeout)
+        if QueryTemplate.of(query).question.startswith(b"\x04lost"):
+            if len(timeouts) == 6:  # first send of the lost query is dropped
+                await asyncio.sleep(timeout)
+                raise asyncio.TimeoutError
+        return await answer(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", lossy_query)
+
+    for i in range(5):
+        await engine.query_single("1.1.1.1", "Cloudflare", f"warm{i}.example")
+    start = time.perf_counter()
+    result = await engine.query_single("1.1.1.1", "Cloudflare", "lost.example")
+    elapsed = time.perf_counter() - start
+
+    assert result.status == QueryStatus.SUCCESS
+    assert result.attempt_number == 2
+    assert timeouts[0] == 1.0  # initial timeout before any RTT sample
+    assert timeouts[5] < 0.1  # lost send gave up after a few RTTs, not 2 s
+    assert elapsed < 0.5
+    stats = engine.get_rtt_stats()["1.1.1.1"]
+    assert stats["samples"] == 6
+    assert 4 < stats["srtt_ms"] < 50
+
+
+@pytest.mark.asyncio
+async def test_adaptive_timeout_last_attempt_uses_full_timeout(monkeypatch):
+    engine = DNSQueryEngine(timeout=0.3, max_retries=0, adaptive_timeout=True)
+    timeouts = []
+
+    async def recording_query(self, query, timeout):
+        timeouts.append(timeout)
+        return await _fake_udp_query()(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", recording_query)
+
+    await engine.query_single("1.1.1.1", "Cloudflare", "example.com")
+    await engine.query_single("1.1.1.1", "Cloudflare", "example.org")
+    assert timeouts == [0.3, 0.3]
+
+
 @pytest.mark.asyncio
 async def test_query_nxdomain(monkeypatch):
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
-    import dns.resolver
-
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer: (_ for _ in ()).throw(
-            dns.resolver.NXDOMAIN()
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _fake_udp_query(rcode=dns.rcode.NXDOMAIN),
     )
 
     result = await engine.query_single("8.8.8.8", "Google", "bad-domain.test")
@@ -79,17 +257,29 @@ async def test_query_nxdomain(monkeypatch):
 async def test_query_nonameservers(monkeypatch):
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
-    import dns.resolver
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _fake_udp_query(rcode=dns.rcode.SERVFAIL),
+    )
+
+    result = await engine.query_single("9.9.9.9", "Quad9", "example.com")
+    assert result.status == QueryStatus.SERVFAIL
+    assert result.error_message == "Server failure"
+
+
+@pytest.mark.asyncio
+async def test_query_refused_rcode(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer: (_ for _ in ()).throw(
-            dns.resolver.NoNameservers()
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _fake_udp_query(rcode=dns.rcode.REFUSED),
     )
 
     result = await engine.query_single("9.9.9.9", "Quad9", "example.com")
     assert result.status == QueryStatus.SERVFAIL
+    assert "REFUSED" in result.error_message
+    assert engine.get_failed_resolvers() == {"9.9.9.9": 1}
 
 
 @pytest.mark.asyncio
@@ -97,10 +287,8 @@ async def test_query_connection_refused(monkeypatch):
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer: (_ for _ in ()).throw(
-            Exception("Connection refused")
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _raising_udp_query(ConnectionRefusedError("Connection refused")),
     )
 
     result = await engine.query_single("208.67.222.222", "OpenDNS", "example.com")
@@ -113,10 +301,8 @@ async def test_query_unexpected(monkeypatch):
 
     # Force a generic exception
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer: (_ for _ in ()).throw(
-            Exception("Some random error")
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _raising_udp_query(Exception("Some random error")),
     )
 
     result = await engine.query_single("1.1.1.1", "Cloudflare", "example.com")
@@ -124,6 +310,26 @@ async def test_query_unexpected(monkeypatch):
     assert "error" in result.error_message.lower()
 
 
+@pytest.mark.asyncio
+async def test_query_reuses_udp_transport(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=4, timeout=0.1, max_retries=0)
+    calls = []
+
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _fake_udp_query(answers=["1.2.3.4"], calls=calls),
+    )
+
+    for domain in ["a.example", "b.example", "a.example"]:
+        await engine.query_single("1.1.1.1", "Cloudflare", domain)
+
+    assert len(calls) == 3
+    assert calls[0] is calls[2]  # same question reuses its pre-encoded wire
+    assert list(engine._udp_transports) == ["1.1.1.1"]
+    await engine.close()
+    assert engine._udp_transports == {}
+
+
 @pytest.mark.asyncio
 async def test_run_benchmark(monkeypatch):
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
@@ -172,6 +378,671 @@ async def test_run_benchmark_empty_record_types(monkeypatch):
     assert results[0]["result"] == "ok"
 
 
+def _delayed_query_single(delays, active=None):
+    """Fake query_single that sleeps per domain and tracks concurrency."""
+
+    async def fake_query_single(
+        resolver_ip, resolver_name, domain, record_type="A", **kwargs
+    ):
+        if active is not None:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        try:
+            await asyncio.sleep(delays.get(domain, 0.0))
+        finally:
+            if active is not None:
+                active["now"] -= 1
+        return DNSQueryResult(
+            resolver_ip=resolver_ip,
+            resolver_name=resolver_name,
+            domain=domain,
+            record_type=record_type,
+            start_time=0,
+            end_time=0,
+            latency_ms=0,
+            status=QueryStatus.SUCCESS,
+            answers=[],
+            ttl=None,
+            iteration=kwargs.get("iteration", 1),
+        )
+
+    return fake_query_single
+
+
+@pytest.mark.asyncio
+async def test_stream_benchmark_yields_in_completion_order(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=10)
+    monkeypatch.setattr(
+        engine, "query_single", _delayed_query_single({"slow.example": 0.05})
+    )
+
+    resolvers = [{"name": "Google", "ip": "8.8.8.8"}]
+    seen = [
+        r.domain
+        async for r in engine.stream_benchmark(
+            resolvers, ["slow.example", "fast.example"]
+        )
+    ]
+
+    assert seen == ["fast.example", "slow.example"]
+    assert engine.total_queries == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_benchmark_bounds_in_flight(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=100)
+    active = {"now": 0, "peak": 0}
+    domains = [f"d{i}.example" for i in range(50)]
+    monkeypatch.setattr(
+        engine,
+        "query_single",
+        _delayed_query_single({d: 0.001 for d in domains}, active),
+    )
+
+    resolvers = [{"name": "Google", "ip": "8.8.8.8"}]
+    count = 0
+    async for _result in engine.stream_benchmark(
+        resolvers, domains, ["A", "AAAA"], iterations=2, max_in_flight=5
+    ):
+        count += 1
+
+    assert count == 200
+    assert active["peak"] == 5
+
+
+@pytest.mark.asyncio
+async def test_stream_benchmark_break_cancels_in_flight(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=10)
+    active = {"now": 0, "peak": 0}
+    monkeypatch.setattr(
+        engine,
+        "query_single",
+        _delayed_query_single({"slow.example": 10.0}, active),
+    )
+
+    resolvers = [{"name": "Google", "ip": "8.8.8.8"}]
+    stream = engine.stream_benchmark(resolvers, ["fast.example", "slow.example"])
+    async for result in stream:
+        assert result.domain == "fast.example"
+        break
+    await stream.aclose()
+
+    assert active["now"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_benchmark_requeues_retries_without_blocking_worker(
+    monkeypatch,
+):
+    engine = DNSQueryEngine(
+        max_concurrent_queries=1,
+        timeout=0.1,
+        max_retries=2,
+        retry_backoff_multiplier=0.05,
+    )
+    succeed = _fake_udp_query(answers=["1.2.3.4"])
+    failures = {"flaky.example": 2}
+
+    async def flaky_query(self, query, timeout):
+        name = dns.message.from_wire(query.wire).question[0].name.to_text()
+        if failures.get(name.rstrip("."), 0):
+            failures[name.rstrip(".")] -= 1
+            raise asyncio.TimeoutError()
+        return await succeed(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", flaky_query)
+
+    resolvers = [{"name": "Google", "ip": "8.8.8.8"}]
+    results = [
+        r
+        async for r in engine.stream_benchmark(
+            resolvers, ["flaky.example", "steady.example"], max_in_flight=1
+        )
+    ]
+
+    # The single worker served steady.example while flaky.example backed off
+    assert [r.domain for r in results] == ["steady.example", "flaky.example"]
+    assert results[1].status == QueryStatus.SUCCESS
+    assert results[1].attempt_number == 3
+    assert engine.query_counter == 2
+
+
+@pytest.mark.asyncio
+async def test_progress_is_throttled_and_counts_statuses(monkeypatch):
+    answer = _fake_udp_query(answers=["1.2.3.4"])
+    missing = _fake_udp_query(rcode=dns.rcode.NXDOMAIN)
+
+    async def fake_query(self, query, timeout):
+        request = dns.message.from_wire(QueryTemplate.of(query).wire)
+        bad = request.question[0].name.labels[0].startswith(b"bad")
+        return await (missing if bad else answer)(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", fake_query)
+    engine = DNSQueryEngine(max_retries=0, progress_interval=60.0)
+    progress = []
+    engine.set_progress_callback(lambda done, total: progress.append((done, total)))
+    domains = [f"ok{i}.example" for i in range(7)] + [
+        f"bad{i}.example" for i in range(3)
+    ]
+
+    await engine.run_benchmark([{"name": "R", "ip": "10.0.0.1"}], domains)
+
+    # The first query reports; the rest coalesce until the last one
+    assert progress == [(1, 10), (10, 10)]
+    stats = engine.progress_stats()
+    assert stats["completed"] == 10 and stats["total"] == 10
+    assert stats["success"] == 7 and stats["nxdomain"] == 3
+    assert stats["timeout"] == 0
+
+
+@pytest.mark.asyncio
+async def test_query_single_defer_retry_hands_back_attempt(monkeypatch):
+    engine = DNSQueryEngine(timeout=0.1, max_retries=1)
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _raising_udp_query(asyncio.TimeoutError()),
+    )
+
+    with pytest.raises(_RetryLater) as excinfo:
+        await engine.query_single(
+            "1.1.1.1", "Cloudflare", "example.com", defer_retry=True
+        )
+    assert excinfo.value.attempt == 1
+
+    result = await engine.query_single(
+        "1.1.1.1", "Cloudflare", "example.com", first_attempt=1, defer_retry=True
+    )
+    assert result.status == QueryStatus.TIMEOUT
+    assert result.attempt_number == 2
+
+
+def _per_host_udp_query(delays, active=None):
+    """UDPTransport.query replacement with a per-resolver delay."""
+    answer = _fake_udp_query(answers=["1.2.3.4"])
+
+    async def fake_query(self, query, timeout):
+        if active is not None:
+            active[self.host] = active.get(self.host, 0) + 1
+            active["peak_" + self.host] = max(
+                active.get("peak_" + self.host, 0), active[self.host]
+            )
+        try:
+            await asyncio.sleep(delays.get(self.host, 0.0))
+        finally:
+            if active is not None:
+                active[self.host] -= 1
+        return await answer(self, query, timeout)
+
+    return fake_query
+
+
+@pytest.mark.asyncio
+async def test_per_resolver_limit_records_resolver_wait(monkeypatch):
+    engine = DNSQueryEngine(
+        max_concurrent_queries=10, max_concurrent_per_resolver=1, max_retries=0
+    )
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"1.1.1.1": 0.05}),
+    )
+
+    first, second = await asyncio.gather(
+        engine.query_single("1.1.1.1", "Cloudflare", "a.example"),
+        engine.query_single("1.1.1.1", "Cloudflare", "b.example"),
+    )
+
+    assert first.resolver_wait_ms < 10
+    assert second.resolver_wait_ms >= 40
+    assert second.global_wait_ms < 10
+
+
+@pytest.mark.asyncio
+async def test_slow_resolver_does_not_hold_workers(monkeypatch):
+    engine = DNSQueryEngine(
+        max_concurrent_queries=4, max_concurrent_per_resolver=1, max_retries=0
+    )
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"10.0.0.1": 0.05}),
+    )
+
+    resolvers = [
+        {"name": "Slow", "ip": "10.0.0.1"},
+        {"name": "Fast", "ip": "10.0.0.2"},
+    ]
+    domains = [f"d{i}.example" for i in range(6)]
+    results = [r async for r in engine.stream_benchmark(resolvers, domains)]
+
+    # Every fast query completes before the slow resolver's second one
+    assert [r.resolver_ip for r in results[:7]].count("10.0.0.2") == 6
+    fast = [r for r in results if r.resolver_ip == "10.0.0.2"]
+    assert max(r.resolver_wait_ms + r.global_wait_ms for r in fast) < 20
+    slow = [r for r in results if r.resolver_ip == "10.0.0.1"]
+    assert max(r.resolver_wait_ms for r in slow) >= 40
+
+
+@pytest.mark.asyncio
+async def test_resolver_json_overrides_per_resolver_limit(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=20, max_retries=0)
+    active = {}
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"10.0.0.1": 0.01, "10.0.0.2": 0.01}, active),
+    )
+
+    resolvers = [
+        {"name": "Capped", "ip": "10.0.0.1", "max_concurrent": 2},
+        {"name": "Open", "ip": "10.0.0.2"},
+    ]
+    domains = [f"d{i}.example" for i in range(8)]
+    results = await engine.run_benchmark(resolvers, domains)
+
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    assert active["peak_10.0.0.1"] == 2
+    assert active["peak_10.0.0.2"] > 2
+
+    # The cap belongs to that run; the engine's own settings are untouched
+    assert engine.resolver_concurrency == {}
+    active.clear()
+    await engine.run_benchmark([{"name": "Open", "ip": "10.0.0.1"}], domains)
+    assert active["peak_10.0.0.1"] > 2
+
+
+@pytest.mark.asyncio
+async def test_open_loop_sends_on_fixed_schedule(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=10, max_retries=0)
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _per_host_udp_query({})
+    )
+
+    domains = [f"d{i}.example" for i in range(10)]
+    start = time.perf_counter()
+    results = await engine.run_benchmark(
+        [{"name": "R", "ip": "10.0.0.1"}], domains, rate=200.0
+    )
+    elapsed = time.perf_counter() - start
+
+    assert [r.domain for r in results] == domains
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    # Ten sends 5 ms apart: the last one is scheduled 45 ms in
+    assert elapsed >= 0.04
+    report = engine.open_loop_report
+    assert report["sent"] == report["scheduled"] == 10
+    assert report["offered_qps"] == 200.0
+    assert report["backlogged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_open_loop_latency_includes_queueing(monkeypatch):
+    """A resolver slower than the offered rate shows growing latency."""
+    engine = DNSQueryEngine(
+        max_concurrent_queries=10, max_concurrent_per_resolver=1, max_retries=0
+    )
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"10.0.0.1": 0.05}),
+    )
+
+    results = await engine.run_benchmark(
+        [{"name": "Slow", "ip": "10.0.0.1"}],
+        [f"d{i}.example" for i in range(4)],
+        rate=100.0,
+    )
+
+    # Scheduled 10 ms apart but served 50 ms apart: the backlog adds up
+    assert results[0].latency_ms < 90
+    assert results[-1].latency_ms >= 150
+    report = engine.open_loop_report
+    assert report["backlogged"] == 3
+    assert report["peak_outstanding"] >= 3
+
+
+@pytest.mark.asyncio
+async def test_open_loop_poisson_arrivals(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=10, max_retries=0)
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _per_host_udp_query({})
+    )
+    gaps = []
+
+    def fake_expovariate(rate):
+        gaps.append(rate)
+        return 0.001
+
+    monkeypatch.setattr("dns_benchmark.core.random.expovariate", fake_expovariate)
+
+    results = await engine.run_benchmark(
+        [{"name": "R", "ip": "10.0.0.1"}],
+        ["a.example", "b.example", "c.example"],
+        rate=50.0,
+        arrival="poisson",
+    )
+
+    assert len(results) == 3
+    assert gaps == [50.0, 50.0]
+    assert engine.open_loop_report["arrival"] == "poisson"
+
+
+@pytest.mark.asyncio
+async def test_open_loop_rejects_bad_arguments():
+    engine = DNSQueryEngine()
+    resolvers = [{"name": "R", "ip": "10.0.0.1"}]
+    with pytest.raises(ValueError):
+        await engine.run_benchmark(resolvers, ["a.example"], rate=0)
+    with pytest.raises(ValueError):
+        await engine.run_benchmark(
+            resolvers, ["a.example"], rate=10.0, arrival="bursty"
+        )
+
+
+@pytest.mark.asyncio
+async def test_hedged_query_duplicate_answers_first(monkeypatch):
+    engine = DNSQueryEngine(
+        max_retries=0, hedge_percentile=95.0, hedge_initial_delay_ms=20.0
+    )
+    answer = _fake_udp_query(answers=["1.2.3.4"])
+    calls = []
+
+    async def first_copy_slow(self, query, timeout):
+        calls.append(query)
+        if len(calls) == 1:
+            await asyncio.sleep(0.3)
+        return await answer(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", first_copy_slow)
+    progress = []
+    engine.set_progress_callback(lambda done, total: progress.append(done))
+
+    start = time.perf_counter()
+    [result] = await engine.run_benchmark(
+        [{"name": "R", "ip": "10.0.0.1"}], ["example.com"]
+    )
+
+    assert time.perf_counter() - start < 0.2  # the slow copy was cancelled
+    assert result.status == QueryStatus.SUCCESS
+    assert result.hedged and result.hedge_won
+    assert 20 <= result.latency_ms < 100  # includes the hedge delay
+    assert len(calls) == 2
+    assert progress == [1]
+
+
+@pytest.mark.asyncio
+async def test_hedged_query_fast_answer_sends_no_duplicate(monkeypatch):
+    engine = DNSQueryEngine(
+        max_retries=0, hedge_percentile=95.0, hedge_initial_delay_ms=50.0
+    )
+    calls = []
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _fake_udp_query(calls=calls)
+    )
+
+    [result] = await engine.run_benchmark(
+        [{"name": "R", "ip": "10.0.0.1"}], ["example.com"]
+    )
+
+    assert not result.hedged and not result.hedge_won
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_query_to_secondary_resolver(monkeypatch):
+    engine = DNSQueryEngine(
+        max_retries=0,
+        hedge_percentile=95.0,
+        hedge_initial_delay_ms=10.0,
+        hedge_resolver={"name": "Backup", "ip": "10.0.0.9"},
+    )
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"10.0.0.1": 0.3}),
+    )
+
+    [result] = await engine.run_benchmark(
+        [{"name": "Primary", "ip": "10.0.0.1"}], ["example.com"]
+    )
+
+    assert result.hedge_won
+    assert (result.resolver_name, result.resolver_ip) == ("Primary", "10.0.0.1")
+
+
+@pytest.mark.asyncio
+async def test_hedge_delay_starts_once_the_primary_holds_a_slot(monkeypatch):
+    engine = DNSQueryEngine(
+        max_retries=0, hedge_percentile=95.0, hedge_initial_delay_ms=20.0
+    )
+    calls = []
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _fake_udp_query(calls=calls)
+    )
+    engine.semaphore = asyncio.Semaphore(1)
+    await engine.semaphore.acquire()
+
+    run = asyncio.ensure_future(
+        engine.run_benchmark([{"name": "R", "ip": "10.0.0.1"}], ["example.com"])
+    )
+    await asyncio.sleep(0.1)
+    engine.semaphore.release()
+    [result] = await run
+
+    assert not result.hedged  # queueing for the slot did not count
+    assert len(calls) == 1
+    assert result.queue_wait_ms >= 80
+
+
+@pytest.mark.asyncio
+async def test_hedge_win_leaves_the_cached_hedge_result_alone(monkeypatch):
+    engine = DNSQueryEngine(
+        max_retries=0,
+        enable_cache=True,
+        hedge_percentile=95.0,
+        hedge_initial_delay_ms=10.0,
+        hedge_resolver={"name": "Backup", "ip": "10.0.0.9"},
+    )
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"10.0.0.1": 0.3}),
+    )
+
+    [result] = await engine.run_benchmark(
+        [{"name": "Primary", "ip": "10.0.0.1"}], ["example.com"], use_cache=True
+    )
+
+    assert result.hedge_won and result.resolver_ip == "10.0.0.1"
+    cached = engine.cache[engine._get_cache_key("10.0.0.9", "example.com", "A")]
+    assert (cached.resolver_name, cached.resolver_ip) == ("Backup", "10.0.0.9")
+    assert not cached.hedge_won
+
+
+@pytest.mark.asyncio
+async def test_hedge_copies_holding_other_resolver_slots_do_not_hang(monkeypatch):
+    # Hedge copies to B take B's only slot, parking B's own work; whichever
+    # query frees that slot must requeue it.
+    engine = DNSQueryEngine(
+        max_retries=0,
+        max_concurrent_queries=4,
+        max_concurrent_per_resolver=1,
+        hedge_percentile=95.0,
+        hedge_initial_delay_ms=5.0,
+        hedge_resolver={"name": "B", "ip": "10.0.0.2"},
+    )
+    answer = _fake_udp_query(answers=["1.2.3.4"])
+    rng = random.Random(0)
+
+    async def jittered(self, query, timeout):
+        slow = self.host == "10.0.0.1"
+        await asyncio.sleep(rng.uniform(0.01, 0.05) if slow else rng.uniform(0, 0.01))
+        return await answer(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", jittered)
+    resolvers = [{"name": "A", "ip": "10.0.0.1"}, {"name": "B", "ip": "10.0.0.2"}]
+    domains = [f"d{i}.example" for i in range(20)]
+
+    results = await asyncio.wait_for(engine.run_benchmark(resolvers, domains), 5)
+
+    assert len(results) == 40
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+
+
+@pytest.mark.asyncio
+async def test_happy_eyeballs_falls_back_to_ipv4_when_ipv6_is_slow(monkeypatch):
+    engine = DNSQueryEngine(max_retries=0, happy_eyeballs_delay_ms=20.0)
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query",
+        _per_host_udp_query({"2001:db8::1": 0.3}),
+    )
+    progress = []
+    engine.set_progress_callback(lambda done, total: progress.append(done))
+    resolver = {"name": "R", "ip": "192.0.2.1", "ipv6": "2001:db8::1"}
+
+    start = time.perf_counter()
+    [result] = await engine.run_benchmark([resolver], ["example.com"])
+
+    assert time.perf_counter() - start < 0.2  # the IPv6 copy was cancelled
+    assert (result.resolver_ip, result.family) == ("192.0.2.1", "IPv4")
+    assert 20 <= result.latency_ms < 100  # counted from the start of the race
+    assert progress == [1]
+
+
+@pytest.mark.asyncio
+async def test_happy_eyeballs_prefers_ipv6_when_it_answers(monkeypatch):
+    engine = DNSQueryEngine(max_retries=0, happy_eyeballs_delay_ms=50.0)
+    active = {}
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _per_host_udp_query({}, active)
+    )
+    resolver = {"name": "R", "ip": "192.0.2.1", "ipv6": "2001:db8::1"}
+
+    results = await engine.run_benchmark([resolver], ["a.example", "b.example"])
+
+    assert [r.family for r in results] == ["IPv6", "IPv6"]
+    assert {r.resolver_name for r in results} == {"R"}
+    assert "192.0.2.1" not in active  # IPv4 was never needed
+
+
+def test_resolver_for_family_uses_database_ipv6():
+    resolvers = [
+        {"name": "1.1.1.1", "ip": "1.1.1.1"},  # Cloudflare, from the database
+        {"name": "Local", "ip": "192.0.2.53"},  # IPv4 only
+    ]
+
+    assert ResolverManager.for_family(resolvers, "4") == resolvers
+    assert ResolverManager.for_family(resolvers, "6") == [
+        {"name": "1.1.1.1", "ip": "2606:4700:4700::1111"}
+    ]
+    assert ResolverManager.for_family(resolvers, "both") == [
+        {"name": "1.1.1.1 (IPv4)", "ip": "1.1.1.1"},
+        {"name": "1.1.1.1 (IPv6)", "ip": "2606:4700:4700::1111"},
+        {"name": "Local (IPv4)", "ip": "192.0.2.53"},
+    ]
+    assert ResolverManager.for_family(resolvers, "both", race=True) == [
+        {"name": "1.1.1.1", "ip": "1.1.1.1", "ipv6": "2606:4700:4700::1111"},
+        {"name": "Local", "ip": "192.0.2.53"},
+    ]
+    with pytest.raises(ValueError):
+        ResolverManager.for_family(resolvers, "7")
+
+
+def test_hedge_delay_follows_latency_percentile():
+    engine = DNSQueryEngine(hedge_percentile=90.0, hedge_initial_delay_ms=100.0)
+    assert engine._hedge_delay("10.0.0.1") == 0.1
+
+    for latency in range(1, 101):
+        engine._record_hedge_sample(
+            DNSQueryResult(
+                "10.0.0.1",
+                "R",
+                "a.example",
+                "A",
+                0,
+                0,
+                float(latency),
+                QueryStatus.SUCCESS,
+                [],
+                None,
+            ),
+            "10.0.0.1",
+        )
+    assert engine._hedge_delay("10.0.0.1") == pytest.approx(0.091)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_skips_dead_resolver(monkeypatch):
+    engine = DNSQueryEngine(
+        max_concurrent_queries=1, max_retries=0, circuit_breaker_threshold=2
+    )
+    answer = _fake_udp_query(answers=["1.2.3.4"])
+
+    async def dead_or_alive(self, query, timeout):
+        if self.host == "10.0.0.1":
+            raise asyncio.TimeoutError
+        return await answer(self, query, timeout)
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", dead_or_alive)
+
+    resolvers = [{"name": "Dead", "ip": "10.0.0.1"}, {"name": "Up", "ip": "10.0.0.2"}]
+    results = await engine.run_benchmark(resolvers, [f"d{i}.example" for i in range(5)])
+
+    dead = [r.status for r in results if r.resolver_ip == "10.0.0.1"]
+    assert dead == [QueryStatus.TIMEOUT] * 2 + [QueryStatus.CIRCUIT_OPEN] * 3
+    assert all(
+        r.status == QueryStatus.SUCCESS for r in results if r.resolver_ip == "10.0.0.2"
+    )
+    skipped = results[2]
+    assert skipped.attempt_number == 0 and "circuit open" in skipped.error_message
+    stats = engine.get_circuit_stats()
+    assert stats["10.0.0.1"] == {
+        "state": "open",
+        "consecutive_failures": 2,
+        "trips": 1,
+        "skipped": 3,
+    }
+    assert stats["10.0.0.2"]["state"] == "closed"
+
+
+def test_circuit_breaker_half_open_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()  # the single probe
+    assert not breaker.allow()
+    breaker.record(False)  # probe failed: open for another cooldown
+    assert breaker.state == "open" and breaker.trips == 1
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.abandon()  # a requeued probe frees the slot
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_run_benchmark_keeps_plan_order(monkeypatch):
+    engine = DNSQueryEngine(max_concurrent_queries=10)
+    monkeypatch.setattr(
+        engine,
+        "query_single",
+        _delayed_query_single({"a.example": 0.03, "b.example": 0.01}),
+    )
+
+    resolvers = [{"name": "Google", "ip": "8.8.8.8"}]
+    results = await engine.run_benchmark(
+        resolvers, ["a.example", "b.example", "c.example"], iterations=2
+    )
+
+    assert [(r.iteration, r.domain) for r in results] == [
+        (1, "a.example"),
+        (1, "b.example"),
+        (1, "c.example"),
+        (2, "a.example"),
+        (2, "b.example"),
+        (2, "c.example"),
+    ]
+
+
 @pytest.mark.asyncio
 async def test_query_single_cache_hit(monkeypatch):
     engine = DNSQueryEngine(enable_cache=True)
@@ -211,12 +1082,10 @@ async def test_query_single_cache_hit(monkeypatch):
 async def test_query_single_fallback(monkeypatch):
     engine = DNSQueryEngine(max_retries=-1)  # force skip loop
 
-    # Patch resolver.resolve to raise if called (but it won't be called)
+    # Patch the transport to raise if called (but it won't be called)
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer=False: (_ for _ in ()).throw(
-            Exception("boom")
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _raising_udp_query(Exception("boom")),
     )
 
     result = await engine.query_single(
@@ -764,44 +1633,59 @@ def test_parse_domain_string_no_dots():
 @pytest.mark.asyncio
 async def test_query_no_answer_blocked_domain(monkeypatch):
     """Issue #45: blocked domains (AdGuard/Pi-hole sinkhole) must return SUCCESS, not be retried."""
-    import dns.resolver
-
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=5.0, max_retries=2)
 
-    call_count = 0
-
-    async def fake_resolve(self, d, rt, raise_on_no_answer=False):
-        nonlocal call_count
-        call_count += 1
-        raise dns.resolver.NoAnswer()
-
-    monkeypatch.setattr("dns.asyncresolver.Resolver.resolve", fake_resolve)
+    calls = []
+    # NOERROR with an empty answer section
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _fake_udp_query(calls=calls)
+    )
 
     result = await engine.query_single(
         "192.168.1.6", "AdGuard Home", "logs.netflix.com"
     )
 
     assert result.status == QueryStatus.SUCCESS
-    assert result.answers == []
+    assert result.answers == ()
     assert (
-        call_count == 1
-    ), f"resolve() called {call_count} times — blocked domains must not be retried"
+        len(calls) == 1
+    ), f"query() called {len(calls)} times — blocked domains must not be retried"
 
 
 @pytest.mark.asyncio
-async def test_query_no_answer_latency_not_inflated(monkeypatch):
-    """Issue #45: latency for blocked domains must reflect actual RTT, not retry backoff accumulation."""
-    import asyncio
+async def test_truncated_answer_retries_over_tcp_on_engine_port(monkeypatch):
+    engine = DNSQueryEngine(max_retries=0, dns_port=5353)
 
-    import dns.resolver
+    async def truncated(self, query, timeout):
+        request = dns.message.from_wire(QueryTemplate.of(query).wire)
+        response = dns.message.make_response(request)
+        response.flags |= dns.flags.TC
+        return response.to_wire()
 
-    engine = DNSQueryEngine(max_concurrent_queries=1, timeout=5.0, max_retries=2)
+    tcp_calls = []
+
+    async def fake_tcp(request, where, timeout=None, port=53, **kwargs):
+        tcp_calls.append((where, port))
+        return dns.message.make_response(request)
 
-    async def fake_resolve(self, d, rt, raise_on_no_answer=False):
-        await asyncio.sleep(0.004)  # simulate 4ms RTT, same as reporter's dig output
-        raise dns.resolver.NoAnswer()
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", truncated)
+    monkeypatch.setattr("dns_benchmark.core.dns.asyncquery.tcp", fake_tcp)
 
-    monkeypatch.setattr("dns.asyncresolver.Resolver.resolve", fake_resolve)
+    result = await engine.query_single("10.0.0.1", "R", "example.com")
+
+    assert result.status == QueryStatus.SUCCESS
+    assert tcp_calls == [("10.0.0.1", 5353)]
+
+
+@pytest.mark.asyncio
+async def test_query_no_answer_latency_not_inflated(monkeypatch):
+    """Issue #45: latency for blocked domains must reflect actual RTT, not retry backoff accumulation."""
+    engine = DNSQueryEngine(max_concurrent_queries=1, timeout=5.0, max_retries=2)
+
+    # simulate 4ms RTT, same as reporter's dig output
+    monkeypatch.setattr(
+        "dns_benchmark.core.UDPTransport.query", _fake_udp_query(delay=0.004)
+    )
 
     result = await engine.query_single(
         "192.168.1.6", "AdGuard Home", "logs.netflix.com"
@@ -816,15 +1700,11 @@ async def test_query_no_answer_latency_not_inflated(monkeypatch):
 @pytest.mark.asyncio
 async def test_query_start_time_valid_on_timeout(monkeypatch):
     """Issue #45: moving start_time inside semaphore must not cause UnboundLocalError on timeout."""
-    import dns.exception
-
     engine = DNSQueryEngine(max_concurrent_queries=1, timeout=0.1, max_retries=0)
 
     monkeypatch.setattr(
-        "dns.asyncresolver.Resolver.resolve",
-        lambda self, d, rt, raise_on_no_answer: (_ for _ in ()).throw(
-            dns.exception.Timeout()
-        ),
+        "dns_benchmark.core.UDPTransport.query",
+        _raising_udp_query(asyncio.TimeoutError()),
     )
 
     result = await engine.query_single(
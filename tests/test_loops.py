@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from click.testing import CliRunner
+
+from dns_benchmark import loops
+from dns_benchmark.cli import cli
+from dns_benchmark.selfbench import run_self_benchmark
+
+
+def test_auto_prefers_uvloop_when_installed(monkeypatch):
+    monkeypatch.setattr(loops, "uvloop_available", lambda: True)
+    assert loops.resolve_event_loop("auto") == "uvloop"
+    monkeypatch.setattr(loops, "uvloop_available", lambda: False)
+    assert loops.resolve_event_loop("auto") == "asyncio"
+    assert loops.resolve_event_loop("AsyncIO") == "asyncio"
+
+
+def test_missing_uvloop_is_an_error(monkeypatch):
+    monkeypatch.setattr(loops, "uvloop_available", lambda: False)
+
+    async def main():
+        return 1
+
+    coro = main()
+    with pytest.raises(RuntimeError, match="uvloop"):
+        loops.run(coro, "uvloop")
+    assert coro.cr_frame is None  # closed, not left un-awaited
+    with pytest.raises(ValueError):
+        loops.resolve_event_loop("trio")
+
+
+def test_run_on_asyncio_loop():
+    async def main():
+        return type(asyncio.get_running_loop()).__module__
+
+    assert loops.run(main(), "asyncio").startswith("asyncio")
+
+
+def test_cli_rejects_uvloop_when_missing(monkeypatch):
+    monkeypatch.setattr(loops, "uvloop_available", lambda: False)
+    result = CliRunner().invoke(cli, ["top", "--event-loop", "uvloop", "--limit", "1"])
+    assert result.exit_code == 2
+    assert "uvloop" in result.output
+
+
+def test_self_benchmark_against_local_responder():
+    (report,) = run_self_benchmark(["asyncio"], queries=300, concurrency=10)
+
+    assert report.event_loop == "asyncio"
+    assert report.queries == 300 and report.errors == 0
+    assert report.qps > 0 and 0 < report.p50_ms <= report.p99_ms
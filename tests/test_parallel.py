@@ -0,0 +1,71 @@
+import itertools
+import multiprocessing
+
+import dns.message
+import pytest
+
+from dns_benchmark.parallel import _resolver_shard_rows, run_sharded_benchmark
+from dns_benchmark.wire import QueryTemplate
+
+fork_only = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="workers inherit the patched transport only when forked",
+)
+
+RESOLVERS = [{"name": f"R{i}", "ip": f"10.0.0.{i}"} for i in range(1, 4)]
+DOMAINS = ["a.example", "b.example"]
+
+
+async def _fake_query(self, query, timeout):
+    request = dns.message.from_wire(QueryTemplate.of(query).wire)
+    return dns.message.make_response(request).to_wire()
+
+
+def test_resolver_shard_rows_match_plan_order():
+    n_res, n_dom, n_rt, iterations, workers = 5, 3, 2, 2, 2
+    plan = list(
+        itertools.product(range(iterations), range(n_res), range(n_dom), range(n_rt))
+    )
+    for shard in range(workers):
+        expected = [
+            index for index, (_it, r, _d, _t) in enumerate(plan) if r % workers == shard
+        ]
+        rows = _resolver_shard_rows(len(expected), shard, workers, n_res, n_dom, n_rt)
+        assert rows.tolist() == expected
+
+
+@fork_only
+@pytest.mark.parametrize("shard_by", ["query", "resolver"])
+def test_sharded_run_merges_in_plan_order(monkeypatch, shard_by):
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", _fake_query)
+    progress = []
+
+    table = run_sharded_benchmark(
+        2,
+        RESOLVERS,
+        DOMAINS,
+        ["A", "AAAA"],
+        iterations=2,
+        shard_by=shard_by,
+        engine_options={"max_retries": 0},
+        progress_callback=lambda done, total: progress.append((done, total)),
+        mp_context=multiprocessing.get_context("fork"),
+    )
+
+    df = table.to_dataframe()
+    assert len(df) == 24
+    expected = list(
+        itertools.product([1, 2], [r["ip"] for r in RESOLVERS], DOMAINS, ["A", "AAAA"])
+    )
+    rows = list(
+        zip(df["iteration"], df["resolver_ip"], df["domain"], df["record_type"])
+    )
+    assert rows == expected
+    assert df["success"].all()
+    assert sorted(df["query_id"]) == list(range(1, 25))
+    assert progress[-1] == (24, 24)
+
+
+def test_rejects_unknown_shard_mode():
+    with pytest.raises(ValueError):
+        run_sharded_benchmark(2, RESOLVERS, DOMAINS, shard_by="domain")
@@ -3,6 +3,8 @@ Tests for DoH, DoT, and DNSSEC additions.
 """
 
 import asyncio
+import base64
+import struct
 import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -18,6 +20,7 @@ from dns_benchmark.core import (
     QueryProtocol,
     QueryStatus,
 )
+from dns_benchmark.transport import DoHTransport
 
 
 @pytest.fixture
@@ -217,49 +220,254 @@ async def test_query_single_doh_timeout(engine: DNSQueryEngine) -> None:
     assert result.protocol == QueryProtocol.DOH
 
 
+def _mock_doh_client(wire: bytes) -> AsyncMock:
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.content = wire
+    mock_response.raise_for_status = MagicMock()
+
+    mock_client = AsyncMock()
+    mock_client.post = AsyncMock(return_value=mock_response)
+    mock_client.get = AsyncMock(return_value=mock_response)
+    return mock_client
+
+
 @pytest.mark.asyncio
-async def test_query_single_dot_success(engine: DNSQueryEngine) -> None:
-    import struct
+async def test_query_single_doh_get_encodes_dns_param() -> None:
+    engine = DNSQueryEngine(timeout=5.0, max_retries=0, doh_method="get")
+    mock_client = _mock_doh_client(_make_dns_wire_response("google.com"))
 
-    wire = _make_dns_wire_response("google.com", ad=False)
-    # reader returns 2-byte length then message
-    length_bytes = struct.pack("!H", len(wire))
+    with patch("dns_benchmark.core.httpx.AsyncClient", return_value=mock_client):
+        result = await engine.query_single_doh(
+            resolver_ip="1.1.1.1",
+            resolver_name="Cloudflare",
+            domain="google.com",
+            doh_url="https://cloudflare-dns.com/dns-query",
+        )
+
+    assert result.status == QueryStatus.SUCCESS
+    mock_client.post.assert_not_called()
+    param = mock_client.get.call_args.kwargs["params"]["dns"]
+    assert "=" not in param and "+" not in param and "/" not in param
+    sent = base64.urlsafe_b64decode(param + "=" * (-len(param) % 4))
+    assert sent[:2] == b"\x00\x00"  # ID 0 keeps identical queries cacheable
+    assert dns.message.from_wire(sent).question[0].name.to_text() == "google.com."
+
+
+@pytest.mark.asyncio
+async def test_doh_transport_random_id_when_zero_id_disabled() -> None:
+    transport = DoHTransport(zero_id=False)
+    mock_client = _mock_doh_client(_make_dns_wire_response("google.com"))
+    wire = dns.message.make_query("google.com", "A").to_wire()
+
+    with patch("dns_benchmark.transport.httpx.AsyncClient", return_value=mock_client):
+        with patch("dns_benchmark.transport.random.getrandbits", return_value=0x1234):
+            await transport.query("https://dns.google/dns-query", wire)
+
+    kwargs = mock_client.post.call_args.kwargs
+    assert kwargs["content"][:2] == b"\x12\x34"
+    assert kwargs["headers"]["Content-Type"] == "application/dns-message"
+
+
+@pytest.mark.asyncio
+async def test_doh_pools_shared_per_url_authority(engine: DNSQueryEngine) -> None:
+    mock_client = _mock_doh_client(_make_dns_wire_response("google.com"))
+    targets = [
+        ("1.1.1.1", "https://cloudflare-dns.com/dns-query"),
+        ("1.0.0.1", "https://cloudflare-dns.com/dns-query"),
+        ("8.8.8.8", "https://dns.google/dns-query"),
+    ]
+
+    with patch(
+        "dns_benchmark.core.httpx.AsyncClient", return_value=mock_client
+    ) as client_cls:
+        for ip, url in targets:
+            await engine.query_single_doh(
+                resolver_ip=ip, resolver_name=ip, domain="google.com", doh_url=url
+            )
+
+    assert client_cls.call_count == 2
+    limits = client_cls.call_args.kwargs["limits"]
+    assert limits.max_connections == 100
+    assert limits.max_keepalive_connections == 20
+
+
+@pytest.mark.asyncio
+async def test_doh_max_streams_caps_requests_in_flight() -> None:
+    engine = DNSQueryEngine(timeout=5.0, max_retries=0, doh_max_streams=2)
+    wire = _make_dns_wire_response("google.com")
+    in_flight = 0
+    peak = 0
+
+    async def _post(*args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return _mock_doh_client(wire).post.return_value
+
+    mock_client = AsyncMock()
+    mock_client.post = _post
+
+    with patch("dns_benchmark.core.httpx.AsyncClient", return_value=mock_client):
+        results = await asyncio.gather(
+            *(
+                engine.query_single_doh(
+                    resolver_ip="1.1.1.1",
+                    resolver_name="Cloudflare",
+                    domain="google.com",
+                    doh_url="https://cloudflare-dns.com/dns-query",
+                )
+                for _ in range(6)
+            )
+        )
+
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_doh_stream_cap_wait_is_queue_wait_not_latency() -> None:
+    engine = DNSQueryEngine(timeout=5.0, max_retries=0, doh_max_streams=1)
+    response = _mock_doh_client(_make_dns_wire_response("google.com")).post
+
+    async def _post(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return response.return_value
 
-    mock_reader = AsyncMock()
-    mock_reader.readexactly = AsyncMock(side_effect=[length_bytes, wire])
+    mock_client = AsyncMock()
+    mock_client.post = _post
+
+    with patch("dns_benchmark.core.httpx.AsyncClient", return_value=mock_client):
+        first, second = await asyncio.gather(
+            *(
+                engine.query_single_doh(
+                    resolver_ip="1.1.1.1",
+                    resolver_name="Cloudflare",
+                    domain="google.com",
+                    doh_url="https://cloudflare-dns.com/dns-query",
+                )
+                for _ in range(2)
+            )
+        )
+
+    assert first.latency_ms < 90 and second.latency_ms < 90
+    assert max(first.queue_wait_ms, second.queue_wait_ms) >= 40
+
+
+def test_doh_transport_rejects_unknown_method() -> None:
+    with pytest.raises(ValueError, match="Unsupported DoH method"):
+        DNSQueryEngine(doh_method="PUT")
+
+
+def _make_echo_stream(delays=None):
+    """Fake (reader, writer) pair that answers each written query on the stream.
+
+    ``delays`` maps a query name to seconds to hold its reply back, so replies
+    can be sent out of order.
+    """
+    reader = asyncio.StreamReader()
+    delays = delays or {}
+
+    def _reply(data: bytes) -> None:
+        wire = data[2:]
+        request = dns.message.from_wire(wire)
+        name = request.question[0].name.to_text().rstrip(".")
+        response = dns.message.from_wire(_make_dns_wire_response(name))
+        response.id = request.id
+        reply = response.to_wire()
+        delay = delays.get(name, 0.0)
+        asyncio.get_running_loop().call_later(
+            delay, reader.feed_data, struct.pack("!H", len(reply)) + reply
+        )
 
     mock_writer = MagicMock()
-    mock_writer.write = MagicMock()
+    mock_writer.write = MagicMock(side_effect=_reply)
     mock_writer.drain = AsyncMock()
     mock_writer.close = MagicMock()
+    mock_writer.is_closing = MagicMock(return_value=False)
     mock_writer.wait_closed = AsyncMock()
+    mock_writer.start_tls = AsyncMock()
     mock_writer.get_extra_info = MagicMock(return_value=None)
+    return reader, mock_writer
+
+
+@pytest.mark.asyncio
+async def test_query_single_dot_success(engine: DNSQueryEngine) -> None:
+    reader, writer = _make_echo_stream()
 
-    with (
-        patch(
-            "dns_benchmark.core.asyncio.open_connection",
-            new=AsyncMock(return_value=(mock_reader, mock_writer)),
-        ),
-        patch(
-            "dns_benchmark.core.asyncio.wait_for",
-            side_effect=[
-                (mock_reader, mock_writer),
-                length_bytes,  # readexactly(2)
-                wire,  # readexactly(msg_len)
-            ],
-        ),
+    with patch(
+        "dns_benchmark.core.asyncio.open_connection",
+        new=AsyncMock(return_value=(reader, writer)),
     ):
         result = await engine.query_single_dot(
             resolver_ip="1.1.1.1",
             resolver_name="Cloudflare",
             domain="google.com",
         )
+        await engine.close()
 
     assert result.status == QueryStatus.SUCCESS
     assert result.protocol == QueryProtocol.DOT
     assert result.answers == ["1.2.3.4"]
 
 
+@pytest.mark.asyncio
+async def test_query_single_dot_pipelined_out_of_order(
+    engine: DNSQueryEngine,
+) -> None:
+    """Concurrent DoT queries share one stream; replies in any order reach the right waiter."""
+    reader, writer = _make_echo_stream(
+        delays={"slow.example": 0.05, "medium.example": 0.02}
+    )
+    open_connection = AsyncMock(return_value=(reader, writer))
+    domains = ["slow.example", "medium.example", "fast.example"]
+
+    with patch("dns_benchmark.core.asyncio.open_connection", new=open_connection):
+        results = await asyncio.gather(
+            *(
+                engine.query_single_dot(
+                    resolver_ip="1.1.1.1", resolver_name="Cloudflare", domain=d
+                )
+                for d in domains
+            )
+        )
+        await engine.close()
+
+    # One handshake for all three queries, all written before any reply
+    assert open_connection.await_count == 1
+    assert writer.write.call_count == 3
+    for domain, result in zip(domains, results):
+        assert result.status == QueryStatus.SUCCESS
+        assert result.domain == domain
+
+
+@pytest.mark.asyncio
+async def test_query_single_dot_reconnects_after_stream_closed(
+    engine: DNSQueryEngine,
+) -> None:
+    first_reader, first_writer = _make_echo_stream()
+    second_reader, second_writer = _make_echo_stream()
+    open_connection = AsyncMock(
+        side_effect=[(first_reader, first_writer), (second_reader, second_writer)]
+    )
+
+    with patch("dns_benchmark.core.asyncio.open_connection", new=open_connection):
+        await engine.query_single_dot(
+            resolver_ip="1.1.1.1", resolver_name="Cloudflare", domain="google.com"
+        )
+        first_reader.feed_eof()  # server closes the idle stream
+        await asyncio.sleep(0)
+        result = await engine.query_single_dot(
+            resolver_ip="1.1.1.1", resolver_name="Cloudflare", domain="google.com"
+        )
+        await engine.close()
+
+    assert result.status == QueryStatus.SUCCESS
+    assert open_connection.await_count == 2
+
+
 @pytest.mark.asyncio
 async def test_query_single_dot_tls_error(engine: DNSQueryEngine) -> None:
     import ssl
@@ -332,6 +540,20 @@ async def test_run_benchmark_dispatches_dot(engine: DNSQueryEngine) -> None:
     engine.query_single_dot.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_run_benchmark_dispatches_tcp(engine: DNSQueryEngine) -> None:
+    mock_result = MagicMock()
+    engine.query_single_tcp = AsyncMock(return_value=mock_result)  # type: ignore
+
+    await engine.run_benchmark(
+        resolvers=[{"ip": "1.1.1.1", "name": "Cloudflare"}],
+        domains=["google.com"],
+        protocol=QueryProtocol.TCP,
+    )
+
+    engine.query_single_tcp.assert_called_once()
+
+
 @pytest.mark.asyncio
 async def test_run_benchmark_dispatches_plain(engine: DNSQueryEngine) -> None:
     mock_result = MagicMock()
@@ -0,0 +1,194 @@
+import asyncio
+
+import dns.message
+import numpy as np
+import pytest
+
+from dns_benchmark.analysis import BenchmarkAnalyzer
+from dns_benchmark.core import (
+    DNSQueryEngine,
+    DNSQueryResult,
+    QueryProtocol,
+    QueryStatus,
+)
+from dns_benchmark.table import ResultTable
+from dns_benchmark.wire import QueryTemplate
+
+
+def _result(
+    domain="a.example",
+    status=QueryStatus.SUCCESS,
+    latency=1.0,
+    resolver_ip="1.1.1.1",
+    **kwargs,
+):
+    failed = status != QueryStatus.SUCCESS
+    return DNSQueryResult(
+        resolver_ip=resolver_ip,
+        resolver_name="Cloudflare",
+        domain=domain,
+        record_type="A",
+        start_time=100.0,
+        end_time=100.5,
+        latency_ms=latency,
+        status=status,
+        answers=[] if failed else ["1.2.3.4"],
+        ttl=None if failed else 300,
+        error_message="Query timeout" if failed else None,
+        **kwargs,
+    )
+
+
+def test_dataframe_shares_numeric_columns():
+    table = ResultTable.of([_result(latency=1.5), _result("b.example", latency=2.5)])
+    df = table.to_dataframe()
+
+    assert np.shares_memory(df["latency_ms"].to_numpy(), table.column("latency_ms"))
+    assert list(df["domain"]) == ["a.example", "b.example"]
+    assert df["domain"].dtype == "category"
+    assert list(df["status"]) == ["success", "success"]
+
+
+def test_put_grows_and_keeps_row_order():
+    table = ResultTable(capacity=1)
+    table.put(2, _result("c.example", status=QueryStatus.TIMEOUT))
+    table.put(0, _result("a.example"))
+    table.put(1, _result("b.example", hedged=True))
+
+    df = table.to_dataframe()
+    assert len(table) == 3
+    assert list(df["domain"]) == ["a.example", "b.example", "c.example"]
+    assert list(df["hedged"]) == [False, True, False]
+    assert list(df["completed"]) == [True, True, False]
+    assert df["ttl"].isna().tolist() == [False, False, True]
+
+
+def test_records_restore_python_values():
+    records = list(
+        ResultTable.of([_result(), _result(status=QueryStatus.TIMEOUT)]).records()
+    )
+
+    assert records[0]["answers"] == ["1.2.3.4"] and records[0]["ttl"] == 300
+    assert records[0]["error_message"] is None
+    assert records[1]["answers"] == [] and records[1]["ttl"] is None
+    assert records[1]["status"] == "timeout"
+    assert records[1]["error_message"] == "Query timeout"
+
+
+def test_analyzer_reads_table():
+    table = ResultTable.of(
+        [
+            _result(latency=2.0),
+            _result(latency=4.0),
+            _result(status=QueryStatus.TIMEOUT),
+        ]
+    )
+    analyzer = BenchmarkAnalyzer(table)
+
+    assert analyzer.table is table
+    overall = analyzer.get_overall_statistics()
+    assert overall["total_queries"] == 3
+    assert overall["overall_avg_latency"] == pytest.approx(3.0)
+    assert analyzer.get_error_statistics() == {"Query timeout": 1}
+
+
+def test_connection_statistics_split_cold_and_warm():
+    table = ResultTable.of(
+        [
+            _result(latency=30.0, connection="cold", protocol=QueryProtocol.DOT),
+            _result(latency=10.0, connection="warm", protocol=QueryProtocol.DOT),
+            _result(latency=14.0, connection="warm", protocol=QueryProtocol.DOT),
+            _result(latency=5.0),
+        ]
+    )
+
+    [stats] = BenchmarkAnalyzer(table).get_connection_statistics()
+    assert stats["protocol"] == "dot"
+    assert (stats["cold_queries"], stats["warm_queries"]) == (1, 2)
+    assert stats["cold_avg_latency"] == pytest.approx(30.0)
+    assert stats["warm_avg_latency"] == pytest.approx(12.0)
+    assert [r["connection"] for r in table.records()] == ["cold", "warm", "warm", None]
+
+
+def test_family_statistics_split_ipv4_and_ipv6():
+    ipv6 = "2606:4700:4700::1111"
+    table = ResultTable.of(
+        [
+            _result(latency=10.0),
+            _result(latency=20.0, resolver_ip=ipv6),
+            _result(latency=30.0, resolver_ip=ipv6),
+            _result(status=QueryStatus.TIMEOUT, resolver_ip=ipv6),
+            _result(protocol=QueryProtocol.DOH),
+        ]
+    )
+
+    ipv4_stats, ipv6_stats = BenchmarkAnalyzer(table).get_family_statistics()
+    assert (ipv4_stats["family"], ipv6_stats["family"]) == ("IPv4", "IPv6")
+    assert (ipv4_stats["total_queries"], ipv6_stats["total_queries"]) == (1, 3)
+    assert ipv6_stats["resolver_ip"] == ipv6
+    assert ipv6_stats["share"] == pytest.approx(75.0)
+    assert ipv6_stats["avg_latency"] == pytest.approx(25.0)
+    assert [r["family"] for r in table.records()][-2:] == ["IPv6", None]
+
+
+def test_family_statistics_group_split_resolvers_by_base_name():
+    # --family both without happy eyeballs queries each family as its own
+    # resolver; the share is still out of all of the resolver's queries
+    ipv6 = "2606:4700:4700::1111"
+    results = [_result(latency=10.0), _result(latency=20.0, resolver_ip=ipv6)]
+    results += [_result(latency=30.0, resolver_ip=ipv6)]
+    for result in results:
+        result.resolver_name = f"Cloudflare ({result.family})"
+
+    ipv4_stats, ipv6_stats = BenchmarkAnalyzer(results).get_family_statistics()
+    assert (ipv4_stats["resolver_name"], ipv6_stats["resolver_name"]) == (
+        "Cloudflare",
+        "Cloudflare",
+    )
+    assert (ipv4_stats["total_queries"], ipv6_stats["total_queries"]) == (1, 2)
+    assert ipv4_stats["share"] == pytest.approx(100 / 3)
+    assert ipv6_stats["share"] == pytest.approx(200 / 3)
+
+
+@pytest.mark.asyncio
+async def test_run_benchmark_table_keeps_plan_order(monkeypatch):
+    async def fake_query(self, query, timeout):
+        request = dns.message.from_wire(QueryTemplate.of(query).wire)
+        # Later domains answer first
+        await asyncio.sleep(0.01 if request.question[0].name.labels[0] == b"a" else 0)
+        return dns.message.make_response(request).to_wire()
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", fake_query)
+    engine = DNSQueryEngine(max_concurrent_queries=4, max_retries=0)
+
+    table = await engine.run_benchmark_table(
+        [{"name": "R", "ip": "10.0.0.1"}],
+        ["a.example", "b.example"],
+        iterations=2,
+    )
+
+    df = table.to_dataframe()
+    assert list(df["domain"]) == ["a.example", "b.example"] * 2
+    assert list(df["iteration"]) == [1, 1, 2, 2]
+    assert df["success"].all()
+
+
+@pytest.mark.asyncio
+async def test_run_benchmark_table_open_loop(monkeypatch):
+    async def fake_query(self, query, timeout):
+        request = dns.message.from_wire(QueryTemplate.of(query).wire)
+        return dns.message.make_response(request).to_wire()
+
+    monkeypatch.setattr("dns_benchmark.core.UDPTransport.query", fake_query)
+    engine = DNSQueryEngine(max_retries=0)
+
+    table = await engine.run_benchmark_table(
+        [{"name": "R", "ip": "10.0.0.1"}],
+        ["a.example", "b.example", "c.example"],
+        rate=500.0,
+    )
+
+    df = table.to_dataframe()
+    assert list(df["domain"]) == ["a.example", "b.example", "c.example"]
+    assert df["success"].all()
+    assert engine.open_loop_report["sent"] == 3
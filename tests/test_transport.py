@@ -0,0 +1,624 @@
+"""
+Tests for the long-lived transports, run against a loopback DNS responder.
+"""
+
+import asyncio
+import gc
+import shutil
+import socket
+import ssl
+import subprocess
+
+import dns.message
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import pytest
+
+from dns_benchmark.core import DNSQueryEngine, QueryProtocol, QueryStatus
+from dns_benchmark.transport import (
+    DoHTransport,
+    RTTEstimator,
+    StreamConnection,
+    StreamPool,
+    TLSSessionContext,
+    UDPTransport,
+)
+
+
+def _answer(wire: bytes, address: str = "192.0.2.1") -> bytes:
+    request = dns.message.from_wire(wire)
+    response = dns.message.make_response(request)
+    question = request.question[0]
+    if question.rdtype == dns.rdatatype.A:
+        rrset = response.find_rrset(
+            response.answer,
+            question.name,
+            dns.rdataclass.IN,
+            dns.rdatatype.A,
+            create=True,
+        )
+        rrset.add(
+            dns.rdata.from_text(dns.rdataclass.IN, dns.rdatatype.A, address), ttl=60
+        )
+    return response.to_wire()
+
+
+class _Responder(asyncio.DatagramProtocol):
+    """Answers every query; replies for names starting with 'slow' are delayed."""
+
+    def __init__(self) -> None:
+        self.transport = None
+        self.received = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        name = dns.message.from_wire(data).question[0].name.to_text()
+        if name.startswith("silent"):
+            return
+        if name.startswith("stray"):
+            # Same ID, different question: must be ignored by the client
+            other = dns.message.from_wire(_answer(data))
+            other.question[0].name = dns.name.from_text("other.example")
+            self.transport.sendto(other.to_wire(), addr)
+        delay = 0.05 if name.startswith("slow") else 0.0
+        asyncio.get_running_loop().call_later(
+            delay, self.transport.sendto, _answer(data), addr
+        )
+
+
+@pytest.fixture
+async def responder():
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _Responder, local_addr=("127.0.0.1", 0)
+    )
+    yield protocol, transport.get_extra_info("sockname")[1]
+    transport.close()
+
+
+def _query_wire(name: str) -> bytes:
+    return dns.message.make_query(name, "A").to_wire()
+
+
+@pytest.mark.asyncio
+async def test_udp_transport_roundtrip(responder) -> None:
+    _protocol, port = responder
+    transport = UDPTransport("127.0.0.1", port=port)
+    try:
+        raw = await transport.query(_query_wire("example.com"), timeout=1.0)
+    finally:
+        transport.close()
+
+    response = dns.message.from_wire(raw)
+    assert response.answer[0][0].to_text() == "192.0.2.1"
+
+
+@pytest.mark.asyncio
+async def test_udp_transport_out_of_order_replies(responder) -> None:
+    """Slow and fast queries share one socket; each gets its own answer."""
+    _protocol, port = responder
+    transport = UDPTransport("127.0.0.1", port=port)
+    names = [f"{'slow' if i % 2 else 'fast'}{i}.example" for i in range(20)]
+    try:
+        raws = await asyncio.gather(
+            *(transport.query(_query_wire(n), timeout=1.0) for n in names)
+        )
+    finally:
+        transport.close()
+
+    for name, raw in zip(names, raws):
+        assert dns.message.from_wire(raw).question[0].name.to_text() == name + "."
+
+
+@pytest.mark.asyncio
+async def test_udp_transport_ignores_mismatched_question(responder) -> None:
+    _protocol, port = responder
+    transport = UDPTransport("127.0.0.1", port=port)
+    try:
+        raw = await transport.query(_query_wire("stray.example"), timeout=1.0)
+    finally:
+        transport.close()
+
+    assert dns.message.from_wire(raw).question[0].name.to_text() == "stray.example."
+
+
+@pytest.mark.asyncio
+async def test_udp_transport_timeout_clears_pending(responder) -> None:
+    _protocol, port = responder
+    transport = UDPTransport("127.0.0.1", port=port)
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await transport.query(_query_wire("silent.example"), timeout=0.05)
+        assert all(not p.pending for p in transport._protocols)
+    finally:
+        transport.close()
+
+
+@pytest.mark.asyncio
+async def test_udp_transport_multiple_sockets(responder) -> None:
+    _protocol, port = responder
+    transport = UDPTransport("127.0.0.1", port=port, sockets=3)
+    try:
+        await asyncio.gather(
+            *(
+                transport.query(_query_wire(f"slow{i}.example"), timeout=1.0)
+                for i in range(9)
+            )
+        )
+        assert len(transport._protocols) == 3
+    finally:
+        transport.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_plain_query_over_loopback(responder) -> None:
+    protocol, port = responder
+    engine = DNSQueryEngine(max_concurrent_queries=10, timeout=1.0, max_retries=0)
+    engine._udp_transports["127.0.0.1"] = UDPTransport("127.0.0.1", port=port)
+    try:
+        results = await asyncio.gather(
+            *(
+                engine.query_single("127.0.0.1", "Loopback", f"host{i}.example")
+                for i in range(10)
+            )
+        )
+    finally:
+        await engine.close()
+
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    assert all(r.answers == ["192.0.2.1"] for r in results)
+    assert protocol.received == 10
+
+
+@pytest.mark.asyncio
+async def test_udp_transport_connection_refused() -> None:
+    # Bind then close a socket to get a port with (very likely) no listener
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    transport = UDPTransport("127.0.0.1", port=port)
+    try:
+        with pytest.raises((ConnectionRefusedError, asyncio.TimeoutError)):
+            await transport.query(_query_wire("example.com"), timeout=0.5)
+    finally:
+        transport.close()
+
+
+def test_rtt_estimator_tracks_smoothed_rtt() -> None:
+    estimator = RTTEstimator(max_timeout=5.0, min_timeout=0.01)
+    assert estimator.timeout() == 1.0  # no sample yet
+
+    estimator.observe(0.1)
+    assert estimator.srtt == pytest.approx(0.1)
+    assert estimator.timeout() == pytest.approx(0.1 + 4 * 0.05)
+
+    for _ in range(50):
+        estimator.observe(0.02)
+    # Steady RTT: variance decays and the timeout closes in on the RTT
+    assert estimator.srtt == pytest.approx(0.02, rel=0.05)
+    assert estimator.timeout() < 0.03
+    assert estimator.stats()["samples"] == 51
+
+
+def test_rtt_estimator_backoff_and_bounds() -> None:
+    estimator = RTTEstimator(max_timeout=0.5, min_timeout=0.05)
+    estimator.observe(0.001)
+    assert estimator.timeout() == 0.05  # clamped up to the minimum
+
+    estimator.observe(0.1)
+    base = estimator.timeout()
+    estimator.backoff()
+    assert estimator.timeout() == pytest.approx(min(0.5, base * 2))
+    for _ in range(10):
+        estimator.backoff()
+    assert estimator.timeout() == 0.5  # never beyond the fixed timeout
+
+    estimator.observe(0.1)  # a fresh sample clears the backoff
+    assert estimator.timeout() < 0.5
+
+
+class _StreamResponder:
+    """Length-prefixed DNS over TCP; 'slow' names are answered after the rest."""
+
+    def __init__(self) -> None:
+        self.connections = 0
+
+    async def handle(self, reader, writer) -> None:
+        self.connections += 1
+        try:
+            while True:
+                raw_len = await reader.readexactly(2)
+                wire = await reader.readexactly(int.from_bytes(raw_len, "big"))
+                name = dns.message.from_wire(wire).question[0].name.to_text()
+                if name.startswith("close"):
+                    writer.close()
+                    return
+                reply = _answer(wire)
+                delay = 0.05 if name.startswith("slow") else 0.0
+                asyncio.get_running_loop().call_later(
+                    delay, writer.write, len(reply).to_bytes(2, "big") + reply
+                )
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            writer.close()
+
+
+@pytest.fixture
+async def stream_responder():
+    responder = _StreamResponder()
+    server = await asyncio.start_server(responder.handle, "127.0.0.1", 0)
+    yield responder, server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_stream_connection_pipelines_out_of_order(stream_responder) -> None:
+    responder, port = stream_responder
+    conn = await StreamConnection.open("127.0.0.1", port, None, timeout=1.0)
+    names = [f"{'slow' if i % 2 else 'fast'}{i}.example" for i in range(20)]
+    try:
+        raws = await asyncio.gather(
+            *(conn.query(_query_wire(n), timeout=1.0) for n in names)
+        )
+    finally:
+        await conn.close()
+
+    assert responder.connections == 1
+    for name, raw in zip(names, raws):
+        assert dns.message.from_wire(raw).question[0].name.to_text() == name + "."
+
+
+@pytest.mark.asyncio
+async def test_stream_connection_close_fails_pending(stream_responder) -> None:
+    _responder, port = stream_responder
+    conn = await StreamConnection.open("127.0.0.1", port, None, timeout=1.0)
+    try:
+        with pytest.raises(ConnectionResetError):
+            await conn.query(_query_wire("close.example"), timeout=1.0)
+        assert not conn.is_usable()
+        assert conn.in_flight == 0
+        with pytest.raises(ConnectionResetError):
+            await conn.query(_query_wire("example.com"), timeout=1.0)
+    finally:
+        await conn.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_dot_queries_share_connection(stream_responder) -> None:
+    responder, port = stream_responder
+    engine = DNSQueryEngine(max_concurrent_queries=10, timeout=1.0, max_retries=0)
+    engine._dot_pools["127.0.0.1"] = StreamPool("127.0.0.1", port, None)
+    try:
+        results = await asyncio.gather(
+            *(
+                engine.query_single_dot("127.0.0.1", "Loopback", f"host{i}.example")
+                for i in range(10)
+            )
+        )
+    finally:
+        await engine.close()
+
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    assert responder.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_pool_prewarm_opens_min_connections(stream_responder) -> None:
+    responder, port = stream_responder
+    pool = StreamPool("127.0.0.1", port, None, min_connections=3, max_connections=5)
+    try:
+        timings = await pool.prewarm()
+        assert len(timings) == 3
+        assert responder.connections == 3
+        # Already warm: nothing more to open
+        assert await pool.prewarm() == []
+        assert pool.lazy_handshakes_ms == []
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_pool_grows_to_max_under_load(stream_responder) -> None:
+    responder, port = stream_responder
+    pool = StreamPool("127.0.0.1", port, None, min_connections=1, max_connections=3)
+
+    async def _query(name: str) -> bytes:
+        conn, _cold = await pool.acquire()
+        return await conn.query(_query_wire(name), timeout=1.0)
+
+    try:
+        await asyncio.gather(*(_query(f"slow{i}.example") for i in range(30)))
+        assert len(pool.connections) == 3
+        assert responder.connections == 3
+        assert len(pool.lazy_handshakes_ms) == 3
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_pool_prefers_least_loaded(stream_responder) -> None:
+    _responder, port = stream_responder
+    pool = StreamPool("127.0.0.1", port, None, min_connections=2, max_connections=2)
+    try:
+        await pool.prewarm()
+        first, _cold = await pool.acquire()
+        busy = asyncio.ensure_future(first.query(_query_wire("slow.example"), 1.0))
+        await asyncio.sleep(0)
+        second, _cold = await pool.acquire()
+        assert second is not first
+        await busy
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_pool_evicts_dead_connection(stream_responder) -> None:
+    responder, port = stream_responder
+    pool = StreamPool("127.0.0.1", port, None)
+    try:
+        conn, _cold = await pool.acquire()
+        with pytest.raises(ConnectionResetError):
+            await conn.query(_query_wire("close.example"), timeout=1.0)
+        replacement, _cold = await pool.acquire()
+        assert replacement is not conn
+        assert pool.evictions == 1
+        raw = await replacement.query(_query_wire("example.com"), timeout=1.0)
+        assert dns.message.from_wire(raw).answer
+        assert responder.connections == 2
+        assert pool.reconnects == 1
+        first, second = pool.records
+        assert first.closed_at is not None and second.closed_at is None
+        assert (first.queries, second.queries) == (1, 1)
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_prewarm_dot_connections(stream_responder) -> None:
+    responder, port = stream_responder
+    engine = DNSQueryEngine(timeout=1.0, max_retries=0, dot_min_connections=2)
+    engine._dot_pools["127.0.0.1"] = StreamPool(
+        "127.0.0.1", port, None, min_connections=2, max_connections=2
+    )
+    resolvers = [{"ip": "127.0.0.1", "name": "Loopback"}]
+    try:
+        results = await engine.run_benchmark(
+            resolvers=resolvers,
+            domains=["a.example", "b.example"],
+            protocol=QueryProtocol.DOT,
+            prewarm_connections=True,
+        )
+    finally:
+        await engine.close()
+
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    report = engine.dot_prewarm_report["127.0.0.1"]
+    assert report["error"] is None
+    assert len(report["handshake_ms"]) == 2
+    assert engine.get_dot_pool_stats()["127.0.0.1"]["lazy_handshakes"] == 0
+    assert responder.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_engine_tcp_pipelines_on_one_prewarmed_connection(
+    stream_responder,
+) -> None:
+    responder, port = stream_responder
+    engine = DNSQueryEngine(timeout=1.0, max_retries=0, dns_port=port)
+    resolvers = [{"ip": "127.0.0.1", "name": "Loopback"}]
+    try:
+        results = await engine.run_benchmark(
+            resolvers=resolvers,
+            domains=["slow.example", "a.example", "b.example"],
+            protocol=QueryProtocol.TCP,
+            prewarm_connections=True,
+        )
+    finally:
+        await engine.close()
+
+    assert [r.domain for r in results] == ["slow.example", "a.example", "b.example"]
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    assert all(r.protocol == QueryProtocol.TCP for r in results)
+    assert engine.tcp_prewarm_report["127.0.0.1"]["error"] is None
+    assert engine.get_tcp_pool_stats()["127.0.0.1"]["lazy_handshakes"] == 0
+    assert responder.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_pool_concurrent_acquires_tag_one_cold(stream_responder) -> None:
+    responder, port = stream_responder
+    pool = StreamPool("127.0.0.1", port, None, max_connections=1)
+    try:
+        checkouts = await asyncio.gather(*(pool.acquire() for _ in range(10)))
+    finally:
+        await pool.close()
+
+    assert len({id(conn) for conn, _cold in checkouts}) == 1
+    assert sum(cold for _conn, cold in checkouts) == 1
+    assert responder.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_tags_one_cold_query_under_concurrency(stream_responder) -> None:
+    _responder, port = stream_responder
+    engine = DNSQueryEngine(
+        max_concurrent_queries=10, timeout=1.0, max_retries=0, dns_port=port
+    )
+    resolvers = [{"ip": "127.0.0.1", "name": "Loopback"}]
+    try:
+        results = await engine.run_benchmark(
+            resolvers=resolvers,
+            domains=[f"host{i}.example" for i in range(10)],
+            protocol=QueryProtocol.TCP,
+        )
+    finally:
+        await engine.close()
+
+    assert all(r.status == QueryStatus.SUCCESS for r in results)
+    assert [r.connection for r in results].count("cold") == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_tags_cold_and_warm_stream_queries(stream_responder) -> None:
+    _responder, port = stream_responder
+    engine = DNSQueryEngine(
+        max_concurrent_queries=1, timeout=1.0, max_retries=0, dns_port=port
+    )
+    resolvers = [{"ip": "127.0.0.1", "name": "Loopback"}]
+    try:
+        results = await engine.run_benchmark(
+            resolvers=resolvers,
+            domains=["a.example", "b.example", "c.example"],
+            protocol=QueryProtocol.TCP,
+        )
+    finally:
+        await engine.close()
+
+    assert [r.connection for r in results] == ["cold", "warm", "warm"]
+    [record] = engine.get_connection_records()
+    assert record.protocol == "tcp" and record.queries == 3
+    assert record.connect_ms is not None and record.handshake_ms is None
+    assert record.closed_at is not None
+    [stats] = engine.get_connection_stats()
+    assert stats["connections"] == 1 and stats["reconnects"] == 0
+    assert stats["queries_per_connection"] == 3
+
+
+@pytest.fixture
+async def tls_stream_responder(tmp_path):
+    """The stream responder behind TLS, with a self-signed cert for 127.0.0.1."""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is needed to make a test certificate")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+        + ["-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"]
+        + ["-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_ctx.load_cert_chain(cert, key)
+    responder = _StreamResponder()
+    server = await asyncio.start_server(
+        responder.handle, "127.0.0.1", 0, ssl=server_ctx
+    )
+    yield responder, server.sockets[0].getsockname()[1], cert
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_dot_reconnect_resumes_tls_session(tls_stream_responder) -> None:
+    responder, port, cert = tls_stream_responder
+    engine = DNSQueryEngine(timeout=2.0, max_retries=0)
+    context = engine._tls_context("127.0.0.1")
+    assert engine._tls_context("127.0.0.1") is context
+    assert isinstance(context, TLSSessionContext)
+    context.load_verify_locations(cert)
+    pool = engine._dot_pools["127.0.0.1"] = StreamPool(
+        "127.0.0.1", port, context, connect_timeout=2.0
+    )
+    try:
+        conn, _cold = await pool.acquire()
+        assert dns.message.from_wire(
+            await conn.query(_query_wire("example.com"), timeout=2.0)
+        ).answer
+        with pytest.raises(ConnectionResetError):
+            await conn.query(_query_wire("close.example"), timeout=2.0)
+        replacement, _cold = await pool.acquire()
+        await replacement.query(_query_wire("example.com"), timeout=2.0)
+    finally:
+        await engine.close()
+
+    assert responder.connections == 2
+    first, second = pool.records
+    assert (first.resumed, second.resumed) == (False, True)
+    stats = engine.get_dot_pool_stats()["127.0.0.1"]
+    assert (stats["full_handshakes"], stats["resumed_handshakes"]) == (1, 1)
+    [row] = engine.get_connection_stats()
+    assert (row["full_handshakes"], row["resumed"]) == (1, 1)
+
+
+async def _serve_doh(reader, writer, keep_alive=True) -> None:
+    """Minimal HTTP/1.1 DoH endpoint answering every POST."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                name, _, value = line.partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            reply = _answer(await reader.readexactly(length))
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/dns-message\r\n"
+                + (b"" if keep_alive else b"Connection: close\r\n")
+                + f"Content-Length: {len(reply)}\r\n\r\n".encode()
+                + reply
+            )
+            await writer.drain()
+            if not keep_alive:
+                writer.close()
+                return
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_doh_transport_records_connection_reuse() -> None:
+    server = await asyncio.start_server(_serve_doh, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/dns-query"
+    transport = DoHTransport()
+    sends = []
+    try:
+        _raw, first_cold = await transport.query_with_state(
+            url,
+            _query_wire("a.example"),
+            on_send=lambda: sends.append(len(transport.connections)),
+        )
+        raw, second_cold = await transport.query_with_state(
+            url, _query_wire("b.example")
+        )
+    finally:
+        await transport.close()
+        server.close()
+        await server.wait_closed()
+
+    assert dns.message.from_wire(raw).answer
+    assert (first_cold, second_cold) == (True, False)
+    [record] = transport.connections
+    assert record.protocol == "doh" and record.queries == 2
+    assert record.connect_ms is not None and record.handshake_ms is None
+    assert record.closed_at is not None
+    assert sends == [0, 1]  # marked again once the connection was open
+
+
+@pytest.mark.asyncio
+async def test_doh_transport_forgets_dropped_connections() -> None:
+    server = await asyncio.start_server(
+        lambda r, w: _serve_doh(r, w, keep_alive=False), "127.0.0.1", 0
+    )
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/dns-query"
+    transport = DoHTransport()
+    try:
+        for name in ("a.example", "b.example", "c.example"):
+            _raw, cold = await transport.query_with_state(url, _query_wire(name))
+            assert cold
+        gc.collect()
+        # Every request opened a connection that httpx then dropped
+        assert len(transport.connections) == 3
+        assert len(transport._streams) == 0
+    finally:
+        await transport.close()
+        server.close()
+        await server.wait_closed()
+
+    assert all(record.closed_at is not None for record in transport.connections)
@@ -0,0 +1,162 @@
+"""
+Tests for pre-encoded query templates.
+"""
+
+import base64
+import struct
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import pytest
+
+from dns_benchmark.wire import (
+    QueryTemplate,
+    QueryTemplateCache,
+    parse_header,
+    parse_response,
+)
+
+
+def test_template_patches_only_message_id() -> None:
+    template = QueryTemplateCache().get("example.com", "AAAA")
+
+    first = template.with_id(0x1234)
+    second = template.with_id(0xBEEF)
+
+    assert first[:2] == b"\x12\x34" and second[:2] == b"\xbe\xef"
+    assert first[2:] == second[2:] == template.wire[2:]
+    message = dns.message.from_wire(first)
+    assert message.id == 0x1234
+    assert message.question[0].rdtype == dns.rdatatype.AAAA
+    assert template.rdtype == dns.rdatatype.AAAA
+
+
+def test_template_framed_carries_length_prefix() -> None:
+    template = QueryTemplateCache().get("example.com", "A")
+
+    framed = template.framed_with_id(0x0102)
+
+    (length,) = struct.unpack("!H", framed[:2])
+    assert length == len(template.wire) == len(framed) - 2
+    assert framed[2:] == template.with_id(0x0102)
+
+
+def test_template_get_param_is_unpadded_base64url_of_zero_id() -> None:
+    template = QueryTemplateCache().get("example.com", "A")
+
+    param = template.get_param
+
+    assert "=" not in param
+    decoded = base64.urlsafe_b64decode(param + "=" * (-len(param) % 4))
+    assert decoded == template.wire
+    assert decoded[:2] == b"\x00\x00"
+
+
+def test_template_from_raw_wire_matches_question() -> None:
+    wire = dns.message.make_query("MiXeD.Example.", "MX").to_wire()
+
+    template = QueryTemplate.of(wire)
+
+    assert QueryTemplate.of(template) is template
+    assert template.rdtype == dns.rdatatype.MX
+    assert template.question == wire[12:].lower()
+
+
+def test_cache_reuses_templates_and_keys_on_do_bit() -> None:
+    cache = QueryTemplateCache()
+
+    plain = cache.get("example.com", "A")
+    assert cache.get("example.com", "A") is plain
+    signed = cache.get("example.com", "A", dnssec=True)
+
+    assert signed is not plain
+    assert dns.message.from_wire(signed.wire).ednsflags & dns.flags.DO
+    assert dns.message.from_wire(plain.wire).edns == -1
+    assert len(cache) == 2
+
+
+def test_cache_drops_oldest_when_full() -> None:
+    cache = QueryTemplateCache(max_entries=2)
+    first = cache.get("a.example", "A")
+    cache.get("b.example", "A")
+    cache.get("c.example", "A")
+
+    assert len(cache) == 2
+    assert cache.get("a.example", "A") is not first
+
+
+def test_cache_rejects_invalid_record_type() -> None:
+    with pytest.raises(dns.rdatatype.UnknownRdatatype):
+        QueryTemplateCache().get("example.com", "NOTATYPE")
+
+
+def _cname_response(ad: bool = False) -> bytes:
+    """www.example.com CNAME example.com, which has two A records."""
+    request = dns.message.make_query("www.example.com", "A", want_dnssec=True)
+    response = dns.message.make_response(request)
+    if ad:
+        response.flags |= dns.flags.AD
+    records = [
+        ("www.example.com", dns.rdatatype.CNAME, "example.com.", 600),
+        ("example.com", dns.rdatatype.A, "192.0.2.1", 120),
+        ("example.com", dns.rdatatype.A, "192.0.2.2", 120),
+    ]
+    for name, rdtype, text, ttl in records:
+        rrset = response.find_rrset(
+            response.answer,
+            dns.name.from_text(name),
+            dns.rdataclass.IN,
+            rdtype,
+            create=True,
+        )
+        rrset.add(dns.rdata.from_text(dns.rdataclass.IN, rdtype, text), ttl=ttl)
+    return response.to_wire()
+
+
+def test_parse_header_counts_only_queried_type() -> None:
+    parsed = parse_header(_cname_response(), dns.rdatatype.A)
+
+    assert parsed.rcode == dns.rcode.NOERROR
+    assert parsed.answers_count == 2
+    assert parsed.ttl == 120
+    assert parsed.answers is None
+    assert not parsed.authenticated and not parsed.truncated
+
+
+def test_parse_header_reads_flags_and_rcode() -> None:
+    request = dns.message.make_query("missing.example", "A")
+    response = dns.message.make_response(request)
+    response.set_rcode(dns.rcode.NXDOMAIN)
+    response.flags |= dns.flags.TC
+
+    parsed = parse_header(response.to_wire(), dns.rdatatype.A)
+
+    assert parsed.rcode == dns.rcode.NXDOMAIN
+    assert parsed.truncated
+    assert parsed.answers_count == 0 and parsed.ttl is None
+
+
+def test_parse_response_full_decode_agrees_with_header() -> None:
+    raw = _cname_response(ad=True)
+
+    fast = parse_response(raw, dns.rdatatype.A)
+    full = parse_response(raw, dns.rdatatype.A, decode_answers=True)
+
+    assert sorted(full.answers) == ["192.0.2.1", "192.0.2.2"]
+    for attr in ("rcode", "answers_count", "ttl", "authenticated"):
+        assert getattr(fast, attr) == getattr(full, attr)
+
+
+def test_parse_header_rejects_truncated_message() -> None:
+    raw = _cname_response()
+
+    with pytest.raises(dns.exception.FormError):
+        parse_header(raw[:40], dns.rdatatype.A)  # cut inside the first answer
+    with pytest.raises(dns.exception.FormError):
+        parse_header(raw[:8], dns.rdatatype.A)